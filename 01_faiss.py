@@ -1,55 +1,150 @@
 import os
-import tempfile
+import uuid
+import shutil
 import streamlit as st
-from src.utils.settings import Settings
+from src.utils.settings import get_settings
 from src.utils.chat_template import ChatTemplate
+from src.utils.context_builder import ContextBuilder
+from src.utils.metrics import InMemoryExporter, configure_metrics, metrics
 from src.services.azure_openai import AzureOpenaiService
 from src.utils.extractors import DocumentExtractor
-from src.services.faiss import FaissService
+from src.services.factory import create_embeddings, create_faiss_service
+from src.services.semantic_cache import SemanticCache
+from src.services.ingestion import IngestionQueue, IngestionWorker
 
 
 @st.cache_resource
 def load_services():
-    sets = Settings()
+    sets = get_settings()
+    configure_metrics(sets.metrics_exporter, sets.metrics_path)
     azai_serv = AzureOpenaiService(sets=sets)
     llm = azai_serv.get_llm()
-    embeddings = azai_serv.get_embeddings()
-    extractor = DocumentExtractor()
-    faiss_service = FaissService(embeddings=embeddings,
-                                   chunk_size=1200,
-                                   chunk_overlap=500)
-    return llm, embeddings, extractor, faiss_service
+    embeddings = create_embeddings(sets, azai_serv)
+    extractor = DocumentExtractor(max_workers=None)
+    faiss_service = create_faiss_service(sets, embeddings)
+    context_builder = ContextBuilder(max_tokens=sets.context_max_tokens)
+    semantic_cache = SemanticCache(threshold=sets.semantic_cache_threshold,
+                                   max_entries=sets.semantic_cache_size,
+                                   ttl=sets.semantic_cache_ttl)
+    # Indexing runs in ingestion workers (python ingest.py worker), or in a background
+    # thread of this process, never on the request thread
+    ingestion_queue = IngestionQueue(sets.ingest_queue_dir)
+    if sets.ingest_inline_worker:
+        IngestionWorker(ingestion_queue, extractor, faiss_service,
+                        checkpoint_every=sets.ingest_checkpoint_every).start()
+    return llm, embeddings, extractor, faiss_service, context_builder, semantic_cache, ingestion_queue
 
 
 def save_uploaded_files(uploaded_files):
-    temp_dir = tempfile.mkdtemp()
+    # Inside the queue folder, so workers in other processes can read them
+    upload_dir = os.path.join(ingestion_queue.queue_dir, "uploads", uuid.uuid4().hex)
+    os.makedirs(upload_dir)
     for uploaded_file in uploaded_files:
-        file_path = os.path.join(temp_dir, uploaded_file.name)
+        file_path = os.path.join(upload_dir, uploaded_file.name)
         with open(file_path, "wb") as f:
             f.write(uploaded_file.getvalue())
-    return temp_dir
+    return upload_dir
 
 
-llm, embeddings, extractor, faiss_service = load_services()
+llm, embeddings, extractor, faiss_service, context_builder, semantic_cache, ingestion_queue = load_services()
 
 
 def invoke_llm(history, prompt):
-    context = ""
-
-    if "vdb_temp_id" in st.session_state:
-        vdb_id = st.session_state["vdb_temp_id"]
-        results = faiss_service.similarity_search(vdb_id, query=prompt, k=3)
-        retrieved_text = "\n".join([doc.page_content for doc in results])
-        context += f"Relevant documents:\n{retrieved_text}\n\n"
-
-    for msg in history:
-        role = "User" if msg["role"] == "user" else "Assistant"
-        context += f"{role}: {msg['content']}\n"
-
-    context += f"User: {prompt}\nAssistant:"
-
-    res = llm.invoke(context).content
-    return res
+    with metrics.span("chat.turn"):
+        results = []
+        vdb_id = st.session_state.get("vdb_temp_id")
+
+        # Equivalent questions against the same database version reuse the stored answer.
+        # Only opening questions of a session's own database are cached: follow-ups depend on
+        # the conversation, and without a database every session would share one partition
+        # (history already ends with prompt)
+        cacheable = vdb_id is not None and len(history) <= 1
+        if cacheable:
+            # The embedding is cached, so the search below does not compute it again
+            embedding = faiss_service.embed_query(prompt)
+            version = faiss_service.database_version(vdb_id)
+            answer = semantic_cache.lookup(vdb_id, version, prompt, embedding)
+            if answer is not None:
+                yield answer
+                return
+
+        if vdb_id:
+            results = faiss_service.similarity_search(vdb_id, query=prompt, k=3)
+
+        # Overlapping chunks are merged and history is trimmed to the token budget
+        with metrics.span("chat.build_context"):
+            context = context_builder.build(results, history, prompt)
+
+        # Tokens are yielded as they arrive, ChatTemplate renders them progressively
+        with metrics.span("llm.stream") as span:
+            parts = []
+            for chunk in llm.stream(context):
+                if not parts:
+                    metrics.observe("llm.first_token.seconds", span.elapsed())
+                parts.append(chunk.content)
+                yield chunk.content
+
+        # Only complete answers are cached
+        if cacheable:
+            semantic_cache.store(vdb_id, version, prompt, "".join(parts), embedding)
+
+
+def render_stage_timings():
+    # Breakdown of the last chat turn, when metrics are kept in memory
+    exporter = next((e for e in metrics.exporters if isinstance(e, InMemoryExporter)), None)
+    if not metrics.enabled or exporter is None:
+        return
+    trace = exporter.last_trace("chat.turn")
+    if not trace:
+        return
+    with st.expander("Stage timings (last turn)"):
+        for span in trace:
+            indent = "&nbsp;" * 4 * span["depth"]
+            st.markdown(f"{indent}`{span['name']}` {span['duration'] * 1000:.1f} ms", unsafe_allow_html=True)
+
+
+def replace_session_database(temp_id, index_path):
+    # The previous database of the session is never searched again, so its index goes too
+    previous_id = st.session_state.get("vdb_temp_id")
+    previous_path = st.session_state.get("vdb_index_path")
+    if previous_id is not None:
+        try:
+            faiss_service.delete_temporary_database(previous_id)
+        except ValueError:
+            pass
+    if previous_path is not None and previous_path != index_path:
+        shutil.rmtree(previous_path, ignore_errors=True)
+    st.session_state["vdb_temp_id"] = temp_id
+    st.session_state["vdb_index_path"] = index_path
+
+
+@st.fragment(run_every=2)
+def render_ingestion_status():
+    job_id = st.session_state.get("ingest_job_id")
+    if job_id is None:
+        return
+    job = ingestion_queue.get(job_id)
+    if job is None:
+        del st.session_state["ingest_job_id"]
+        return
+
+    progress = job["progress"]
+    if job["status"] == "done":
+        # Only finished indexes are loaded; the id is kept so the service can spill it when idle
+        temp_id, _ = faiss_service.load_temporary_database(job["index_path"])
+        replace_session_database(temp_id, job["index_path"])
+        del st.session_state["ingest_job_id"]
+        st.success(f"Vector Database created successfully! {progress.get('chunks', 0)} chunks indexed.")
+    elif job["status"] == "failed":
+        del st.session_state["ingest_job_id"]
+        st.error(f"Processing failed: {job['error']}")
+    elif job["status"] == "queued":
+        st.info("Waiting for an ingestion worker...")
+    else:
+        st.progress(progress.get("fraction", 0.0),
+                    text=f"Processing {progress.get('current') or 'documents'}: "
+                         f"{progress.get('documents_done', 0)}/{progress.get('documents_total', 0)} documents, "
+                         f"{progress.get('chunks', 0)} chunks")
 
 
 st.set_page_config(
@@ -91,21 +186,17 @@ def main():
         
         if st.button("Process Documents", type="primary", use_container_width=True):
             if uploaded_files:
-                with st.spinner("Processing documents..."):
-                    temp_dir = save_uploaded_files(uploaded_files)
-                    text = extractor.extract_documents(path=temp_dir)
-
-                    # create temporary vDB
-                    documents = faiss_service.text_to_documents(text)
-                    temp_id, vdb = faiss_service.create_temporary_database(documents=documents)
-
-                    st.session_state['vdb_temp_id'] = temp_id
-                    st.session_state['vdb'] = vdb
-
-                    st.success("Vector Database created successfully!")
+                upload_dir = save_uploaded_files(uploaded_files)
+                # Queued for a worker, the status below follows it until the index is saved
+                index_path = os.path.join(get_settings().ingest_index_dir, os.path.basename(upload_dir))
+                # The worker deletes the uploaded copies once the job is done or failed
+                job = ingestion_queue.submit(upload_dir, index_path, remove_source=True)
+                st.session_state["ingest_job_id"] = job["id"]
             else:
                 st.warning("Please upload documents first")
 
+        render_ingestion_status()
+
     with col2:
         st.header("Chat")
         chat_template = ChatTemplate(
@@ -113,6 +204,7 @@ def main():
             placeholder="Talk to me..."
         )
         chat_template.chat()
+        render_stage_timings()
 
 
 if __name__ == "__main__":
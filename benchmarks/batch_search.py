@@ -0,0 +1,59 @@
+"""
+    Compares one similarity_search call per query against similarity_search_batch.
+
+    python -m benchmarks.batch_search --documents 50 --queries 1000 --latency 0.02
+"""
+import json
+import time
+import argparse
+from src.services.faiss import FaissService
+from src.services.fake_embeddings import FakeEmbeddings
+from benchmarks.common import synthetic_documents, synthetic_queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds per embedding request")
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    documents = synthetic_documents(args.documents)
+    queries = synthetic_queries(documents, args.queries)
+
+    embeddings = FakeEmbeddings(dimension=args.dimension)
+    faiss_service = FaissService(embeddings, chunk_size=1000, chunk_overlap=200)
+    temp_id, vdb = faiss_service.create_temporary_database(documents)
+
+    # Latency only applies to queries, so ingestion does not dominate the run
+    embeddings.latency = args.latency
+
+    start = time.perf_counter()
+    single = [faiss_service.similarity_search(temp_id, query, k=args.k, return_scores=True) for query in queries]
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = faiss_service.similarity_search_batch(temp_id, queries, k=args.k, return_scores=True,
+                                                  batch_size=args.batch_size)
+    batch_seconds = time.perf_counter() - start
+
+    same_ids = sum(
+        [doc.id for doc, _ in a] == [doc.id for doc, _ in b]
+        for a, b in zip(single, batch)
+    )
+
+    print(json.dumps({
+        "chunks": vdb.index.ntotal,
+        "queries": len(queries),
+        "single_qps": len(queries) / single_seconds,
+        "batch_qps": len(queries) / batch_seconds,
+        "speedup": single_seconds / batch_seconds,
+        "identical_results": same_ids / len(queries)
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+    Checks that OffsetTextSplitter produces exactly the chunks of LangChain's
+    RecursiveCharacterTextSplitter, then compares their splitting time and the
+    time of FaissService._process_documents before and after. The equivalence
+    check is the one of tests/test_text_splitter.py and fails on the first mismatch.
+
+    python -m benchmarks.chunking --documents 50 --workers 4
+"""
+import uuid
+import json
+import time
+import random
+import argparse
+from langchain.docstore.document import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from src.services.faiss import FaissService
+from src.services.fake_embeddings import FakeEmbeddings
+from src.utils.text_splitter import OffsetTextSplitter
+from benchmarks.common import synthetic_documents
+from tests.test_text_splitter import SEPARATORS, check_equivalence, random_texts
+
+
+def pdf_like_documents(n_documents: int, pages: int = 100, seed: int = 0) -> list:
+    # Extracted PDF text: short lines, some punctuation, pages joined by blank lines
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(5000)]
+
+    def page() -> str:
+        lines = []
+        for _ in range(45):
+            words = rng.choices(vocabulary, k=12)
+            if rng.random() < 0.3:
+                words[rng.randrange(12)] += "."
+            if rng.random() < 0.3:
+                words[rng.randrange(12)] += ","
+            lines.append(" ".join(words))
+        return "\n".join(lines)
+
+    return [
+        Document(page_content="\n\n".join(page() for _ in range(pages)), metadata={"source": f"document_{i}.pdf"})
+        for i in range(n_documents)
+    ]
+
+
+def reference_process_documents(splitter: RecursiveCharacterTextSplitter, documents: list) -> list:
+    # _process_documents as it was before OffsetTextSplitter
+    chunks = []
+    for i, doc in enumerate(documents):
+        doc_chunks = splitter.split_documents([doc])
+        for j, chunk in enumerate(doc_chunks):
+            chunk.id = str(uuid.uuid4())
+            chunk.metadata.update({
+                "doc_id": i,
+                "chunk_id": j,
+                "source": doc.metadata.get("source", f"document_{i}"),
+                "total_chunks": len(doc_chunks)
+            })
+            chunks.append(chunk)
+    return chunks
+
+
+def timed(function, argument) -> float:
+    start = time.perf_counter()
+    function(argument)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=100, help="Pages per document")
+    parser.add_argument("--chunk-size", type=int, default=1200)
+    parser.add_argument("--chunk-overlap", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    checked = check_equivalence(random_texts(300) + [doc.page_content for doc in synthetic_documents(20)])
+
+    documents = pdf_like_documents(args.documents, args.pages)
+    texts = [doc.page_content for doc in documents]
+    reference = RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap,
+                                               separators=SEPARATORS)
+    splitter = OffsetTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap,
+                                  separators=SEPARATORS)
+    checked += check_equivalence(texts[:5])
+
+    faiss_service = FaissService(FakeEmbeddings(), chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    parallel_service = FaissService(FakeEmbeddings(), chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap,
+                                    split_workers=args.workers)
+
+    results = {
+        "equivalence_cases": checked,
+        "megabytes": sum(len(text) for text in texts) / 2 ** 20,
+        "split": {
+            "recursive_character_seconds": timed(lambda t: [reference.split_text(text) for text in t], texts),
+            "offset_seconds": timed(splitter.split_texts, texts),
+            f"offset_{args.workers}_workers_seconds": timed(lambda t: splitter.split_texts(t, args.workers), texts)
+        },
+        "process_documents": {
+            "recursive_character_seconds": timed(
+                lambda d: reference_process_documents(reference, d), documents),
+            "offset_seconds": timed(faiss_service._process_documents, documents),
+            f"offset_{args.workers}_workers_seconds": timed(parallel_service._process_documents, documents)
+        }
+    }
+    for stage in ("split", "process_documents"):
+        results[stage]["speedup"] = results[stage]["recursive_character_seconds"] / results[stage]["offset_seconds"]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
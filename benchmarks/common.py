@@ -0,0 +1,32 @@
+import random
+from typing import List
+from langchain.docstore.document import Document
+
+
+def synthetic_documents(n_documents: int,
+                        words_per_document: int = 2000,
+                        vocabulary_size: int = 20_000,
+                        seed: int = 0) -> List[Document]:
+    # Zipf-like word frequencies so that queries share words with some chunks only
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(vocabulary_size)]
+    weights = [1.0 / (rank + 1) for rank in range(vocabulary_size)]
+
+    documents = []
+    for i in range(n_documents):
+        words = rng.choices(vocabulary, weights=weights, k=words_per_document)
+        sentences = [" ".join(words[j:j + 15]) + "." for j in range(0, len(words), 15)]
+        paragraphs = ["\n".join(sentences[j:j + 6]) for j in range(0, len(sentences), 6)]
+        documents.append(Document(page_content="\n\n".join(paragraphs), metadata={"source": f"document_{i}"}))
+    return documents
+
+
+def synthetic_queries(documents: List[Document], n_queries: int, words: int = 8, seed: int = 1) -> List[str]:
+    # Queries are word windows taken from the corpus
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(n_queries):
+        tokens = rng.choice(documents).page_content.split()
+        start = rng.randrange(max(len(tokens) - words, 1))
+        queries.append(" ".join(tokens[start:start + words]))
+    return queries
@@ -0,0 +1,142 @@
+"""
+    Fires concurrent ainvoke/aembed calls through AzureOpenaiService against a
+    local stub of the Azure OpenAI chat-completions and embeddings routes, and
+    reports latency, the most requests the stub saw in flight and how many TCP
+    connections were opened for them.
+
+    python -m benchmarks.concurrent_requests --requests 64 --delay 0.05
+"""
+import json
+import time
+import asyncio
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.utils.settings import Settings
+from src.services.azure_openai import AzureOpenaiService
+
+
+class StubState:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = 0
+        self.connections = set()
+
+
+def stub_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            with state.lock:
+                state.requests += 1
+                state.in_flight += 1
+                state.max_in_flight = max(state.max_in_flight, state.in_flight)
+                state.connections.add(self.client_address)
+            try:
+                time.sleep(state.delay)
+                if self.path.split("?")[0].endswith("/embeddings"):
+                    inputs = body.get("input", [])
+                    inputs = inputs if isinstance(inputs, list) else [inputs]
+                    payload = {
+                        "object": "list",
+                        "data": [{"object": "embedding", "index": i, "embedding": [0.1, 0.2, 0.3]}
+                                 for i in range(len(inputs))],
+                        "model": "stub",
+                        "usage": {"prompt_tokens": 1, "total_tokens": 1}
+                    }
+                else:
+                    payload = {
+                        "id": "stub",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": "stub",
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": "ok"}}],
+                        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+                    }
+                data = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            finally:
+                with state.lock:
+                    state.in_flight -= 1
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def fire(service: AzureOpenaiService, n_requests: int) -> dict:
+    async def timed(coroutine):
+        start = time.perf_counter()
+        await coroutine
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*[
+        timed(service.ainvoke("hello") if i % 2 == 0 else service.aembed([f"text {i}"]))
+        for i in range(n_requests)
+    ])
+    return {
+        "seconds": time.perf_counter() - start,
+        "p50_seconds": percentile(latencies, 0.5),
+        "p99_seconds": percentile(latencies, 0.99)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--delay", type=float, default=0.05, help="Stub response time in seconds")
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    state = StubState(args.delay)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), stub_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    sets = Settings(azure_openai_api_key="stub",
+                    azure_openai_endpoint=f"http://127.0.0.1:{server.server_port}",
+                    llm_deployment_model="stub",
+                    embedding_deployment_model="stub",
+                    llm_api_version="2024-06-01",
+                    embedding_api_version="2024-06-01",
+                    llm_max_concurrency=args.max_concurrency)
+    service = AzureOpenaiService(sets)
+    # Texts are sent as is, so the run needs no tiktoken encoding download
+    service.get_embeddings().check_embedding_ctx_length = False
+
+    results = {"requests": args.requests, "max_concurrency": args.max_concurrency}
+    results["async"] = asyncio.run(fire(service, args.requests))
+    # Sync calls go through the pooled httpx.Client of the same endpoint
+    start = time.perf_counter()
+    for i in range(8):
+        service.get_llm().invoke("hello")
+    results["sync_seconds_per_request"] = (time.perf_counter() - start) / 8
+    results["stub"] = {
+        "requests": state.requests,
+        "max_in_flight": state.max_in_flight,
+        "connections": len(state.connections)
+    }
+    service.pool.close()
+    server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+    Cold import time of the entry points used by extraction and search workers,
+    each measured in fresh interpreters (median of --repeats), plus the heavy
+    packages every import drags in.
+
+    python -m benchmarks.import_time --repeats 5
+"""
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+MODULES = [
+    "src.utils",
+    "src.utils.settings",
+    "src.utils.extractors",
+    "src.services",
+    "src.services.faiss",
+    "src.services.ingestion",
+    "src.services.azure_openai"
+]
+
+# Packages a worker should only pay for when it actually uses them
+HEAVY_PACKAGES = ["streamlit", "langchain_openai", "langchain_groq", "openai", "fitz", "sentence_transformers"]
+
+PROBE = """
+import sys, json, time
+started = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - started
+print(json.dumps({{"seconds": seconds, "loaded": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def measure(module: str, repeats: int) -> dict:
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_PACKAGES)],
+                                check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        "median_seconds": statistics.median(run["seconds"] for run in runs),
+        "heavy_packages": runs[-1]["loaded"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    args = parser.parse_args()
+
+    print(json.dumps({module: measure(module, args.repeats) for module in args.modules}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+    Compares load time and resident memory of load_local_database with and
+    without mmap=True. Each load runs in a fresh subprocess.
+
+    python -m benchmarks.load_database --documents 500
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from src.services.faiss import FaissService
+from src.services.fake_embeddings import FakeEmbeddings
+from benchmarks.common import synthetic_documents
+
+
+def resident_memory_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure_load(index_path: str, dimension: int, mmap: bool) -> dict:
+    faiss_service = FaissService(FakeEmbeddings(dimension=dimension))
+    before = resident_memory_mb()
+
+    start = time.perf_counter()
+    vdb = faiss_service.load_local_database(index_path, mmap=mmap)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    faiss_service.similarity_search(vdb, "term1 term2 term3", k=3)
+    first_query_seconds = time.perf_counter() - start
+
+    return {
+        "mmap": mmap,
+        "load_seconds": load_seconds,
+        "first_query_seconds": first_query_seconds,
+        "rss_delta_mb": resident_memory_mb() - before
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--index-path", default=None, help="Reuse an existing index instead of building one")
+    parser.add_argument("--measure", choices=["pickle", "mmap"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure_load(args.index_path, args.dimension, args.measure == "mmap")))
+        return
+
+    index_path = args.index_path
+    if index_path is None:
+        index_path = os.path.join(tempfile.mkdtemp(), "index")
+        faiss_service = FaissService(FakeEmbeddings(dimension=args.dimension))
+        faiss_service.create_local_database(synthetic_documents(args.documents), index_path)
+
+    results = []
+    for mode in ("pickle", "mmap"):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.load_database", "--measure", mode,
+             "--index-path", index_path, "--dimension", str(args.dimension)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(json.dumps({"index_path": index_path, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
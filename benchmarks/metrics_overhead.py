@@ -0,0 +1,68 @@
+"""
+    Cost of the instrumentation: per-call overhead of a span with metrics
+    disabled and enabled, and similarity_search throughput in both modes.
+
+    python -m benchmarks.metrics_overhead --calls 200000 --queries 500
+"""
+import json
+import time
+import argparse
+from src.utils.metrics import Metrics, InMemoryExporter, configure_metrics
+from src.services.faiss import FaissService
+from src.services.fake_embeddings import FakeEmbeddings
+from benchmarks.common import synthetic_documents, synthetic_queries
+
+
+def per_call_seconds(function, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    disabled = Metrics(enabled=False)
+    enabled = Metrics(enabled=True, exporters=[InMemoryExporter()])
+
+    def bare():
+        pass
+
+    def with_span(metrics):
+        def call():
+            with metrics.span("benchmark"):
+                pass
+        return call
+
+    bare_seconds = per_call_seconds(bare, args.calls)
+    results = {
+        "span_overhead_ns": {
+            "disabled": (per_call_seconds(with_span(disabled), args.calls) - bare_seconds) * 1e9,
+            "enabled": (per_call_seconds(with_span(enabled), args.calls) - bare_seconds) * 1e9
+        }
+    }
+
+    documents = synthetic_documents(args.documents)
+    queries = synthetic_queries(documents, args.queries)
+    faiss_service = FaissService(FakeEmbeddings())
+    _, vdb = faiss_service.create_temporary_database(documents)
+
+    def search_all():
+        for query in queries:
+            faiss_service.similarity_search(vdb, query, k=5)
+
+    search_all()
+    for mode in ("disabled", "enabled"):
+        configure_metrics("memory" if mode == "enabled" else None)
+        seconds = min(per_call_seconds(search_all, 1) for _ in range(3))
+        results.setdefault("similarity_search_qps", {})[mode] = len(queries) / seconds
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+    Retrieve-then-rerank on an approximate index: recall@k against exact search
+    and latency without reranking, with the cosine reranker (cold and with a warm
+    score cache), and how often a tight budget falls back to vector order.
+
+    python -m benchmarks.reranking --documents 200 --queries 200 --depth 20
+"""
+import json
+import time
+import argparse
+import numpy as np
+from src.services.faiss import FaissService
+from src.services.rerankers import CosineReranker
+from src.services.fake_embeddings import FakeEmbeddings
+from benchmarks.common import synthetic_documents, synthetic_queries
+from benchmarks.retrieval import chunk_key, exact_neighbours
+
+
+def run(faiss_service: FaissService, vdb, queries: list, truth: list, k: int) -> dict:
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        results = faiss_service.similarity_search(vdb, query, k=k)
+        latencies.append(time.perf_counter() - start)
+        expected = {tuple(key) for key in expected}
+        hits += sum(tuple(chunk_key(doc)) in expected for doc in results)
+    return {
+        "recall_at_k": hits / max(1, sum(len(expected) for expected in truth)),
+        "p50_seconds": float(np.percentile(latencies, 50)),
+        "p99_seconds": float(np.percentile(latencies, 99))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--depth", type=int, default=20)
+    parser.add_argument("--index-factory", default="IVF{nlist},PQ16x4")
+    parser.add_argument("--tight-budget-ms", type=float, default=0.01)
+    args = parser.parse_args()
+
+    documents = synthetic_documents(args.documents)
+    queries = synthetic_queries(documents, args.queries)
+    embeddings = FakeEmbeddings(dense=True)
+    truth = exact_neighbours(FaissService(embeddings), documents, queries, args.k)
+
+    faiss_service = FaissService(embeddings, index_factory=args.index_factory, nprobe=8, rerank_depth=args.depth)
+    _, vdb = faiss_service.create_temporary_database(documents)
+
+    results = {"chunks": vdb.index.ntotal, "depth": args.depth, "vector": run(faiss_service, vdb, queries, truth, args.k)}
+
+    faiss_service.reranker = CosineReranker(embeddings)
+    results["cosine_cold"] = run(faiss_service, vdb, queries, truth, args.k)
+    results["cosine_cached"] = run(faiss_service, vdb, queries, truth, args.k)
+
+    faiss_service.reranker = CosineReranker(embeddings, cache_size=0)
+    faiss_service.rerank_budget_ms = args.tight_budget_ms
+    results["tight_budget"] = run(faiss_service, vdb, queries, truth, args.k)
+    results["tight_budget"]["fallbacks"] = faiss_service.get_reranker_stats()["budget_exceeded"]
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
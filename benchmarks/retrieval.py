@@ -0,0 +1,228 @@
+"""
+    Retrieval benchmark per index configuration: ingest throughput of
+    create_local_database, load_local_database time and resident memory (in a
+    fresh subprocess), similarity_search p50/p99 latency and recall@k against
+    exact search, and index bytes per vector. Chunks are identified by
+    (source, chunk_id), so recall is comparable across databases built separately.
+    Embeddings are dense random projections unless --sparse is given, so compact
+    storage modes behave as they would with real embeddings.
+
+    python -m benchmarks.retrieval --documents 200 --queries 200 --output results.json
+    python -m benchmarks.retrieval --baseline results.json
+
+    With --baseline the run exits with status 1 when recall drops or a timing
+    grows past the tolerances.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import faiss
+from src.services.faiss import FaissService
+from src.services.fake_embeddings import FakeEmbeddings
+from benchmarks.common import synthetic_documents, synthetic_queries
+from benchmarks.load_database import resident_memory_mb
+
+# name: (FaissService arguments, load_local_database arguments)
+CONFIGS = {
+    "flat": ({}, {}),
+    "flat_mmap": ({}, {"mmap": True}),
+    "flat_sqlite": ({"chunk_store": "sqlite"}, {}),
+    "ivf": ({"index_factory": "IVF{nlist},Flat", "nprobe": 8}, {}),
+    "ivf_pq": ({"index_factory": "IVF{nlist},PQ16x4", "nprobe": 8}, {}),
+    "hnsw": ({"index_factory": "HNSW32", "ef_search": 64}, {}),
+    "hybrid": ({"hybrid_search": True}, {}),
+    "float16": ({"vector_storage": "float16"}, {}),
+    "int8": ({"vector_storage": "int8"}, {}),
+    "binary": ({"vector_storage": "binary"}, {}),
+    "binary_rescore_10": ({"vector_storage": "binary", "rescore_factor": 10}, {}),
+    "truncated_half": ({"truncate_dim": 128}, {}),
+    "int8_truncated_half": ({"vector_storage": "int8", "truncate_dim": 128}, {})
+}
+
+# Metrics checked against a baseline and whether higher values are better
+TRACKED_METRICS = {
+    "recall_at_k": True,
+    "ingest_chunks_per_second": True,
+    "load_seconds": False,
+    "p50_seconds": False,
+    "p99_seconds": False
+}
+
+
+def chunk_key(document) -> list:
+    return [document.metadata.get("source"), document.metadata.get("chunk_id")]
+
+
+def exact_neighbours(faiss_service: FaissService, documents: list, queries: list, k: int) -> list:
+    # Brute force L2 over the same chunks and vectors the databases are built from
+    chunks = faiss_service._process_documents(documents)
+    embeddings = faiss_service.base_embeddings
+    index = faiss.IndexFlatL2(embeddings.dimension)
+    index.add(embeddings.embed_array([chunk.page_content for chunk in chunks]))
+    _, positions = index.search(embeddings.embed_array(queries), k)
+    return [[chunk_key(chunks[p]) for p in row if p != -1] for row in positions]
+
+
+def measure(config: str, index_path: str, truth_path: str, dimension: int, k: int, dense: bool) -> dict:
+    service_arguments, load_arguments = CONFIGS[config]
+    faiss_service = FaissService(FakeEmbeddings(dimension=dimension, dense=dense), **service_arguments)
+    with open(truth_path) as f:
+        truth = json.load(f)
+
+    before = resident_memory_mb()
+    start = time.perf_counter()
+    vdb = faiss_service.load_local_database(index_path, **load_arguments)
+    load_seconds = time.perf_counter() - start
+    rss_delta_mb = resident_memory_mb() - before
+
+    latencies, hits = [], 0
+    for query, expected in zip(truth["queries"], truth["neighbours"]):
+        start = time.perf_counter()
+        results = faiss_service.similarity_search(vdb, query, k=k)
+        latencies.append(time.perf_counter() - start)
+        expected = {tuple(key) for key in expected}
+        hits += sum(tuple(chunk_key(doc)) in expected for doc in results)
+
+    return {
+        "bytes_per_vector": faiss_service.get_database_info(vdb)["bytes_per_vector"],
+        "load_seconds": load_seconds,
+        "rss_delta_mb": rss_delta_mb,
+        "p50_seconds": float(np.percentile(latencies, 50)),
+        "p99_seconds": float(np.percentile(latencies, 99)),
+        "recall_at_k": hits / max(1, sum(len(expected) for expected in truth["neighbours"]))
+    }
+
+
+def run_config(config: str,
+               documents: list,
+               truth_path: str,
+               dimension: int,
+               k: int,
+               dense: bool,
+               work_dir: str) -> dict:
+    service_arguments, _ = CONFIGS[config]
+    faiss_service = FaissService(FakeEmbeddings(dimension=dimension, dense=dense), **service_arguments)
+    index_path = os.path.join(work_dir, config)
+
+    start = time.perf_counter()
+    vdb = faiss_service.create_local_database(documents, index_path)
+    ingest_seconds = time.perf_counter() - start
+    chunks = vdb.index.ntotal
+    del vdb
+
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.retrieval", "--measure", config, "--index-path", index_path,
+         "--truth", truth_path, "--dimension", str(dimension), "--k", str(k)] + ([] if dense else ["--sparse"]),
+        check=True, capture_output=True, text=True
+    ).stdout
+    result = {
+        "chunks": chunks,
+        "ingest_seconds": ingest_seconds,
+        "ingest_chunks_per_second": chunks / ingest_seconds,
+        "disk_mb": sum(
+            os.path.getsize(os.path.join(index_path, name)) for name in os.listdir(index_path)
+        ) / 2 ** 20
+    }
+    result.update(json.loads(output.strip().splitlines()[-1]))
+    return result
+
+
+def find_regressions(results: dict,
+                     baseline: dict,
+                     recall_tolerance: float,
+                     time_tolerance: float,
+                     time_slack: float) -> list:
+    regressions = []
+    for config, metrics in results["configs"].items():
+        previous = baseline.get("configs", {}).get(config)
+        if previous is None:
+            continue
+        for metric, higher_is_better in TRACKED_METRICS.items():
+            if metric not in previous:
+                continue
+            current, before = metrics[metric], previous[metric]
+            if metric == "recall_at_k":
+                failed = current < before - recall_tolerance
+            elif higher_is_better:
+                failed = current < before / (1 + time_tolerance)
+            else:
+                # Sub-millisecond latencies jitter by more than any relative tolerance
+                failed = current > before * (1 + time_tolerance) + time_slack
+            if failed:
+                regressions.append({"config": config, "metric": metric, "baseline": before, "current": current})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--sparse", action="store_true", help="Hashed word vectors without the dense projection")
+    parser.add_argument("--configs", nargs="+", choices=list(CONFIGS), default=list(CONFIGS))
+    parser.add_argument("--output", help="Also write the results to this file")
+    parser.add_argument("--baseline", help="Results of an earlier run to compare against")
+    parser.add_argument("--recall-tolerance", type=float, default=0.02, help="Allowed absolute recall drop")
+    parser.add_argument("--time-tolerance", type=float, default=0.5,
+                        help="Allowed relative growth of timings, 0.5 means 50%% slower")
+    parser.add_argument("--time-slack", type=float, default=0.001,
+                        help="Seconds a timing may grow on top of --time-tolerance")
+    parser.add_argument("--measure", choices=list(CONFIGS), help=argparse.SUPPRESS)
+    parser.add_argument("--index-path", help=argparse.SUPPRESS)
+    parser.add_argument("--truth", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.index_path, args.truth, args.dimension, args.k,
+                                 not args.sparse)))
+        return
+
+    documents = synthetic_documents(args.documents)
+    queries = synthetic_queries(documents, args.queries)
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        truth_path = os.path.join(work_dir, "truth.json")
+        neighbours = exact_neighbours(FaissService(FakeEmbeddings(dimension=args.dimension, dense=not args.sparse)),
+                                      documents, queries, args.k)
+        with open(truth_path, "w") as f:
+            json.dump({"queries": queries, "neighbours": neighbours}, f)
+
+        results = {
+            "documents": args.documents,
+            "queries": args.queries,
+            "k": args.k,
+            "dimension": args.dimension,
+            "dense": not args.sparse,
+            "configs": {
+                config: run_config(config, documents, truth_path, args.dimension, args.k, not args.sparse, work_dir)
+                for config in args.configs
+            }
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        results["regressions"] = find_regressions(results, baseline, args.recall_tolerance,
+                                                 args.time_tolerance, args.time_slack)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+    if results.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
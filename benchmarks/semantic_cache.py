@@ -0,0 +1,82 @@
+"""
+    Replays a chat session against SemanticCache: a pool of distinct questions
+    asked repeatedly, part of them reworded (one word dropped). Reports the hit
+    rate, how many hits returned the answer of a different question, the lookup
+    latency, and the per-turn latency with --llm-seconds standing in for the LLM
+    call. Halfway through, documents are added to the database, which must
+    invalidate every cached answer.
+
+    python -m benchmarks.semantic_cache --questions 50 --turns 1000 --threshold 0.9
+"""
+import json
+import time
+import random
+import argparse
+import numpy as np
+from src.services.faiss import FaissService
+from src.services.semantic_cache import SemanticCache
+from src.services.fake_embeddings import FakeEmbeddings
+from benchmarks.common import synthetic_documents, synthetic_queries
+
+
+def reword(question: str, rng: random.Random) -> str:
+    words = question.split()
+    del words[rng.randrange(len(words))]
+    return " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--reworded", type=float, default=0.3, help="Share of turns asking a reworded question")
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--llm-seconds", type=float, default=2.0, help="Assumed latency of one LLM answer")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    documents = synthetic_documents(args.documents)
+    questions = synthetic_queries(documents, args.questions, words=12)
+    faiss_service = FaissService(FakeEmbeddings(dense=True), query_cache_size=1024)
+    vdb_id, vdb = faiss_service.create_temporary_database(documents[:-1])
+    cache = SemanticCache(threshold=args.threshold)
+
+    lookups, wrong_hits, entries_before_add = [], 0, 0
+    for turn in range(args.turns):
+        if turn == args.turns // 2:
+            entries_before_add = len(cache)
+            faiss_service.add_documents_to_database(vdb, documents[-1:])
+
+        asked = rng.randrange(len(questions))
+        question = reword(questions[asked], rng) if rng.random() < args.reworded else questions[asked]
+        embedding = faiss_service.embed_query(question)
+        version = faiss_service.database_version(vdb_id)
+
+        start = time.perf_counter()
+        answer = cache.lookup(vdb_id, version, question, embedding)
+        lookups.append(time.perf_counter() - start)
+        if answer is None:
+            cache.store(vdb_id, version, question, f"answer {asked}", embedding)
+        elif answer != f"answer {asked}":
+            wrong_hits += 1
+
+    stats = cache.stats()
+    print(json.dumps({
+        "turns": args.turns,
+        "questions": args.questions,
+        "threshold": args.threshold,
+        "hit_rate": stats["hit_rate"],
+        "wrong_hits": wrong_hits,
+        "entries": stats["entries"],
+        "invalidations": stats["invalidations"],
+        "entries_before_add": entries_before_add,
+        "lookup_p50_seconds": float(np.percentile(lookups, 50)),
+        "lookup_p99_seconds": float(np.percentile(lookups, 99)),
+        "turn_seconds_without_cache": args.llm_seconds,
+        "turn_seconds_with_cache": (1 - stats["hit_rate"]) * args.llm_seconds + float(np.mean(lookups))
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
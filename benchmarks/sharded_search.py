@@ -0,0 +1,68 @@
+"""
+    Splits a corpus into shards saved as separate databases and compares
+    ShardedSearch against one database holding everything: throughput and how
+    often both return the same top-k chunks.
+
+    python -m benchmarks.sharded_search --documents 300 --shards 4 --queries 500
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+from src.services.faiss import FaissService
+from src.services.sharding import ShardedSearch
+from src.services.fake_embeddings import FakeEmbeddings
+from benchmarks.common import synthetic_documents, synthetic_queries
+
+
+def keys(results: list) -> set:
+    return {(doc.metadata["source"], doc.metadata["chunk_id"]) for doc in results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=300)
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--index-factory", default=None)
+    args = parser.parse_args()
+
+    documents = synthetic_documents(args.documents)
+    queries = synthetic_queries(documents, args.queries)
+    faiss_service = FaissService(FakeEmbeddings(), index_factory=args.index_factory)
+
+    work_dir = tempfile.mkdtemp()
+    single = faiss_service.create_local_database(documents, os.path.join(work_dir, "all"))
+    sharded = ShardedSearch(faiss_service)
+    for shard in range(args.shards):
+        index_path = os.path.join(work_dir, f"shard_{shard}")
+        faiss_service.create_local_database(documents[shard::args.shards], index_path)
+        sharded.load_shard(f"shard_{shard}", index_path)
+
+    start = time.perf_counter()
+    single_results = [faiss_service.similarity_search(single, query, k=args.k) for query in queries]
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sharded_results = [sharded.similarity_search(query, k=args.k) for query in queries]
+    sharded_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sharded.similarity_search_batch(queries, k=args.k)
+    sharded_batch_seconds = time.perf_counter() - start
+    sharded.close()
+
+    print(json.dumps({
+        "chunks": single.index.ntotal,
+        "shards": args.shards,
+        "single_qps": len(queries) / single_seconds,
+        "sharded_qps": len(queries) / sharded_seconds,
+        "sharded_batch_qps": len(queries) / sharded_batch_seconds,
+        "same_top_k": sum(keys(a) == keys(b) for a, b in zip(single_results, sharded_results)) / len(queries)
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
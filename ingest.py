@@ -0,0 +1,94 @@
+"""
+    Headless ingestion: builds and saves FAISS indexes outside the Streamlit app.
+
+    python ingest.py run docs/ --index indexes/docs      # index now, in this process
+    python ingest.py submit docs/ --index indexes/docs   # queue a job for a worker
+    python ingest.py worker                              # process queued jobs until stopped
+    python ingest.py status [job_id]                     # print jobs as JSON
+
+    Jobs save checkpoints as they go; a job interrupted by a crash or a killed
+    worker is picked up again by the next worker and skips the documents it had
+    already indexed.
+"""
+import os
+import sys
+import json
+import argparse
+from src.utils.settings import Settings, get_settings
+from src.utils.metrics import configure_metrics
+from src.utils.extractors import DocumentExtractor
+from src.services.azure_openai import AzureOpenaiService
+from src.services.factory import create_embeddings, create_faiss_service
+from src.services.ingestion import IngestionQueue, IngestionWorker
+
+
+def load_worker(sets: Settings) -> IngestionWorker:
+    # Same service as the app, so it can load the indexes built here
+    azai_serv = AzureOpenaiService(sets=sets)
+    faiss_service = create_faiss_service(sets, create_embeddings(sets, azai_serv), with_reranker=False)
+    return IngestionWorker(IngestionQueue(sets.ingest_queue_dir),
+                           DocumentExtractor(max_workers=None),
+                           faiss_service,
+                           checkpoint_every=sets.ingest_checkpoint_every)
+
+
+def print_progress(progress: dict) -> None:
+    print(f"\r{progress['documents_done']}/{progress['documents_total']} documents, "
+          f"{progress['chunks']} chunks ({progress['fraction']:.0%})", end="", file=sys.stderr, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("run", "submit"):
+        command = commands.add_parser(name)
+        command.add_argument("source", help="PDF file or folder of PDFs")
+        command.add_argument("--index", help="Index folder, by default named after source under INGEST_INDEX_DIR")
+    worker_command = commands.add_parser("worker")
+    worker_command.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    status_command = commands.add_parser("status")
+    status_command.add_argument("job_id", nargs="?")
+    args = parser.parse_args()
+
+    sets = get_settings()
+    configure_metrics(sets.metrics_exporter, sets.metrics_path)
+    queue = IngestionQueue(sets.ingest_queue_dir)
+
+    if args.command == "status":
+        jobs = queue.get(args.job_id) if args.job_id else queue.list_jobs()
+        print(json.dumps(jobs, indent=2))
+        return
+
+    if args.command in ("run", "submit"):
+        index_path = args.index or os.path.join(
+            sets.ingest_index_dir, os.path.splitext(os.path.basename(os.path.normpath(args.source)))[0]
+        )
+        job = queue.submit(args.source, index_path)
+        if args.command == "submit":
+            print(job["id"])
+            return
+        # Claimed like any queued job, so a concurrent worker cannot pick it up as well
+        claimed = queue.claim(job["id"])
+        if claimed is None:
+            print(f"Job {job['id']} was already claimed by a worker, follow it with: "
+                  f"python ingest.py status {job['id']}", file=sys.stderr)
+            return
+        worker = load_worker(sets)
+        job = worker.run_job(claimed, progress_callback=print_progress)
+        print(file=sys.stderr)
+        print(json.dumps(job, indent=2))
+        return
+
+    worker = load_worker(sets)
+    if args.once:
+        while worker.run_once() is not None:
+            pass
+    else:
+        try:
+            worker.run_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
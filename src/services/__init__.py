@@ -1,2 +1,27 @@
-from .azure_openai import AzureOpenaiService
-from .groq_cloud import GroqCloudService
\ No newline at end of file
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .azure_openai import AzureOpenaiService
+    from .groq_cloud import GroqCloudService
+
+# Loaded on first access (PEP 562), so importing any service module does not
+# import both LLM providers
+_LAZY_ATTRIBUTES = {
+    "AzureOpenaiService": ".azure_openai",
+    "GroqCloudService": ".groq_cloud"
+}
+
+__all__ = ["AzureOpenaiService", "GroqCloudService"]
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
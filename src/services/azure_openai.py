@@ -1,6 +1,10 @@
+from typing import TYPE_CHECKING, Any, Dict, List
 from src.utils.logging import setup_logger
 from src.utils.settings import Settings
-from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
+from src.services.http_clients import get_client_pool
+
+if TYPE_CHECKING:
+    from langchain_openai import AzureChatOpenAI
 
 logging = setup_logger(__name__)
 class AzureOpenaiService:
@@ -12,22 +16,50 @@ class AzureOpenaiService:
         self.embedding_deployment_model = sets.embedding_deployment_model
         self.azure_openai_api_key = sets.azure_openai_api_key
         self.azure_openai_endpoint = sets.azure_openai_endpoint
+        # LLM and embedding objects are built once and share the endpoint's pooled clients
+        self.pool = get_client_pool(timeout=sets.llm_timeout,
+                                    connect_timeout=sets.llm_connect_timeout,
+                                    max_connections=sets.http_max_connections,
+                                    max_concurrency=sets.llm_max_concurrency)
+        self._llms: Dict[float, "AzureChatOpenAI"] = {}
+        self._embeddings = None
     
     def get_llm(self, temperaturte: float = 0.1):
-        llm_instance = AzureChatOpenAI(
-            api_key=self.azure_openai_api_key,
-            azure_endpoint=self.azure_openai_endpoint,
-            azure_deployment=self.llm_deployment_model,
-            api_version=self.llm_api_version,
-            temperature=temperaturte
-        )
-        return llm_instance
+        if temperaturte not in self._llms:
+            # langchain_openai is imported when a model is first needed, not with the module
+            from langchain_openai import AzureChatOpenAI
+            self._llms[temperaturte] = AzureChatOpenAI(
+                api_key=self.azure_openai_api_key,
+                azure_endpoint=self.azure_openai_endpoint,
+                azure_deployment=self.llm_deployment_model,
+                api_version=self.llm_api_version,
+                temperature=temperaturte,
+                timeout=self.sets.llm_timeout,
+                http_client=self.pool.client(self.azure_openai_endpoint),
+                http_async_client=self.pool.async_client(self.azure_openai_endpoint)
+            )
+        return self._llms[temperaturte]
     
     def get_embeddings(self):
-        embeddings_instance = AzureOpenAIEmbeddings(
-            api_key=self.azure_openai_api_key,
-            azure_endpoint=self.azure_openai_endpoint,
-            azure_deployment=self.embedding_deployment_model,
-            api_version=self.embedding_api_version
-        )
-        return embeddings_instance
\ No newline at end of file
+        if self._embeddings is None:
+            from langchain_openai import AzureOpenAIEmbeddings
+            self._embeddings = AzureOpenAIEmbeddings(
+                api_key=self.azure_openai_api_key,
+                azure_endpoint=self.azure_openai_endpoint,
+                azure_deployment=self.embedding_deployment_model,
+                api_version=self.embedding_api_version,
+                timeout=self.sets.llm_timeout,
+                http_client=self.pool.client(self.azure_openai_endpoint),
+                http_async_client=self.pool.async_client(self.azure_openai_endpoint)
+            )
+        return self._embeddings
+
+    async def ainvoke(self, messages: Any, temperaturte: float = 0.1):
+        # At most llm_max_concurrency requests per endpoint are in flight
+        return await self.pool.submit(self.get_llm(temperaturte).ainvoke(messages), self.azure_openai_endpoint)
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        return await self.pool.submit(self.get_embeddings().aembed_documents(texts), self.azure_openai_endpoint)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.pool.submit(self.get_embeddings().aembed_query(text), self.azure_openai_endpoint)
@@ -0,0 +1,236 @@
+import os
+import json
+import mmap
+import zlib
+import sqlite3
+import threading
+from typing import Dict, Iterator, List, Union
+from collections.abc import Mapping
+import numpy as np
+from langchain.docstore.document import Document
+from langchain_community.docstore.base import Docstore, AddableMixin
+from src.utils import setup_logger
+
+logger = setup_logger(__name__)
+
+MMAP_DOCSTORE_FILE = "docstore.jsonl"
+MMAP_OFFSETS_FILE = "docstore.offsets.npy"
+MMAP_IDS_FILE = "docstore.ids.npy"
+MMAP_SORTED_IDS_FILE = "docstore.sorted_ids.npy"
+MMAP_SORTED_POSITIONS_FILE = "docstore.sorted_positions.npy"
+MMAP_FILES = (MMAP_DOCSTORE_FILE, MMAP_OFFSETS_FILE, MMAP_IDS_FILE,
+              MMAP_SORTED_IDS_FILE, MMAP_SORTED_POSITIONS_FILE)
+SQLITE_DOCSTORE_FILE = "chunks.sqlite"
+
+
+def write_mmap_docstore(vdb, index_path: str) -> None:
+    """
+        Writes the chunks as JSON lines in index position order, plus the offset and
+        id arrays MmapDocstore needs to read a single chunk without loading the rest.
+    """
+    total = len(vdb.index_to_docstore_id)
+    offsets = np.zeros(total + 1, dtype=np.int64)
+    ids = []
+
+    with open(os.path.join(index_path, MMAP_DOCSTORE_FILE), "wb") as f:
+        for position in range(total):
+            doc_id = vdb.index_to_docstore_id[position]
+            doc = vdb.docstore.search(doc_id)
+            line = json.dumps({
+                "id": doc_id,
+                "page_content": doc.page_content,
+                "metadata": doc.metadata
+            }, ensure_ascii=False).encode("utf-8") + b"\n"
+            f.write(line)
+            offsets[position + 1] = offsets[position] + len(line)
+            ids.append(doc_id)
+
+    ids = np.array(ids, dtype=str) if ids else np.array([], dtype="U1")
+    order = np.argsort(ids, kind="stable")
+    np.save(os.path.join(index_path, MMAP_OFFSETS_FILE), offsets)
+    np.save(os.path.join(index_path, MMAP_IDS_FILE), ids)
+    np.save(os.path.join(index_path, MMAP_SORTED_IDS_FILE), ids[order])
+    np.save(os.path.join(index_path, MMAP_SORTED_POSITIONS_FILE), order.astype(np.int64))
+    logger.debug(f"Memory-mappable docstore with {total} chunks written to {index_path}")
+
+
+class MmapDocstore(Docstore):
+    def __init__(self, index_path: str):
+        """
+            Read-only docstore over the files written by write_mmap_docstore. Nothing is
+            decoded up front; the OS pages chunks in on demand and shares them between
+            processes.
+        """
+        self.index_path = index_path
+        self.offsets = np.load(os.path.join(index_path, MMAP_OFFSETS_FILE), mmap_mode="r")
+        self.ids = np.load(os.path.join(index_path, MMAP_IDS_FILE), mmap_mode="r")
+        self.sorted_ids = np.load(os.path.join(index_path, MMAP_SORTED_IDS_FILE), mmap_mode="r")
+        self.sorted_positions = np.load(os.path.join(index_path, MMAP_SORTED_POSITIONS_FILE), mmap_mode="r")
+
+        self._file = open(os.path.join(index_path, MMAP_DOCSTORE_FILE), "rb")
+        # mmap cannot map an empty file
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if len(self.ids) else b""
+
+    @staticmethod
+    def exists(index_path: str) -> bool:
+        return all(os.path.exists(os.path.join(index_path, name)) for name in MMAP_FILES)
+
+    def position_of(self, search: str) -> int:
+        slot = int(np.searchsorted(self.sorted_ids, search))
+        if slot < len(self.sorted_ids) and self.sorted_ids[slot] == search:
+            return int(self.sorted_positions[slot])
+        return -1
+
+    def search(self, search: str) -> Union[str, Document]:
+        position = self.position_of(search)
+        if position == -1:
+            return f"ID {search} not found."
+
+        record = json.loads(self._data[self.offsets[position]:self.offsets[position + 1]])
+        return Document(id=record["id"], page_content=record["page_content"], metadata=record["metadata"])
+
+    def delete(self, ids) -> None:
+        raise ValueError("MmapDocstore is read-only")
+
+    def close(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+
+class PositionIdMap(Mapping):
+    """
+        index_to_docstore_id backed by the memory-mapped id array, so loading does not
+        build a dict with one entry per vector.
+    """
+
+    def __init__(self, ids: np.ndarray):
+        self.ids = ids
+
+    def __getitem__(self, position: int) -> str:
+        position = int(position)
+        if position < 0 or position >= len(self.ids):
+            raise KeyError(position)
+        return str(self.ids[position])
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self.ids)))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def to_dict(self) -> Dict[int, str]:
+        return {position: str(doc_id) for position, doc_id in enumerate(self.ids)}
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    def __init__(self, path: str, read_only: bool = False, mmap_size: int = 0):
+        """
+            Chunk store keyed by docstore id. Chunk text is zlib-compressed and only the
+            rows of search hits are read. The vectors table keeps the index position of
+            every id, so no pickle is needed to rebuild index_to_docstore_id.
+
+            path: SQLite file
+            read_only: Open the file read-only
+            mmap_size: Bytes of the file SQLite may memory-map
+        """
+        self.path = path
+        self.read_only = read_only
+        self.mmap_size = mmap_size
+        self._lock = threading.Lock()
+        self._connect()
+
+    def _connect(self) -> None:
+        if self.read_only:
+            self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "id TEXT PRIMARY KEY, content BLOB NOT NULL, metadata TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS vectors (position INTEGER PRIMARY KEY, id TEXT NOT NULL)"
+            )
+            self._conn.commit()
+        if self.mmap_size:
+            self._conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+
+    @staticmethod
+    def exists(index_path: str) -> bool:
+        return os.path.exists(os.path.join(index_path, SQLITE_DOCSTORE_FILE))
+
+    @classmethod
+    def write(cls, path: str, vdb) -> "SQLiteDocstore":
+        """
+            Writes every chunk of vdb into a new file at path, replacing it atomically.
+        """
+        tmp_path = f"{path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        store = cls(tmp_path)
+        ids = list(vdb.index_to_docstore_id.values())
+        for start in range(0, len(ids), 1000):
+            batch = ids[start:start + 1000]
+            store.add({doc_id: vdb.docstore.search(doc_id) for doc_id in batch})
+        store.save_positions(vdb.index_to_docstore_id)
+        store.close()
+
+        os.replace(tmp_path, path)
+        return cls(path)
+
+    def search(self, search: str) -> Union[str, Document]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, metadata FROM chunks WHERE id = ?", (search,)
+            ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=zlib.decompress(row[0]).decode("utf-8"),
+                        metadata=json.loads(row[1]))
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        rows = [
+            (doc_id, zlib.compress(doc.page_content.encode("utf-8")), json.dumps(doc.metadata, ensure_ascii=False))
+            for doc_id, doc in texts.items()
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO chunks (id, content, metadata) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def delete(self, ids: List) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", [(doc_id,) for doc_id in ids])
+            self._conn.commit()
+
+    def load_positions(self) -> Dict[int, str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT position, id FROM vectors ORDER BY position").fetchall()
+        return dict(rows)
+
+    def save_positions(self, index_to_docstore_id) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM vectors")
+            self._conn.executemany(
+                "INSERT INTO vectors (position, id) VALUES (?, ?)",
+                [(int(position), doc_id) for position, doc_id in index_to_docstore_id.items()]
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # Connections cannot be pickled, e.g. when FAISS.save_local is called directly
+    def __getstate__(self) -> dict:
+        return {"path": self.path, "read_only": self.read_only, "mmap_size": self.mmap_size}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._connect()
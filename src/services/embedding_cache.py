@@ -0,0 +1,200 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import List, Dict, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from src.utils import setup_logger
+from src.services.query_cache import LRUCache
+
+logger = setup_logger(__name__)
+
+
+def resolve_model_name(embeddings) -> str:
+    # AzureOpenAIEmbeddings exposes the deployment, other providers the model name
+    for attr in ("deployment", "model", "model_name"):
+        value = getattr(embeddings, attr, None)
+        if isinstance(value, str) and value:
+            return value
+    # Wrappers (BatchedEmbeddings, CachedEmbeddings) are named after the model they wrap
+    wrapped = getattr(embeddings, "embeddings", None)
+    if isinstance(wrapped, Embeddings):
+        return resolve_model_name(wrapped)
+    return type(embeddings).__name__
+
+
+class EmbeddingCache:
+    def __init__(self,
+                 cache_path: str,
+                 max_entries: int = 200_000):
+        """
+            cache_path: SQLite file where the vectors are stored
+            max_entries: Maximum number of vectors kept before LRU eviction
+        """
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)"
+        )
+        self._conn.commit()
+        logger.info(f"EmbeddingCache initialized at {cache_path} with max_entries={max_entries}")
+
+    @staticmethod
+    def make_key(text: str, model_name: str) -> str:
+        return hashlib.sha256(f"{model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+
+        with self._lock:
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(unique_keys) - len(found)
+
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        if not items:
+            return
+
+        now = time.time()
+        rows = [
+            (key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for key, vector in items.items()
+        ]
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                rows
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        overflow = total - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                "SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+            logger.debug(f"Evicted {overflow} embeddings from cache")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self,
+                 embeddings: Embeddings,
+                 cache: EmbeddingCache,
+                 model_name: Optional[str] = None,
+                 query_cache_size: int = 1024):
+        """
+            embeddings: Embedding used for the texts missing from the cache
+            cache: EmbeddingCache shared between services
+            model_name: Namespace for the cache keys, resolved from the embeddings if omitted
+            query_cache_size: Query embeddings kept in process; only queries missing from it
+                              read (and refresh) or write the SQLite cache. 0 disables it
+        """
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name or resolve_model_name(embeddings)
+        self._query_cache = LRUCache(query_cache_size) if query_cache_size else None
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self.cache.make_key(text, self.model_name) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        # Only embed each missing text once, even if it is repeated in the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        if missing:
+            logger.info(f"Embedding cache: {len(cached)} hits, {len(missing)} texts sent to the embedding model")
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            new_items = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(new_items)
+            cached.update({key: np.asarray(vector, dtype=np.float32) for key, vector in new_items.items()})
+        else:
+            logger.info(f"Embedding cache: all {len(texts)} texts served from cache")
+
+        return [cached[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        # Queries get their own namespace since some models embed them differently
+        key = self.cache.make_key(text, f"{self.model_name}:query")
+        if self._query_cache is not None:
+            vector = self._query_cache.get(key)
+            if vector is not None:
+                return list(vector)
+
+        cached = self.cache.get_many([key])
+        if key in cached:
+            vector = cached[key].tolist()
+        else:
+            vector = list(self.embeddings.embed_query(text))
+            self.cache.put_many({key: vector})
+
+        # Kept as a tuple, callers get their own list
+        if self._query_cache is not None:
+            self._query_cache.put(key, tuple(vector))
+        return vector
@@ -0,0 +1,142 @@
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Callable
+from langchain_core.embeddings import Embeddings
+from src.utils import setup_logger
+from src.utils.metrics import metrics
+
+logger = setup_logger(__name__)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    if getattr(error, "status_code", None) == 429:
+        return True
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    return type(error).__name__ == "RateLimitError"
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after") if hasattr(headers, "get") else None
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text with the OpenAI tokenizers
+    return len(text) // 4 + 1
+
+
+class TokenBudget:
+    def __init__(self, tokens_per_minute: int):
+        self.tokens_per_minute = tokens_per_minute
+        self._available = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int) -> None:
+        # A single request larger than the budget is let through once the bucket is full
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                refill = (now - self._updated) * self.tokens_per_minute / 60.0
+                self._available = min(self.tokens_per_minute, self._available + refill)
+                self._updated = now
+
+                if self._available >= tokens:
+                    self._available -= tokens
+                    return
+                wait = (tokens - self._available) * 60.0 / self.tokens_per_minute
+
+            logger.debug(f"Token budget exhausted, waiting {wait:.2f}s")
+            time.sleep(wait)
+
+
+class BatchedEmbeddings(Embeddings):
+    def __init__(self,
+                 embeddings: Embeddings,
+                 batch_size: int = 64,
+                 max_concurrency: int = 4,
+                 tokens_per_minute: Optional[int] = None,
+                 max_retries: int = 6,
+                 initial_backoff: float = 1.0,
+                 max_backoff: float = 60.0,
+                 token_counter: Callable[[str], int] = estimate_tokens):
+        """
+            embeddings: Embedding that receives each batch
+            batch_size: Number of texts sent per request
+            max_concurrency: Number of requests in flight at the same time
+            tokens_per_minute: Optional token budget shared by all requests
+            max_retries: Retries per batch on rate limit (429) errors
+            initial_backoff: First backoff in seconds, doubled on every retry
+            max_backoff: Upper bound for a single backoff
+            token_counter: Function used to estimate the tokens of a text
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.token_counter = token_counter
+        self.token_budget = TokenBudget(tokens_per_minute) if tokens_per_minute else None
+        self.rate_limited = 0
+        logger.info(f"BatchedEmbeddings initialized with batch_size={batch_size}, "
+                    f"max_concurrency={max_concurrency}, tokens_per_minute={tokens_per_minute}")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        logger.info(f"Embedding {len(texts)} texts in {len(batches)} batches")
+        start = time.perf_counter()
+
+        if len(batches) == 1 or self.max_concurrency == 1:
+            results = [self._embed_batch(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+                # map keeps the input order of the batches
+                results = list(executor.map(self._embed_batch, batches))
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"Embedded {len(texts)} texts in {elapsed:.2f}s ({len(texts) / max(elapsed, 1e-9):.1f} texts/s)")
+        return [vector for batch in results for vector in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._with_retries(lambda: self.embeddings.embed_query(text), self.token_counter(text))
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        tokens = sum(self.token_counter(text) for text in batch)
+        return self._with_retries(lambda: self.embeddings.embed_documents(batch), tokens)
+
+    def _with_retries(self, call, tokens: int):
+        backoff = self.initial_backoff
+        for attempt in range(self.max_retries + 1):
+            if self.token_budget is not None:
+                self.token_budget.acquire(tokens)
+            try:
+                return call()
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                self.rate_limited += 1
+                metrics.increment("embeddings.rate_limited")
+                # Honor the server hint when present, otherwise exponential backoff with jitter
+                wait = retry_after_seconds(e) or min(backoff, self.max_backoff) * (0.5 + random.random() / 2)
+                logger.warning(f"Rate limited by embedding endpoint, retry {attempt + 1}/{self.max_retries} in {wait:.2f}s")
+                time.sleep(wait)
+                backoff *= 2
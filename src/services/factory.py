@@ -0,0 +1,55 @@
+import os
+from src.utils import setup_logger
+from src.utils.settings import Settings
+from src.services.azure_openai import AzureOpenaiService
+from src.services.faiss import FaissService
+from src.services.embedding_cache import EmbeddingCache, CachedEmbeddings
+from src.services.embedding_pipeline import BatchedEmbeddings
+from src.services.rerankers import create_reranker
+
+logger = setup_logger(__name__)
+
+EMBEDDING_CACHE_PATH = os.path.join(".cache", "embeddings.sqlite")
+
+
+def create_embeddings(sets: Settings, azai_serv: AzureOpenaiService) -> BatchedEmbeddings:
+    return BatchedEmbeddings(azai_serv.get_embeddings(),
+                             batch_size=sets.embedding_batch_size,
+                             max_concurrency=sets.embedding_max_concurrency,
+                             tokens_per_minute=sets.embedding_tokens_per_minute)
+
+
+def create_faiss_service(sets: Settings,
+                         embeddings: BatchedEmbeddings,
+                         with_reranker: bool = True) -> FaissService:
+    """
+        The FaissService of the app and of the ingestion workers. Both must chunk, embed
+        and index the same way, so a database built by either can be loaded by the other.
+
+        with_reranker: Load the configured reranker; ingestion workers never search and
+                       skip it, it does not change what is saved
+    """
+    embedding_cache = EmbeddingCache(cache_path=EMBEDDING_CACHE_PATH)
+    reranker = None
+    if with_reranker:
+        # The cosine reranker scores the vectors stored with the index; for indexes that
+        # only keep approximate codes it reads chunk embeddings back from the embedding cache
+        reranker = create_reranker(sets.reranker,
+                                   embeddings=CachedEmbeddings(embeddings, embedding_cache,
+                                                               model_name=sets.embedding_deployment_model),
+                                   model_name=sets.reranker_model)
+    faiss_service = FaissService(embeddings=embeddings,
+                                 chunk_size=1200,
+                                 chunk_overlap=500,
+                                 embedding_cache=embedding_cache,
+                                 embedding_model_name=sets.embedding_deployment_model,
+                                 query_cache_size=1024,
+                                 query_cache_ttl=3600,
+                                 temp_memory_budget_mb=1024,
+                                 temp_idle_ttl=1800,
+                                 hybrid_search=True,
+                                 reranker=reranker,
+                                 rerank_depth=sets.rerank_depth,
+                                 rerank_budget_ms=sets.rerank_budget_ms)
+    logger.info(f"FaissService created (reranker: {sets.reranker if with_reranker else None})")
+    return faiss_service
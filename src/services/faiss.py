@@ -1,34 +1,163 @@
 import os
+import re
+import copy
 import uuid
-from typing import List, Dict, Tuple, Union
+import weakref
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 import numpy as np
 import faiss
 from langchain.docstore.document import Document
 from langchain_community.vectorstores import FAISS
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from src.utils import setup_logger
+from src.utils.metrics import metrics
+from src.utils.text_splitter import OffsetTextSplitter
+from src.services.embedding_cache import EmbeddingCache, CachedEmbeddings
+from src.services.manifest import IndexManifest, fingerprint_text
+from src.services.query_cache import LRUCache
+from src.services.temp_registry import TempDatabaseRegistry
+from src.services.lexical_index import BM25Index
+from src.services.metadata_index import MetadataIndex
+from src.services.vector_storage import STORAGE_FACTORIES, FullPrecisionVectors, truncate_vectors
+from src.services.rerankers import Reranker
+from src.services.docstores import (
+    MMAP_FILES,
+    SQLITE_DOCSTORE_FILE,
+    MmapDocstore,
+    PositionIdMap,
+    SQLiteDocstore,
+    write_mmap_docstore
+)
 
 logger = setup_logger(__name__)
 
+LEXICAL_INDEX_FILE = "lexical.npz"
+METADATA_INDEX_FILE = "metadata.npz"
+FULL_VECTORS_FILE = "vectors.f32"
+# Training points per centroid below which FAISS k-means warns and clusters poorly
+MIN_POINTS_PER_CENTROID = 39
+
 
 class FaissService:
     def __init__(self, 
                  embeddings, 
                  chunk_size: int = 1000, 
-                 chunk_overlap: int = 200):
+                 chunk_overlap: int = 200,
+                 embedding_cache: Optional[EmbeddingCache] = None,
+                 embedding_model_name: Optional[str] = None,
+                 index_factory: Optional[str] = None,
+                 nprobe: Optional[int] = None,
+                 ef_search: Optional[int] = None,
+                 train_sample_size: int = 25_000,
+                 query_cache_size: int = 0,
+                 query_cache_ttl: Optional[float] = None,
+                 chunk_store: str = "pickle",
+                 temp_memory_budget_mb: Optional[float] = None,
+                 temp_idle_ttl: Optional[float] = None,
+                 temp_spill_dir: Optional[str] = None,
+                 hybrid_search: bool = False,
+                 rrf_k: int = 60,
+                 split_workers: Optional[int] = 1,
+                 vector_storage: str = "float32",
+                 truncate_dim: Optional[int] = None,
+                 rescore_factor: int = 4,
+                 reranker: Optional[Reranker] = None,
+                 rerank_depth: int = 20,
+                 rerank_budget_ms: Optional[float] = None):
         """
             embeddings: Embedding
             chunk_size: Size of chunks for document splitting
             chunk_overlap: Overlap between chunks
+            embedding_cache: Optional on-disk cache, only uncached chunks are sent to the embedding model
+            embedding_model_name: Namespace of the embedding cache keys, resolved from embeddings if omitted
+            index_factory: FAISS index_factory string (e.g. "IVF{nlist},Flat", "HNSW32", "OPQ16,IVF{nlist},PQ16"),
+                           "{nlist}" is derived from the number of vectors. None keeps the flat L2 index
+            nprobe: IVF lists visited per query
+            ef_search: HNSW candidate list size per query
+            train_sample_size: Maximum number of vectors used to train the index
+            query_cache_size: Entries of the in-process query embedding and search result caches, 0 disables them
+            query_cache_ttl: Seconds a cached query embedding or result stays valid
+            chunk_store: How saved databases keep their chunks, "pickle" (LangChain's save_local)
+                         or "sqlite" (compressed rows fetched per hit, no pickle on load)
+            temp_memory_budget_mb: Memory budget for temporary databases, least recently used ones are spilled to disk
+            temp_idle_ttl: Seconds without use before a temporary database is spilled to disk, checked
+                           by a background sweep every temp_idle_ttl / 2 seconds
+            temp_spill_dir: Folder for spilled temporary databases, a temporary folder by default
+            hybrid_search: Keep a BM25 keyword index next to the vectors and fuse both rankings
+                           in similarity_search, helps with part numbers, clause ids and acronyms
+            rrf_k: Reciprocal rank fusion constant, higher values flatten the weight of top ranks
+            split_workers: Processes used to split documents into chunks, None means cpu_count
+            vector_storage: Codes kept in the flat index of new databases, "float32", "float16",
+                            "int8" (scalar quantization) or "binary" (sign bits, Hamming search).
+                            Anything but float32 keeps full-precision vectors in a file next to
+                            the index to rescore a shortlist
+            truncate_dim: Index only the first truncate_dim dimensions of each vector (Matryoshka
+                          embeddings such as text-embedding-3), full vectors are kept for rescoring
+            rescore_factor: Shortlist of k * rescore_factor candidates rescored at full precision
+                            in databases with compact storage
+            reranker: Rescores the top rerank_depth results of every search and keeps the best k
+                      (see src.services.rerankers), None searches without reranking
+            rerank_depth: Candidates retrieved for the reranker
+            rerank_budget_ms: Time the reranker may take per query, over it the candidates
+                              keep their vector order
         """
+        if chunk_store not in ("pickle", "sqlite"):
+            raise ValueError(f"Unknown chunk_store: {chunk_store}")
+        if vector_storage not in STORAGE_FACTORIES:
+            raise ValueError(f"Unknown vector_storage: {vector_storage}")
+        if vector_storage != "float32" and index_factory is not None:
+            raise ValueError("vector_storage applies to the flat index only, put the codec in "
+                             "index_factory instead (e.g. \"IVF{nlist},SQ8\")")
+        if rescore_factor < 1:
+            raise ValueError(f"rescore_factor must be at least 1, got {rescore_factor}")
+        if rerank_depth < 1:
+            raise ValueError(f"rerank_depth must be at least 1, got {rerank_depth}")
+        self.base_embeddings = embeddings
+        self.embedding_cache = embedding_cache
+        if embedding_cache is not None:
+            embeddings = CachedEmbeddings(embeddings, embedding_cache, embedding_model_name)
         self.embeddings = embeddings
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        # Same chunks as LangChain's RecursiveCharacterTextSplitter, computed on offsets
+        self.text_splitter = OffsetTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             separators=["\n\n", "\n", ".", "!", "?", ",", " ", ""]
         )
-        self._temp_databases = {}  # Store temporary databases
-        logger.info(f"FaissService initialized with chunk_size={chunk_size}, chunk_overlap={chunk_overlap}")
+        self.split_workers = split_workers
+        self.index_factory = index_factory
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.train_sample_size = train_sample_size
+        self.chunk_store = chunk_store
+        self.hybrid_search = hybrid_search
+        self.rrf_k = rrf_k
+        self.vector_storage = vector_storage
+        self.truncate_dim = truncate_dim
+        self.rescore_factor = rescore_factor
+        self.reranker = reranker
+        self.rerank_depth = rerank_depth
+        self.rerank_budget_ms = rerank_budget_ms
+        # Store temporary databases, spilling them to disk over budget or when idle
+        self._temp_databases = TempDatabaseRegistry(
+            save_fn=self._save_database,
+            load_fn=self.load_local_database,
+            size_fn=self._database_memory_bytes,
+            memory_budget_bytes=int(temp_memory_budget_mb * 2 ** 20) if temp_memory_budget_mb else None,
+            idle_ttl=temp_idle_ttl,
+            spill_dir=temp_spill_dir
+        )
+        # (key, version) per database; the version is bumped whenever the index changes
+        self._database_versions = weakref.WeakKeyDictionary()
+        self._read_only_databases = weakref.WeakSet()
+        self._lexical_indexes = weakref.WeakKeyDictionary()
+        self._metadata_indexes = weakref.WeakKeyDictionary()
+        self._full_vectors = weakref.WeakKeyDictionary()
+        self._query_embedding_cache = LRUCache(query_cache_size, query_cache_ttl) if query_cache_size else None
+        self._search_result_cache = LRUCache(query_cache_size, query_cache_ttl) if query_cache_size else None
+        logger.info(f"FaissService initialized with chunk_size={chunk_size}, chunk_overlap={chunk_overlap}, "
+                    f"index_factory={index_factory or 'Flat'}, vector_storage={vector_storage}"
+                    + (f", truncate_dim={truncate_dim}" if truncate_dim else "")
+                    + (f", reranker={reranker.name} (depth {rerank_depth})" if reranker is not None else ""))
     
     def create_local_database(self, 
                               documents: List[Document], 
@@ -43,11 +172,10 @@ class FaissService:
                 raise ValueError("No chunks were generated from the provided documents")
             
             # Create FAISS database
-            vdb = FAISS.from_documents(chunks, self.embeddings)
+            vdb = self._create_database(chunks)
             
-            # Save locally
-            os.makedirs(os.path.dirname(index_path), exist_ok=True)
-            vdb.save_local(index_path)
+            # Save locally, with the manifest used by sync_local_database
+            self._save_database(vdb, index_path, self._build_manifest(documents, chunks))
             
             logger.info(f"Database created with {len(chunks)} chunks and saved at: {index_path}")
             return vdb
@@ -68,7 +196,7 @@ class FaissService:
                 raise ValueError("No chunks were generated from the provided documents")
             
             # Create FAISS database in memory
-            vdb = FAISS.from_documents(chunks, self.embeddings)
+            vdb = self._create_database(chunks)
             
             # Generate unique ID for temporary database
             temp_id = str(uuid.uuid4())
@@ -81,41 +209,250 @@ class FaissService:
             logger.error(f"Error creating temporary database: {str(e)}")
             raise
     
-    def load_local_database(self, index_path: str) -> FAISS:
+    def create_local_database_from_stream(self,
+                                          pages: Iterable[Dict[str, Any]],
+                                          index_path: str,
+                                          batch_size: int = 256,
+                                          progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> FAISS:
+        try:
+            logger.info(f"Starting streaming database creation at: {index_path}")
+
+            manifest = IndexManifest()
+            vdb = self._stream_into_database(pages, batch_size, progress_callback, manifest)
+
+            self._save_database(vdb, index_path, manifest)
+
+            logger.info(f"Streamed database with {vdb.index.ntotal} chunks saved at: {index_path}")
+            return vdb
+
+        except Exception as e:
+            logger.error(f"Error creating local database from stream: {str(e)}")
+            raise
+
+    def create_temporary_database_from_stream(self,
+                                              pages: Iterable[Dict[str, Any]],
+                                              batch_size: int = 256,
+                                              progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Tuple[str, FAISS]:
+        try:
+            logger.info("Starting streaming temporary database creation")
+
+            vdb = self._stream_into_database(pages, batch_size, progress_callback)
+
+            temp_id = str(uuid.uuid4())
+            self._temp_databases[temp_id] = vdb
+
+            logger.info(f"Streamed temporary database created with {vdb.index.ntotal} chunks. ID: {temp_id}")
+            return temp_id, vdb
+
+        except Exception as e:
+            logger.error(f"Error creating temporary database from stream: {str(e)}")
+            raise
+
+    def load_local_database(self, index_path: str, mmap: bool = False) -> FAISS:
+        """
+            index_path: Folder written by create_local_database
+            mmap: Memory-map the index and docstore read-only instead of reading them
+                  into RAM, so pages are loaded lazily and shared between processes
+        """
         try:
             logger.info(f"Loading database from: {index_path}")
             
             if not os.path.exists(index_path):
                 raise FileNotFoundError(f"Index not found at: {index_path}")
-            
-            vdb = FAISS.load_local(
-                index_path, 
-                self.embeddings, 
-                allow_dangerous_deserialization=True
-            )
-            
-            logger.info(f"Database successfully loaded from: {index_path}")
+
+            if SQLiteDocstore.exists(index_path):
+                vdb = self._load_sqlite_database(index_path, mmap)
+            elif mmap:
+                vdb = self._load_mmap_database(index_path)
+            else:
+                vdb = FAISS.load_local(
+                    index_path, 
+                    self.embeddings, 
+                    allow_dangerous_deserialization=True
+                )
+                self._apply_search_parameters(vdb.index)
+                logger.info(f"Database successfully loaded from: {index_path}")
+
+            for file_name, indexes, index_class in self._sidecar_indexes():
+                sidecar_path = os.path.join(index_path, file_name)
+                if os.path.exists(sidecar_path):
+                    indexes[vdb] = index_class.load(sidecar_path)
             return vdb
             
         except Exception as e:
             logger.error(f"Error loading local database: {str(e)}")
             raise
     
+    def load_temporary_database(self, index_path: str, mmap: bool = False) -> Tuple[str, FAISS]:
+        """
+            Loads a saved database and registers it like a temporary one, so callers can
+            keep only the returned id and the database is spilled when idle. Memory-mapped
+            databases are already on disk and are never spilled.
+        """
+        try:
+            vdb = self.load_local_database(index_path, mmap=mmap)
+            temp_id = str(uuid.uuid4())
+            self._temp_databases.register(temp_id, vdb, spillable=not mmap)
+            logger.info(f"Database from {index_path} registered as temporary database. ID: {temp_id}")
+            return temp_id, vdb
+
+        except Exception as e:
+            logger.error(f"Error loading temporary database: {str(e)}")
+            raise
+
+    def save_local_database(self,
+                            vdb: FAISS,
+                            index_path: str,
+                            manifest: Optional[IndexManifest] = None) -> None:
+        try:
+            self._save_database(vdb, index_path, manifest)
+            logger.info(f"Database with {vdb.index.ntotal} chunks saved at: {index_path}")
+
+        except Exception as e:
+            logger.error(f"Error saving local database: {str(e)}")
+            raise
+
+    def migrate_chunk_store(self, index_path: str, remove_pickle: bool = True) -> None:
+        """
+            One-shot conversion of a database saved with the pickle docstore to the
+            SQLite chunk store. The pickle and mmap docstore files are removed afterwards
+            unless remove_pickle is False.
+        """
+        try:
+            if SQLiteDocstore.exists(index_path):
+                logger.info(f"Database at {index_path} already uses the SQLite chunk store")
+                return
+
+            logger.info(f"Migrating chunk store of {index_path} to SQLite")
+            vdb = FAISS.load_local(
+                index_path,
+                self.embeddings,
+                allow_dangerous_deserialization=True
+            )
+            SQLiteDocstore.write(os.path.join(index_path, SQLITE_DOCSTORE_FILE), vdb).close()
+
+            if remove_pickle:
+                self._remove_files(index_path, ("index.pkl",) + MMAP_FILES)
+
+            logger.info(f"Migrated {vdb.index.ntotal} chunks of {index_path} to SQLite")
+
+        except Exception as e:
+            logger.error(f"Error migrating chunk store: {str(e)}")
+            raise
+
+    def sync_local_database(self,
+                            documents: List[Document],
+                            index_path: str,
+                            remove_missing: bool = True) -> Tuple[FAISS, Dict[str, List[str]]]:
+        """
+            Brings the index at index_path in line with documents: only added or changed
+            documents are embedded, and chunks of changed or removed ones are deleted.
+            Documents are matched by their "source" metadata.
+
+            remove_missing: Delete indexed documents absent from documents; False only adds
+                            and updates, e.g. to build an index batch by batch
+        """
+        try:
+            logger.info(f"Syncing {len(documents)} documents with database at: {index_path}")
+
+            vdb = None
+            manifest = IndexManifest()
+            if os.path.exists(index_path):
+                vdb = self.load_local_database(index_path)
+                manifest = IndexManifest.load(index_path) or IndexManifest.from_database(vdb)
+
+            current = {}
+            for i, doc in enumerate(documents):
+                source = doc.metadata.get("source", f"document_{i}")
+                current[source] = (doc, fingerprint_text(doc.page_content))
+
+            summary = {"added": [], "updated": [], "removed": [], "unchanged": []}
+            for source in manifest.documents:
+                if source not in current and remove_missing:
+                    summary["removed"].append(source)
+            for source, (doc, content_hash) in current.items():
+                if source not in manifest.documents:
+                    summary["added"].append(source)
+                elif manifest.documents[source]["hash"] != content_hash:
+                    summary["updated"].append(source)
+                else:
+                    summary["unchanged"].append(source)
+
+            # Drop the vectors of removed and changed documents
+            stale_ids = []
+            for source in summary["removed"] + summary["updated"]:
+                stale_ids.extend(manifest.documents[source]["chunk_ids"])
+            # Checked before anything changes, so a failed sync leaves the index as it was
+            if stale_ids and not self._supports_removal(vdb.index):
+                raise ValueError(f"{type(faiss.downcast_index(vdb.index)).__name__} indexes cannot delete vectors in place, "
+                                 f"so changed or removed documents cannot be synced into {index_path}; "
+                                 f"rebuild it with create_local_database or use an index type that supports removal")
+            for source in summary["removed"]:
+                manifest.remove(source)
+            if stale_ids:
+                vdb.delete(stale_ids)
+                for _, indexes, _ in self._sidecar_indexes():
+                    if vdb in indexes:
+                        indexes[vdb].delete(stale_ids)
+                logger.info(f"Deleted {len(stale_ids)} stale chunks")
+
+            # Embed only the new and changed documents
+            changed_sources = summary["added"] + summary["updated"]
+            changed_documents = [current[source][0] for source in changed_sources]
+            doc_ids = [manifest.doc_id_for(source) for source in changed_sources]
+            chunks = self._process_documents(changed_documents, doc_ids=doc_ids)
+
+            if chunks:
+                if vdb is None:
+                    vdb = self._create_database(chunks)
+                else:
+                    self._add_chunks(vdb, chunks)
+            elif vdb is None:
+                raise ValueError("No chunks were generated from the provided documents")
+
+            self._build_manifest(changed_documents, chunks, manifest)
+            self._mark_database_changed(vdb)
+            self._save_database(vdb, index_path, manifest)
+
+            logger.info(f"Sync completed: {len(summary['added'])} added, {len(summary['updated'])} updated, "
+                        f"{len(summary['removed'])} removed, {len(summary['unchanged'])} unchanged")
+            return vdb, summary
+
+        except Exception as e:
+            logger.error(f"Error syncing local database: {str(e)}")
+            raise
+
     def add_documents_to_database(self, 
                                   vdb: FAISS, 
-                                  documents: List[Document]) -> FAISS:
+                                  documents: List[Document],
+                                  manifest: Optional[IndexManifest] = None) -> FAISS:
+        """
+            manifest: Manifest of the database, the new documents get its next doc_ids and
+                      are recorded in it (save it with save_local_database)
+        """
         try:
             logger.info(f"Adding {len(documents)} documents to existing database")
+
+            if vdb in self._read_only_databases:
+                raise ValueError("Database was loaded with mmap=True and is read-only")
             
             # Process new documents
-            chunks = self._process_documents(documents)
+            doc_ids = None
+            if manifest is not None:
+                doc_ids = [manifest.doc_id_for(doc.metadata.get("source", f"document_{i}"))
+                           for i, doc in enumerate(documents)]
+            chunks = self._process_documents(documents, doc_ids=doc_ids)
             
             if not chunks:
                 logger.warning("No chunks were generated from the new documents")
                 return vdb
             
             # Add to existing database
-            vdb.add_documents(chunks)
+            self._add_chunks(vdb, chunks)
+            self._mark_database_changed(vdb)
+            self._temp_databases.refresh_size(vdb)
+            if manifest is not None:
+                self._build_manifest(documents, chunks, manifest)
             
             logger.info(f"{len(chunks)} new chunks added to database")
             return vdb
@@ -124,15 +461,31 @@ class FaissService:
             logger.error(f"Error adding documents: {str(e)}")
             raise
     
+    @metrics.timed("faiss.similarity_search")
     def similarity_search(
         self, 
         vdb_or_id: Union[FAISS, str], 
         query: str, 
         k: int = 5,
-        return_scores: bool = False
+        return_scores: bool = False,
+        hybrid: Optional[bool] = None,
+        filter: Optional[Dict[str, Any]] = None,
+        rerank: Optional[bool] = None
     ) -> Union[List[Document], List[Tuple[Document, float]]]:
-        
+        """
+            hybrid: Fuse vector and BM25 keyword rankings, defaults to the hybrid_search
+                    setting. Fused results are scored by reciprocal rank (higher is better)
+                    instead of L2 distance
+            filter: Restricts results by chunk metadata ("source", "doc_id", "chunk_id"),
+                    e.g. {"source": ["a.pdf", "b.pdf"]} or {"doc_id": 3}. Applied inside the
+                    FAISS search as an ID selector instead of filtering afterwards
+            rerank: Rescore rerank_depth candidates with the reranker, defaults to whether one
+                    is configured. Reranked results are scored by the reranker (higher is
+                    better); over the budget they keep their search scores and order
+        """
         try:
+            hybrid = self.hybrid_search if hybrid is None else hybrid
+            rerank = self._use_reranker(rerank)
             logger.debug(f"Performing similarity search: '{query[:100]}...' (k={k})")
             
             # Determine which database to use
@@ -145,20 +498,147 @@ class FaissService:
                 vdb = vdb_or_id
                 logger.debug("Using local/loaded database")
             
-            # Perform search
-            if return_scores:
-                results = vdb.similarity_search_with_score(query, k=k)
-                logger.info(f"Search completed: {len(results)} results with scores")
-                return results
-            else:
-                results = vdb.similarity_search(query, k=k)
-                logger.info(f"Search completed: {len(results)} results")
-                return results
+            # Repeated queries against an unchanged database are served from cache
+            cache_key = (*self._database_version(vdb), query, k, return_scores, hybrid, self._filter_key(filter), rerank)
+            if self._search_result_cache is not None:
+                cached = self._search_result_cache.get(cache_key)
+                if cached is not None:
+                    metrics.increment("faiss.search_cache_hits")
+                    logger.info(f"Search served from cache: {len(cached)} results")
+                    return list(cached)
+
+            # Perform search, retrieving more candidates when they are reranked
+            embedding = self._embed_query(query)
+            search_k = max(k, self.rerank_depth) if rerank else k
+            scored = return_scores or rerank
+            mode = "hybrid" if hybrid else "filtered" if filter else "vector"
+            with metrics.span("faiss.search", mode=mode):
+                if hybrid:
+                    _, indices = self._search_index(vdb, np.asarray([embedding]), self.fusion_depth(search_k), filter)
+                    results = self._fuse_results(vdb, query, indices[0], search_k, scored, filter)
+                    logger.info(f"Hybrid search completed: {len(results)} results")
+                elif filter or vdb in self._full_vectors or len(embedding) != vdb.index.d:
+                    # Filters and compact storage need the search LangChain does not do
+                    distances, indices = self._search_index(vdb, np.asarray([embedding]), search_k, filter)
+                    results = self._collect_results(vdb, distances, indices, scored)[0]
+                    logger.info(f"{'Filtered s' if filter else 'S'}earch completed: {len(results)} results")
+                elif scored:
+                    results = vdb.similarity_search_with_score_by_vector(embedding, k=search_k)
+                    logger.info(f"Search completed: {len(results)} results with scores")
+                else:
+                    results = vdb.similarity_search_by_vector(embedding, k=k)
+                    logger.info(f"Search completed: {len(results)} results")
+
+            complete = True
+            if rerank:
+                results, complete = self._rerank(vdb, query, embedding, results, k, return_scores)
+
+            # Results over the rerank budget are not cached, the next call may rerank in time
+            if self._search_result_cache is not None and complete:
+                self._search_result_cache.put(cache_key, tuple(results))
+            return results
                 
         except Exception as e:
             logger.error(f"Error in similarity search: {str(e)}")
             raise
     
+    @metrics.timed("faiss.similarity_search_batch")
+    def similarity_search_batch(
+        self,
+        vdb_or_id: Union[FAISS, str],
+        queries: List[str],
+        k: int = 5,
+        return_scores: bool = False,
+        batch_size: int = 256,
+        hybrid: Optional[bool] = None,
+        filter: Optional[Dict[str, Any]] = None,
+        rerank: Optional[bool] = None
+    ) -> Union[List[List[Document]], List[List[Tuple[Document, float]]]]:
+        """
+            Embeds the queries batch_size at a time and runs a single FAISS search
+            over all of them. Returns one result list per query, shaped like
+            similarity_search. The filter applies to every query.
+        """
+        try:
+            hybrid = self.hybrid_search if hybrid is None else hybrid
+            rerank = self._use_reranker(rerank)
+            logger.debug(f"Performing batch similarity search: {len(queries)} queries (k={k})")
+
+            vdb = self._resolve_database(vdb_or_id)
+            if not queries:
+                return []
+
+            vectors = self._embed_queries(queries, batch_size)
+            search_k = max(k, self.rerank_depth) if rerank else k
+            results = self.search_by_vectors(vdb, queries, vectors, search_k, hybrid, filter)
+
+            if rerank:
+                results = [self._rerank(vdb, query, vector, row, k, return_scores)[0]
+                           for query, vector, row in zip(queries, vectors, results)]
+            elif not return_scores:
+                results = [[doc for doc, _ in row] for row in results]
+
+            logger.info(f"Batch search completed: {len(queries)} queries")
+            return results
+
+        except Exception as e:
+            logger.error(f"Error in batch similarity search: {str(e)}")
+            raise
+
+    def search_by_vectors(self,
+                          vdb_or_id: Union[FAISS, str],
+                          queries: List[str],
+                          vectors: np.ndarray,
+                          k: int = 5,
+                          hybrid: Optional[bool] = None,
+                          filter: Optional[Dict[str, Any]] = None) -> List[List[Tuple[Document, float]]]:
+        """
+            Batch search with queries embedded beforehand (see embed_queries), so one
+            embedding can be searched in several databases. Returns one list of
+            (document, score) rows per query, scored like similarity_search without
+            reranking.
+
+            queries: Texts of the vectors, only read by the keyword side of hybrid search
+        """
+        try:
+            hybrid = self.hybrid_search if hybrid is None else hybrid
+            vdb = self._resolve_database(vdb_or_id)
+            if hybrid:
+                _, indices = self._search_index(vdb, vectors, self.fusion_depth(k), filter)
+                return [
+                    self._fuse_results(vdb, query, row, k, True, filter)
+                    for query, row in zip(queries, indices)
+                ]
+            distances, indices = self._search_index(vdb, vectors, k, filter)
+            return self._collect_results(vdb, distances, indices, True)
+
+        except Exception as e:
+            logger.error(f"Error in search by vectors: {str(e)}")
+            raise
+
+    def keyword_search(self,
+                       vdb_or_id: Union[FAISS, str],
+                       query: str,
+                       k: int = 5,
+                       filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        """
+            BM25 keyword ranking alone, the lexical side of hybrid search. Scores are
+            BM25 (higher is better).
+        """
+        try:
+            vdb = self._resolve_database(vdb_or_id)
+            results = []
+            for doc_id, score in self._lexical_index(vdb).search(query, k, self._allowed_ids(vdb, filter)):
+                doc = vdb.docstore.search(doc_id)
+                if not isinstance(doc, Document):
+                    raise ValueError(f"Could not find document for id {doc_id}")
+                results.append((doc, score))
+            return results
+
+        except Exception as e:
+            logger.error(f"Error in keyword search: {str(e)}")
+            raise
+
     def get_database_info(self, 
                           vdb_or_id: Union[FAISS, str]) -> dict:
         
@@ -186,8 +666,13 @@ class FaissService:
                 "id": db_id,
                 "total_vectors": total_vectors,
                 "dimension": dimension,
-                "embedding_model": type(self.embeddings).__name__
+                "embedding_model": type(self.embeddings).__name__,
+                "lexical_index": vdb in self._lexical_indexes,
+                **self._index_details(vdb.index, memory_mapped=vdb in self._read_only_databases)
             }
+            # Kept on disk and only read for rescoring
+            full_vectors = self._full_vectors.get(vdb)
+            info["full_precision_bytes_per_vector"] = full_vectors.bytes_per_vector if full_vectors else None
             
             logger.debug(f"Information retrieved: {info}")
             return info
@@ -196,30 +681,789 @@ class FaissService:
             logger.error(f"Error getting database information: {str(e)}")
             raise
     
+    def set_search_parameters(self,
+                              vdb_or_id: Union[FAISS, str],
+                              nprobe: Optional[int] = None,
+                              ef_search: Optional[int] = None) -> None:
+        vdb = self._resolve_database(vdb_or_id)
+        self._apply_search_parameters(vdb.index, nprobe, ef_search)
+        self._mark_database_changed(vdb)
+
+    def embed_query(self, query: str) -> List[float]:
+        """
+            The query embedding similarity_search uses, from the query cache when enabled.
+        """
+        return self._embed_query(query)
+
+    def embed_queries(self, queries: List[str], batch_size: int = 256) -> np.ndarray:
+        """
+            Query embeddings as one float32 array, batch_size queries per embedding call.
+        """
+        return self._embed_queries(queries, batch_size)
+
+    def get_database(self, vdb_or_id: Union[FAISS, str]) -> FAISS:
+        """
+            The database of a temporary id, reloaded if it was spilled, or vdb_or_id itself.
+        """
+        return self._resolve_database(vdb_or_id)
+
+    def fusion_depth(self, k: int) -> int:
+        """
+            Candidates taken from the vector and keyword rankings before fusing them.
+        """
+        return max(4 * k, 20)
+
+    def database_version(self, vdb_or_id: Union[FAISS, str]) -> Tuple[str, int]:
+        """
+            Changes whenever the vectors of the database change, for caches built on its results.
+        """
+        return self._database_version(self._resolve_database(vdb_or_id))
+
+    def delete_temporary_database(self, temp_id: str) -> None:
+        if temp_id not in self._temp_databases:
+            raise ValueError(f"Temporary database not found: {temp_id}")
+        del self._temp_databases[temp_id]
+        logger.info(f"Temporary database deleted: {temp_id}")
+
+    def get_temporary_memory_usage(self) -> dict:
+        self._temp_databases.sweep()
+        return self._temp_databases.memory_usage()
+
+    def get_query_cache_stats(self) -> Optional[dict]:
+        if self._search_result_cache is None:
+            return None
+        return {
+            "query_embeddings": self._query_embedding_cache.stats(),
+            "search_results": self._search_result_cache.stats()
+        }
+
+    def get_reranker_stats(self) -> Optional[dict]:
+        if self.reranker is None:
+            return None
+        return self.reranker.stats()
+
+    def get_embedding_cache_stats(self) -> Optional[dict]:
+        if self.embedding_cache is None:
+            return None
+        return self.embedding_cache.stats()
+
+    @metrics.timed("faiss.process_documents")
     def _process_documents(self, 
-                           documents: List[Document]) -> List[Document]:
+                           documents: List[Document],
+                           doc_ids: Optional[List[int]] = None) -> List[Document]:
         
         logger.debug(f"Processing {len(documents)} documents into chunks")
         
         chunks = []
         
-        for i, doc in enumerate(documents):
-            # Split document into chunks
-            doc_chunks = self.text_splitter.split_documents([doc])
-            
-            # Add metadata to chunks
-            for j, chunk in enumerate(doc_chunks):
-                chunk.metadata.update({
-                    "doc_id": i,
-                    "chunk_id": j,
-                    "source": doc.metadata.get("source", f"document_{i}"),
-                    "total_chunks": len(doc_chunks)
-                })
-                chunks.append(chunk)
+        # Split all documents first, in parallel when split_workers allows it
+        texts = self.text_splitter.split_texts([doc.page_content for doc in documents], self.split_workers)
         
+        for i, (doc, doc_texts) in enumerate(zip(documents, texts)):
+            chunks.extend(self._document_chunks(doc, doc_texts, doc_ids[i] if doc_ids is not None else i, i))
+        
+        metrics.increment("faiss.chunks", len(chunks))
         logger.debug(f"Processing completed: {len(chunks)} chunks generated")
         return chunks
 
+    @staticmethod
+    def _document_chunks(doc: Document, texts: List[str], doc_id: int, index: int) -> List[Document]:
+        # Chunks of one document with the metadata of both the batch and the streamed path
+        return [
+            Document(
+                id=str(uuid.uuid4()),
+                page_content=text,
+                metadata={
+                    **doc.metadata,
+                    "doc_id": doc_id,
+                    "chunk_id": j,
+                    "source": doc.metadata.get("source", f"document_{index}"),
+                    "total_chunks": len(texts)
+                }
+            )
+            for j, text in enumerate(texts)
+        ]
+
+    def _resolve_database(self, vdb_or_id: Union[FAISS, str]) -> FAISS:
+        if isinstance(vdb_or_id, str):
+            if vdb_or_id not in self._temp_databases:
+                raise ValueError(f"Temporary database not found: {vdb_or_id}")
+            return self._temp_databases[vdb_or_id]
+        return vdb_or_id
+
+    def _database_version(self, vdb: FAISS) -> Tuple[str, int]:
+        if vdb not in self._database_versions:
+            self._database_versions[vdb] = (str(uuid.uuid4()), 0)
+        return self._database_versions[vdb]
+
+    def _mark_database_changed(self, vdb: FAISS) -> None:
+        key, version = self._database_version(vdb)
+        self._database_versions[vdb] = (key, version + 1)
+        if self._search_result_cache is not None:
+            removed = self._search_result_cache.invalidate(lambda cache_key: cache_key[0] == key)
+            logger.debug(f"Database changed, {removed} cached search results invalidated")
+
+    def _embed_query(self, query: str) -> List[float]:
+        if self._query_embedding_cache is None:
+            with metrics.span("embeddings.query"):
+                return self.embeddings.embed_query(query)
+
+        embedding = self._query_embedding_cache.get(query)
+        if embedding is None:
+            with metrics.span("embeddings.query"):
+                embedding = self.embeddings.embed_query(query)
+            self._query_embedding_cache.put(query, embedding)
+        return embedding
+
+    def _embed_queries(self, queries: List[str], batch_size: int = 256) -> np.ndarray:
+        vectors: Dict[str, List[float]] = {}
+        if self._query_embedding_cache is not None:
+            for query in queries:
+                embedding = self._query_embedding_cache.get(query)
+                if embedding is not None:
+                    vectors[query] = embedding
+
+        # embed_documents is the batched entry point; for the OpenAI models used
+        # here query and document embeddings are the same
+        missing = [query for query in dict.fromkeys(queries) if query not in vectors]
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            with metrics.span("embeddings.queries"):
+                embedded = self.embeddings.embed_documents(batch)
+            for query, embedding in zip(batch, embedded):
+                vectors[query] = embedding
+                if self._query_embedding_cache is not None:
+                    self._query_embedding_cache.put(query, embedding)
+
+        return np.asarray([vectors[query] for query in queries], dtype=np.float32)
+
+    def _search_index(self,
+                      vdb: FAISS,
+                      vectors: np.ndarray,
+                      k: int,
+                      filter: Optional[Dict[str, Any]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vdb._normalize_L2:
+            faiss.normalize_L2(vectors)
+        codes_vectors = vectors
+        if vectors.shape[1] > vdb.index.d:
+            codes_vectors = truncate_vectors(vectors, vdb.index.d)
+
+        full_vectors = self._full_vectors.get(vdb)
+        if full_vectors is None:
+            return self._search_codes(vdb, codes_vectors, k, filter)
+
+        # Compact storage: shortlist on the codes, then exact L2 on the full-precision rows
+        _, positions = self._search_codes(vdb, codes_vectors, k * self.rescore_factor, filter)
+        with metrics.span("faiss.rescore"):
+            return full_vectors.rescore(vectors, positions, k)
+
+    def _search_codes(self,
+                      vdb: FAISS,
+                      vectors: np.ndarray,
+                      k: int,
+                      filter: Optional[Dict[str, Any]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        if not filter:
+            return vdb.index.search(vectors, k)
+
+        mask = self._metadata_index(vdb).mask(filter)
+        if not mask.any():
+            return (np.full((len(vectors), k), np.inf, dtype=np.float32),
+                    np.full((len(vectors), k), -1, dtype=np.int64))
+
+        base = faiss.downcast_index(vdb.index)
+        if isinstance(base, faiss.IndexLSH):
+            # IndexLSH takes no search parameters, the allowed codes are searched directly
+            return self._search_binary_subset(base, vectors, k, np.flatnonzero(mask))
+
+        # The selector must outlive the search, FAISS only keeps a pointer to it
+        selector = self._metadata_index(vdb).selector(mask)
+        params = self._selector_parameters(vdb.index, selector, len(mask) / mask.sum())
+        return vdb.index.search(vectors, k, params=params)
+
+    @staticmethod
+    def _search_binary_subset(index, vectors: np.ndarray, k: int, allowed: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        codes = faiss.vector_to_array(index.codes).reshape(index.ntotal, index.code_size)
+        subset = faiss.IndexBinaryFlat(index.code_size * 8)
+        subset.add(codes[allowed])
+        distances, rows = subset.search(index.sa_encode(vectors), k)
+        positions = np.where(rows >= 0, allowed[np.maximum(rows, 0)], -1)
+        return distances.astype(np.float32), positions
+
+    @staticmethod
+    def _selector_parameters(index, selector, widen: float):
+        # Selective filters leave most probed lists / graph neighbours empty, so nprobe
+        # and efSearch grow with the fraction of vectors filtered out
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            nprobe = min(ivf.nlist, int(np.ceil(ivf.nprobe * widen)))
+            return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+        base = faiss.downcast_index(index)
+        if hasattr(base, "hnsw"):
+            ef_search = max(base.hnsw.efSearch, min(int(base.hnsw.efSearch * widen), 4096))
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search)
+        return faiss.SearchParameters(sel=selector)
+
+    @staticmethod
+    def _filter_key(filter: Optional[Dict[str, Any]]) -> Optional[frozenset]:
+        if not filter:
+            return None
+        return frozenset(
+            (field, frozenset(value) if isinstance(value, (list, set, tuple, frozenset)) else value)
+            for field, value in filter.items()
+        )
+
+    @staticmethod
+    def _collect_results(vdb: FAISS,
+                         distances: np.ndarray,
+                         indices: np.ndarray,
+                         return_scores: bool) -> list:
+        results = []
+        for row_distances, row_indices in zip(distances, indices):
+            row = []
+            for distance, position in zip(row_distances, row_indices):
+                if position == -1:
+                    # Fewer than k vectors matched
+                    continue
+                doc = vdb.docstore.search(vdb.index_to_docstore_id[position])
+                if not isinstance(doc, Document):
+                    raise ValueError(f"Could not find document for index position {position}")
+                row.append((doc, float(distance)) if return_scores else doc)
+            results.append(row)
+        return results
+
+    def _use_reranker(self, rerank: Optional[bool]) -> bool:
+        if rerank is None:
+            return self.reranker is not None
+        if rerank and self.reranker is None:
+            raise ValueError("rerank requires a reranker, none is configured")
+        return rerank
+
+    def _rerank(self,
+                vdb: FAISS,
+                query: str,
+                query_vector: np.ndarray,
+                candidates: List[Tuple[Document, float]],
+                k: int,
+                return_scores: bool) -> Tuple[list, bool]:
+        # Returns the results and whether the reranker finished within its budget
+        budget = self.rerank_budget_ms / 1000 if self.rerank_budget_ms is not None else None
+        documents = [doc for doc, _ in candidates]
+        with metrics.span("faiss.rerank"):
+            vectors = self._candidate_vectors(vdb, documents)
+            reranked = self.reranker.rerank(query, documents, k, budget,
+                                            query_vector=query_vector if vectors is not None else None,
+                                            vectors=vectors)
+        complete = reranked is not None
+        if not complete:
+            reranked = candidates[:k]
+        return [item if return_scores else item[0] for item in reranked], complete
+
+    def _candidate_vectors(self, vdb: FAISS, documents: List[Document]) -> Optional[np.ndarray]:
+        # Exact embeddings of the documents as stored with the index, None when the
+        # index only holds approximate codes and the reranker has to embed the texts
+        if not documents:
+            return None
+        positions = self._metadata_index(vdb).positions([doc.id for doc in documents])
+        if (positions < 0).any():
+            return None
+        full_vectors = self._full_vectors.get(vdb)
+        if full_vectors is not None:
+            return np.asarray(full_vectors.vectors[positions], dtype=np.float32)
+        if isinstance(faiss.downcast_index(vdb.index), (faiss.IndexFlat, faiss.IndexHNSWFlat)):
+            return vdb.index.reconstruct_batch(positions)
+        return None
+
+    def _lexical_index(self, vdb: FAISS) -> BM25Index:
+        lexical = self._lexical_indexes.get(vdb)
+        if lexical is None:
+            # Databases saved without a keyword index get one on first hybrid search
+            logger.info("Building lexical index for database")
+            doc_ids = list(vdb.index_to_docstore_id.values())
+            lexical = BM25Index()
+            lexical.add(doc_ids, [vdb.docstore.search(doc_id).page_content for doc_id in doc_ids])
+            self._lexical_indexes[vdb] = lexical
+        return lexical
+
+    def _metadata_index(self, vdb: FAISS) -> MetadataIndex:
+        metadata = self._metadata_indexes.get(vdb)
+        if metadata is None or len(metadata) != vdb.index.ntotal:
+            # Databases saved without metadata columns get them on first filtered search
+            logger.info("Building metadata index for database")
+            doc_ids = [vdb.index_to_docstore_id[position] for position in range(vdb.index.ntotal)]
+            metadata = MetadataIndex()
+            metadata.add(doc_ids, [vdb.docstore.search(doc_id).metadata for doc_id in doc_ids])
+            self._metadata_indexes[vdb] = metadata
+        return metadata
+
+    def _sidecar_indexes(self) -> List[Tuple[str, weakref.WeakKeyDictionary, type]]:
+        # Per-database indexes saved next to the FAISS index
+        return [
+            (LEXICAL_INDEX_FILE, self._lexical_indexes, BM25Index),
+            (METADATA_INDEX_FILE, self._metadata_indexes, MetadataIndex),
+            (FULL_VECTORS_FILE, self._full_vectors, FullPrecisionVectors)
+        ]
+
+    def _fuse_results(self,
+                      vdb: FAISS,
+                      query: str,
+                      positions: np.ndarray,
+                      k: int,
+                      return_scores: bool,
+                      filter: Optional[Dict[str, Any]] = None) -> list:
+        # Reciprocal rank fusion: each ranking adds 1 / (rrf_k + rank)
+        depth = self.fusion_depth(k)
+        scores: Dict[str, float] = {}
+
+        vector_ids = [vdb.index_to_docstore_id[position] for position in positions if position != -1]
+        allowed = self._allowed_ids(vdb, filter)
+        lexical_ids = [doc_id for doc_id, _ in self._lexical_index(vdb).search(query, depth, allowed)]
+        for ranking in (vector_ids, lexical_ids):
+            for rank, doc_id in enumerate(ranking, start=1):
+                scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (self.rrf_k + rank)
+
+        results = []
+        for doc_id in sorted(scores, key=scores.get, reverse=True)[:k]:
+            doc = vdb.docstore.search(doc_id)
+            if not isinstance(doc, Document):
+                raise ValueError(f"Could not find document for id {doc_id}")
+            results.append((doc, scores[doc_id]) if return_scores else doc)
+        return results
+
+    def _allowed_ids(self, vdb: FAISS, filter: Optional[Dict[str, Any]]) -> Optional[Callable[[np.ndarray], np.ndarray]]:
+        # Docstore id mask of the filter, for the keyword search
+        if not filter:
+            return None
+        metadata = self._metadata_index(vdb)
+        mask = metadata.mask(filter)
+        return lambda doc_ids: metadata.contains(doc_ids, mask)
+
+    def _create_database(self, chunks: List[Document]) -> FAISS:
+        texts = [chunk.page_content for chunk in chunks]
+        vectors = self._embed_documents(texts)
+        stored = self._stored_vectors(vectors)
+
+        index = self._new_index(stored)
+        vdb = FAISS(self.embeddings, index, InMemoryDocstore(), {})
+        vdb.add_embeddings(
+            zip(texts, stored),
+            metadatas=[chunk.metadata for chunk in chunks],
+            ids=[chunk.id for chunk in chunks]
+        )
+
+        if self.vector_storage != "float32" or self.truncate_dim:
+            full_vectors = FullPrecisionVectors()
+            full_vectors.add([chunk.id for chunk in chunks], vectors)
+            self._full_vectors[vdb] = full_vectors
+
+        metadata = MetadataIndex()
+        metadata.add([chunk.id for chunk in chunks], [chunk.metadata for chunk in chunks])
+        self._metadata_indexes[vdb] = metadata
+
+        if self.hybrid_search:
+            lexical = BM25Index()
+            lexical.add([chunk.id for chunk in chunks], texts)
+            self._lexical_indexes[vdb] = lexical
+        return vdb
+
+    def _add_chunks(self, vdb: FAISS, chunks: List[Document]) -> List[str]:
+        texts = [chunk.page_content for chunk in chunks]
+        vectors = self._embed_documents(texts)
+        stored = vectors if vectors.shape[1] <= vdb.index.d else truncate_vectors(vectors, vdb.index.d)
+
+        ids = vdb.add_embeddings(
+            zip(texts, stored),
+            metadatas=[chunk.metadata for chunk in chunks],
+            ids=[chunk.id for chunk in chunks]
+        )
+        if vdb in self._full_vectors:
+            self._full_vectors[vdb].add(ids, vectors)
+        if vdb in self._metadata_indexes:
+            self._metadata_indexes[vdb].add(ids, [chunk.metadata for chunk in chunks])
+        if vdb in self._lexical_indexes:
+            self._lexical_indexes[vdb].add(ids, texts)
+        return ids
+
+    def _embed_documents(self, texts: List[str]) -> np.ndarray:
+        with metrics.span("embeddings.documents"):
+            vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+        metrics.increment("embeddings.texts", len(texts))
+        return vectors
+
+    def _stored_vectors(self, vectors: np.ndarray) -> np.ndarray:
+        if self.truncate_dim and self.truncate_dim < vectors.shape[1]:
+            return truncate_vectors(vectors, self.truncate_dim)
+        return vectors
+
+    def _new_index(self, vectors: np.ndarray):
+        dimension = vectors.shape[1]
+
+        factory = self.index_factory or STORAGE_FACTORIES[self.vector_storage]
+        if factory is None:
+            return faiss.IndexFlatL2(dimension)
+
+        # Rule of thumb of ~4*sqrt(n) lists, keeping enough training points per list
+        nlist = max(1, min(int(4 * np.sqrt(len(vectors))), len(vectors) // MIN_POINTS_PER_CENTROID))
+        factory = factory.replace("{nlist}", str(nlist))
+        factory = self._fit_quantizer_bits(factory, min(len(vectors), self.train_sample_size))
+        if factory is None:
+            return faiss.IndexFlatL2(dimension)
+        index = faiss.index_factory(dimension, factory, faiss.METRIC_L2)
+
+        if not index.is_trained:
+            sample = vectors
+            if len(vectors) > self.train_sample_size:
+                rng = np.random.default_rng(0)
+                sample = vectors[rng.choice(len(vectors), self.train_sample_size, replace=False)]
+            logger.info(f"Training {factory} index on {len(sample)} vectors")
+            index.train(sample)
+
+        self._apply_search_parameters(index)
+        logger.info(f"Created {factory} index ({type(faiss.downcast_index(index)).__name__})")
+        return index
+
+    @staticmethod
+    def _fit_quantizer_bits(factory: str, n_train: int) -> Optional[str]:
+        # Each PQ codebook is a k-means over 2**nbits centroids, which needs about
+        # MIN_POINTS_PER_CENTROID points per centroid; below that training is slow and the
+        # codes are poor, while a flat index of that many vectors is still small
+        supported_bits = int(np.log2(max(n_train // MIN_POINTS_PER_CENTROID, 1)))
+        fitted = factory
+        # OPQ always trains 8-bit codebooks for its rotation
+        if supported_bits < 8 and re.match(r"OPQ\d+(_\d+)?,", fitted):
+            fitted = fitted.split(",", 1)[1]
+
+        codes = re.findall(r"(?<!O)PQ\d+(?:x(\d+))?", fitted)
+        if any(int(nbits or 8) > supported_bits for nbits in codes):
+            logger.warning(f"Too few vectors ({n_train}) to train {factory}, using a flat index")
+            return None
+        if fitted != factory:
+            logger.warning(f"Too few vectors ({n_train}) to train the OPQ rotation of {factory}, using {fitted}")
+
+        # Polysemous training is most of the PQ training time and only helps the
+        # Hamming-filtered search, which is never enabled here
+        return re.sub(r"(?<!O)(PQ\d+(?:x\d+)?)(?!fs|np|\d|x)", r"\1np", fitted)
+        # Below 4 bits (also the only fast-scan size) the codes are too coarse to be worth it
+        if supported_bits < 4:
+            logger.warning(f"Too few vectors ({n_train}) to train {factory}, using a flat index")
+            return None
+        logger.warning(f"Too few vectors ({n_train}) to train {factory}, using {fitted}")
+        return fitted
+
+    def _apply_search_parameters(self,
+                                 index,
+                                 nprobe: Optional[int] = None,
+                                 ef_search: Optional[int] = None) -> None:
+        nprobe = nprobe or self.nprobe
+        ef_search = ef_search or self.ef_search
+        parameter_space = faiss.ParameterSpace()
+
+        for name, value in (("nprobe", nprobe), ("efSearch", ef_search)):
+            if value is None:
+                continue
+            try:
+                parameter_space.set_index_parameter(index, name, value)
+                logger.debug(f"Search parameter {name}={value} set")
+            except RuntimeError:
+                # e.g. nprobe on an HNSW index
+                logger.debug(f"Search parameter {name} does not apply to {type(index).__name__}")
+
+    @classmethod
+    def _database_memory_bytes(cls, vdb: FAISS) -> int:
+        # Index estimate plus chunk text, close enough to size the budget
+        index_bytes = cls._index_memory_bytes(vdb.index)
+        text_bytes = 0
+        for doc_id in vdb.index_to_docstore_id.values():
+            doc = vdb.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                text_bytes += len(doc.page_content) + len(str(doc.metadata))
+        return index_bytes + text_bytes
+
+    @staticmethod
+    def _supports_removal(index) -> bool:
+        # LangChain renumbers the remaining vectors 0..n-1 after a delete, which only matches
+        # indexes that compact their codes. IVF lists keep the removed ids' gaps, so later
+        # adds collide with existing ids
+        if faiss.try_extract_index_ivf(index) is not None:
+            return False
+        # An empty selector removes nothing, HNSW and NSG graphs raise for any selector
+        try:
+            index.remove_ids(faiss.IDSelectorBatch(np.array([], dtype=np.int64)))
+            return True
+        except RuntimeError:
+            return False
+
+    @staticmethod
+    def _index_memory_bytes(index) -> int:
+        # Estimated from the code size and structure sizes; serializing would copy the
+        # whole index, and read every page of a memory-mapped one
+        base = faiss.downcast_index(index)
+        if isinstance(base, faiss.IndexPreTransform):
+            transforms = sum(faiss.downcast_VectorTransform(base.chain.at(i)).d_in * base.chain.at(i).d_out * 4
+                             for i in range(base.chain.size()))
+            return transforms + FaissService._index_memory_bytes(base.index)
+
+        # Product quantizer codebooks, the same size whatever the number of vectors
+        pq = getattr(base, "pq", None)
+        codebooks = pq.centroids.size() * 4 if pq is not None else 0
+
+        ivf = faiss.try_extract_index_ivf(base)
+        if ivf is not None:
+            # Codes and 64-bit ids in the inverted lists, plus the coarse quantizer
+            return codebooks + ivf.ntotal * (ivf.code_size + 8) + FaissService._index_memory_bytes(ivf.quantizer)
+
+        if hasattr(base, "hnsw"):
+            # int32 neighbour lists and levels, 64-bit offsets, plus the stored vectors
+            graph = (base.hnsw.neighbors.size() + base.hnsw.levels.size()) * 4 + base.hnsw.offsets.size() * 8
+            return graph + FaissService._index_memory_bytes(base.storage)
+
+        try:
+            return codebooks + base.ntotal * base.sa_code_size()
+        except RuntimeError:
+            return codebooks + base.ntotal * base.d * 4
+
+    @staticmethod
+    def _index_details(index, memory_mapped: bool = False) -> Dict[str, Any]:
+        index_bytes = FaissService._index_memory_bytes(index)
+        details = {
+            "index_type": type(faiss.downcast_index(index)).__name__,
+            "is_trained": bool(index.is_trained),
+            "memory_mapped": memory_mapped,
+            # Pages of a memory-mapped index belong to the OS page cache
+            "memory_bytes": 0 if memory_mapped else index_bytes
+        }
+        # Index size per vector, codes plus whatever structure the index adds
+        details["bytes_per_vector"] = index_bytes / index.ntotal if index.ntotal else 0.0
+
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            details["nlist"] = ivf.nlist
+            details["nprobe"] = ivf.nprobe
+
+        base = faiss.downcast_index(index)
+        if hasattr(base, "hnsw"):
+            details["ef_search"] = base.hnsw.efSearch
+
+        return details
+
+    def _save_database(self,
+                       vdb: FAISS,
+                       index_path: str,
+                       manifest: Optional[IndexManifest] = None) -> None:
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+
+        if self.chunk_store == "sqlite":
+            os.makedirs(index_path, exist_ok=True)
+            faiss.write_index(vdb.index, os.path.join(index_path, "index.faiss"))
+            store_path = os.path.join(index_path, SQLITE_DOCSTORE_FILE)
+            if (isinstance(vdb.docstore, SQLiteDocstore)
+                    and os.path.abspath(vdb.docstore.path) == os.path.abspath(store_path)):
+                # Rows were already added/deleted in place, only positions moved
+                vdb.docstore.save_positions(vdb.index_to_docstore_id)
+            else:
+                SQLiteDocstore.write(store_path, vdb).close()
+            self._remove_files(index_path, ("index.pkl",) + MMAP_FILES)
+        else:
+            pickled = vdb
+            if not isinstance(vdb.docstore, InMemoryDocstore):
+                # A copy with the chunks in memory is pickled, the database in use keeps its store
+                pickled = copy.copy(vdb)
+                pickled.docstore = InMemoryDocstore({
+                    doc_id: vdb.docstore.search(doc_id) for doc_id in vdb.index_to_docstore_id.values()
+                })
+            pickled.save_local(index_path)
+            write_mmap_docstore(pickled, index_path)
+            # The loader prefers the SQLite store, so a stale one must not survive
+            self._remove_files(index_path, (SQLITE_DOCSTORE_FILE,))
+
+        for file_name, indexes, _ in self._sidecar_indexes():
+            sidecar_path = os.path.join(index_path, file_name)
+            if vdb in indexes:
+                indexes[vdb].save(sidecar_path)
+            elif os.path.exists(sidecar_path):
+                os.remove(sidecar_path)
+
+        if manifest is not None:
+            manifest.save(index_path)
+
+    @staticmethod
+    def _remove_files(index_path: str, names: Tuple[str, ...]) -> None:
+        for name in names:
+            path = os.path.join(index_path, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _read_index(self, index_path: str, mmap: bool):
+        index_file = os.path.join(index_path, "index.faiss")
+        if not mmap:
+            index = faiss.read_index(index_file)
+        else:
+            with open(index_file, "rb") as f:
+                fourcc = f.read(4)
+            # IVF indexes ("Iw..") map their inverted lists, flat-code indexes their code array
+            mmap_flag = faiss.IO_FLAG_MMAP if fourcc.startswith(b"Iw") else faiss.IO_FLAG_MMAP_IFC
+            index = faiss.read_index(index_file, mmap_flag | faiss.IO_FLAG_READ_ONLY)
+        self._apply_search_parameters(index)
+        return index
+
+    def _load_mmap_database(self, index_path: str) -> FAISS:
+        if not MmapDocstore.exists(index_path):
+            # Indexes saved before the mmap docstore existed are converted once
+            logger.warning(f"No memory-mappable docstore at {index_path}, converting the pickle docstore")
+            write_mmap_docstore(self.load_local_database(index_path), index_path)
+
+        index = self._read_index(index_path, mmap=True)
+        docstore = MmapDocstore(index_path)
+        vdb = FAISS(self.embeddings, index, docstore, PositionIdMap(docstore.ids))
+        self._read_only_databases.add(vdb)
+
+        logger.info(f"Database memory-mapped read-only from: {index_path}")
+        return vdb
+
+    def _load_sqlite_database(self, index_path: str, mmap: bool) -> FAISS:
+        store_path = os.path.join(index_path, SQLITE_DOCSTORE_FILE)
+        index = self._read_index(index_path, mmap)
+
+        if mmap:
+            docstore = SQLiteDocstore(store_path, read_only=True, mmap_size=os.path.getsize(store_path))
+        else:
+            docstore = SQLiteDocstore(store_path)
+
+        vdb = FAISS(self.embeddings, index, docstore, docstore.load_positions())
+        if mmap:
+            self._read_only_databases.add(vdb)
+
+        logger.info(f"Database loaded from SQLite chunk store: {index_path}")
+        return vdb
+
+    def _build_manifest(self,
+                        documents: List[Document],
+                        chunks: List[Document],
+                        manifest: Optional[IndexManifest] = None) -> IndexManifest:
+        manifest = manifest or IndexManifest()
+
+        chunk_ids_by_source: Dict[str, List[str]] = {}
+        doc_id_by_source: Dict[str, int] = {}
+        for chunk in chunks:
+            source = chunk.metadata["source"]
+            chunk_ids_by_source.setdefault(source, []).append(chunk.id)
+            doc_id_by_source[source] = chunk.metadata["doc_id"]
+
+        for i, doc in enumerate(documents):
+            source = doc.metadata.get("source", f"document_{i}")
+            doc_id = doc_id_by_source[source] if source in doc_id_by_source else manifest.doc_id_for(source)
+            manifest.record(
+                source,
+                fingerprint_text(doc.page_content),
+                doc_id,
+                chunk_ids_by_source.get(source, [])
+            )
+        return manifest
+
+    def _stream_into_database(self,
+                              pages: Iterable[Dict[str, Any]],
+                              batch_size: int,
+                              progress_callback: Optional[Callable[[Dict[str, Any]], None]],
+                              manifest: Optional[IndexManifest] = None) -> FAISS:
+        """
+            Consumes pages as produced by DocumentExtractor.iter_pages, embedding and
+            indexing at most batch_size chunks at a time. Only the pages of the current
+            document are held; it is split once its last page has arrived, giving the
+            chunks, metadata and manifest hash of create_local_database over
+            extract_documents. The one intended difference is that every chunk gets a
+            new uuid.
+        """
+        vdb = None
+        pending: Dict[str, Document] = {}
+        # Trainable indexes are created once a training sample has been collected
+        warmup: Dict[str, Document] = {}
+        warmup_size = self.train_sample_size if self.index_factory is not None else 0
+        progress = {"documents": 0, "pages": 0, "chunks": 0, "fraction": 0.0, "document": None}
+
+        def flush(final: bool = False):
+            nonlocal vdb
+            if not pending and not (final and warmup):
+                return
+            if vdb is None:
+                warmup.update(pending)
+                pending.clear()
+                if final or len(warmup) >= warmup_size:
+                    vdb = self._create_database(list(warmup.values()))
+                    warmup.clear()
+            else:
+                self._add_chunks(vdb, list(pending.values()))
+                pending.clear()
+
+        for event, payload in self._iter_stream_chunks(pages):
+            if event == "chunk":
+                pending[payload.id] = payload
+                progress["chunks"] += 1
+                if len(pending) >= batch_size:
+                    flush()
+
+            elif event == "document_end":
+                if manifest is not None:
+                    manifest.record(payload["source"], payload["hash"], payload["doc_id"], payload["chunk_ids"])
+                progress["documents"] += 1
+
+            elif event == "page":
+                progress["pages"] += 1
+                progress["document"] = payload["document"]
+                if payload.get("document_total") and payload.get("page_count"):
+                    done = payload["document_index"] - 1 + (payload["page"] + 1) / payload["page_count"]
+                    progress["fraction"] = min(done / payload["document_total"], 1.0)
+                if progress_callback is not None:
+                    progress_callback(dict(progress))
+
+        flush(final=True)
+
+        if vdb is None:
+            raise ValueError("No chunks were generated from the provided documents")
+
+        progress["fraction"] = 1.0
+        if progress_callback is not None:
+            progress_callback(dict(progress))
+
+        logger.info(f"Streaming finished: {progress['documents']} documents, "
+                    f"{progress['pages']} pages, {progress['chunks']} chunks")
+        return vdb
+
+    def _iter_stream_chunks(self, pages: Iterable[Dict[str, Any]]) -> Iterator[Tuple[str, Any]]:
+        current = None
+        current_key = None
+        page_texts: List[str] = []
+        doc_id = -1
+
+        def document_events() -> Iterator[Tuple[str, Any]]:
+            # Pages are joined like in DocumentExtractor and split as a whole, so the
+            # chunks and their hash are those of the non-streamed path
+            text = "\n\n".join(page_texts)
+            chunks = self._document_chunks(Document(page_content=text, metadata={"source": current}),
+                                           self.text_splitter.split_text(text), doc_id, doc_id)
+            for chunk in chunks:
+                yield "chunk", chunk
+            yield "document_end", {
+                "source": current,
+                "doc_id": doc_id,
+                "chunk_ids": [chunk.id for chunk in chunks],
+                "hash": fingerprint_text(text)
+            }
+
+        for page in pages:
+            document_key = (page.get("document_index"), page["document"])
+            if document_key != current_key:
+                if current is not None:
+                    yield from document_events()
+                current_key = document_key
+                current = page["document"]
+                page_texts = []
+                doc_id += 1
+            page_texts.append(page["text"])
+            yield "page", page
+
+        if current is not None:
+            yield from document_events()
+
     @staticmethod
     def text_to_documents(text_data):
         documents = [
@@ -0,0 +1,97 @@
+import re
+import time
+import zlib
+import random
+import threading
+from typing import List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+
+class FakeEmbeddings(Embeddings):
+    def __init__(self,
+                 dimension: int = 256,
+                 latency: float = 0.0,
+                 throttle_rate: float = 0.0,
+                 max_concurrent_requests: Optional[int] = None,
+                 seed: int = 0,
+                 dense: bool = False):
+        """
+            Local, deterministic stand-in for an embedding endpoint.
+
+            dimension: Size of the generated vectors
+            latency: Seconds slept on every request
+            throttle_rate: Probability of answering a request with a 429 error
+            max_concurrent_requests: Requests above this number in flight get a 429 error
+            seed: Seed for the throttling decisions
+            dense: Project the hashed words through a fixed random matrix, so every
+                   dimension carries signal like in real embeddings (needed to compare
+                   quantized, binary or truncated storage)
+        """
+        self.dimension = dimension
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.max_concurrent_requests = max_concurrent_requests
+        self.requests = 0
+        self.throttled = 0
+        self.texts_embedded = 0
+        self._in_flight = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._projection = None
+        if dense:
+            # Random projection of 8x more hash buckets keeps distances between texts
+            buckets = 8 * dimension
+            self._projection = np.random.default_rng(seed).standard_normal((buckets, dimension), dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._request()
+        try:
+            with self._lock:
+                self.texts_embedded += len(texts)
+            return self.embed_array(texts).tolist()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        # Feature hashing of the words, so texts sharing words end up close to each other
+        buckets = self.dimension if self._projection is None else len(self._projection)
+        vectors = np.zeros((len(texts), buckets), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in TOKEN_PATTERN.findall(text.lower()):
+                hashed = zlib.crc32(token.encode("utf-8"))
+                sign = 1.0 if hashed & 1 else -1.0
+                vectors[row, (hashed >> 1) % buckets] += sign
+        if self._projection is not None:
+            vectors = vectors @ self._projection
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _request(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self._in_flight += 1
+            over_limit = (self.max_concurrent_requests is not None
+                          and self._in_flight > self.max_concurrent_requests)
+            throttled = over_limit or self._random.random() < self.throttle_rate
+            if throttled:
+                self.throttled += 1
+                self._in_flight -= 1
+
+        if throttled:
+            raise FakeRateLimitError("Too many requests")
+
+        if self.latency:
+            time.sleep(self.latency)
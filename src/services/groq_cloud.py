@@ -1,5 +1,11 @@
-from langchain_groq import ChatGroq
-from src.utils import Settings
+from typing import TYPE_CHECKING, Any, Dict, Tuple
+from src.utils.settings import Settings
+from src.services.http_clients import get_client_pool
+
+if TYPE_CHECKING:
+    from langchain_groq import ChatGroq
+
+GROQ_ENDPOINT = "https://api.groq.com"
 
 
 class GroqCloudService:
@@ -8,15 +14,31 @@ class GroqCloudService:
                  llm_model:str):
         self.llm_model = llm_model
         self.GROQ_API_KEY = sets.groq_api_key
+        self.timeout = sets.llm_timeout
+        self.pool = get_client_pool(timeout=sets.llm_timeout,
+                                    connect_timeout=sets.llm_connect_timeout,
+                                    max_connections=sets.http_max_connections,
+                                    max_concurrency=sets.llm_max_concurrency)
+        self._llms: Dict[Tuple[float, int], "ChatGroq"] = {}
 
     def get_llm(self, temperature: float = 0,
-                      max_tokens: int = 1000) -> ChatGroq:
+                      max_tokens: int = 1000) -> "ChatGroq":
         
-        return ChatGroq(
-            model=self.llm_model,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            reasoning_format="parsed",
-            timeout=None,
-            max_retries=2,
-        )
\ No newline at end of file
+        key = (temperature, max_tokens)
+        if key not in self._llms:
+            # langchain_groq is imported when a model is first needed, not with the module
+            from langchain_groq import ChatGroq
+            self._llms[key] = ChatGroq(
+                model=self.llm_model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                reasoning_format="parsed",
+                timeout=self.timeout,
+                max_retries=2,
+                http_client=self.pool.client(GROQ_ENDPOINT),
+                http_async_client=self.pool.async_client(GROQ_ENDPOINT)
+            )
+        return self._llms[key]
+
+    async def ainvoke(self, messages: Any, temperature: float = 0, max_tokens: int = 1000):
+        return await self.pool.submit(self.get_llm(temperature, max_tokens).ainvoke(messages), GROQ_ENDPOINT)
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Dict, Optional, Tuple
+import httpx
+from src.utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class ClientPool:
+    def __init__(self,
+                 timeout: float = 60.0,
+                 connect_timeout: float = 10.0,
+                 max_connections: int = 20,
+                 max_concurrency: int = 8):
+        """
+            One pooled httpx client per endpoint, shared by every LLM and embedding
+            object that talks to it. Async clients and concurrency limits live on a
+            single background event loop, so they can be used from Streamlit threads
+            and from any caller's loop alike.
+
+            timeout: Seconds for reading a response and waiting for a pooled connection
+            connect_timeout: Seconds for opening a connection
+            max_connections: Open connections per endpoint
+            max_concurrency: Async requests in flight per endpoint
+        """
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_connections)
+        self.max_concurrency = max_concurrency
+        self._clients: Dict[str, httpx.Client] = {}
+        self._async_clients: Dict[str, httpx.AsyncClient] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="client-pool-loop", daemon=True).start()
+            return self._loop
+
+    def client(self, endpoint: str) -> httpx.Client:
+        with self._lock:
+            if endpoint not in self._clients:
+                logger.info(f"Creating pooled HTTP client for {endpoint}")
+                self._clients[endpoint] = httpx.Client(timeout=self.timeout, limits=self.limits)
+            return self._clients[endpoint]
+
+    def async_client(self, endpoint: str) -> httpx.AsyncClient:
+        self.loop
+        with self._lock:
+            if endpoint not in self._async_clients:
+                logger.info(f"Creating pooled async HTTP client for {endpoint}")
+                self._async_clients[endpoint] = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+                # Created on the caller's thread, but only ever used on the pool loop
+                self._semaphores[endpoint] = asyncio.Semaphore(self.max_concurrency)
+            return self._async_clients[endpoint]
+
+    def run(self, coroutine: Awaitable, endpoint: Optional[str] = None) -> Any:
+        """
+            Runs a coroutine on the pool loop from synchronous code and waits for it.
+        """
+        return asyncio.run_coroutine_threadsafe(self._bounded(coroutine, endpoint), self.loop).result()
+
+    async def submit(self, coroutine: Awaitable, endpoint: Optional[str] = None) -> Any:
+        """
+            Awaits a coroutine on the pool loop from any event loop, limited to
+            max_concurrency in flight per endpoint.
+        """
+        loop = self.loop
+        if asyncio.get_running_loop() is loop:
+            return await self._bounded(coroutine, endpoint)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._bounded(coroutine, endpoint), loop))
+
+    async def _bounded(self, coroutine: Awaitable, endpoint: Optional[str]) -> Any:
+        semaphore = self._semaphores.get(endpoint)
+        if semaphore is None:
+            return await coroutine
+        async with semaphore:
+            return await coroutine
+
+    def close(self) -> None:
+        with self._lock:
+            clients = list(self._clients.values())
+            async_clients = list(self._async_clients.values())
+            self._clients.clear()
+            self._async_clients.clear()
+            self._semaphores.clear()
+        for client in clients:
+            client.close()
+        if self._loop is not None:
+            for client in async_clients:
+                asyncio.run_coroutine_threadsafe(client.aclose(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+
+
+_pools: Dict[Tuple, ClientPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_client_pool(timeout: float = 60.0,
+                    connect_timeout: float = 10.0,
+                    max_connections: int = 20,
+                    max_concurrency: int = 8) -> ClientPool:
+    # Services built with the same settings share one pool, e.g. across Streamlit reruns
+    key = (timeout, connect_timeout, max_connections, max_concurrency)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ClientPool(timeout, connect_timeout, max_connections, max_concurrency)
+        return _pools[key]
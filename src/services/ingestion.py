@@ -0,0 +1,434 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from src.utils import setup_logger
+from src.utils.extractors import DocumentExtractor
+from src.services.faiss import FaissService
+from src.services.manifest import IndexManifest
+
+logger = setup_logger(__name__)
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+# Checkpoints are written next to the final index and renamed over it once complete
+STAGING_SUFFIX = ".partial"
+# Written last at every checkpoint: the files processed so far and the chunks saved for them
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+class JobClaimLost(Exception):
+    """
+        The job was requeued and claimed by another worker, which now owns its files.
+    """
+
+
+class IngestionQueue:
+    def __init__(self, queue_dir: str):
+        """
+            Job queue kept as JSON files in one folder per status, so any number of
+            worker processes (or the UI) can share it without a broker. A job is
+            claimed by renaming its file from queued/ to running/, which only one
+            worker can do.
+
+            queue_dir: Folder holding the queued/, running/, done/ and failed/ job files
+        """
+        self.queue_dir = queue_dir
+        for status in JOB_STATUSES:
+            os.makedirs(os.path.join(queue_dir, status), exist_ok=True)
+
+    def submit(self, source: str, index_path: str, remove_source: bool = False) -> Dict[str, Any]:
+        """
+            source: PDF file or folder of PDFs to index
+            index_path: Folder the finished index is saved to, replacing any index there
+            remove_source: Delete source once the job is done or failed, for uploaded copies
+        """
+        # Millisecond prefix, so sorting the file names gives submission order
+        job_id = f"{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}"
+        job = {
+            "id": job_id,
+            "source": os.path.abspath(source),
+            "index_path": os.path.abspath(index_path),
+            "status": "queued",
+            "created_at": time.time(),
+            "updated_at": time.time(),
+            "progress": {},
+            "error": None,
+            "remove_source": remove_source
+        }
+        self._write(job)
+        logger.info(f"Ingestion job queued: {job_id} ({source} -> {index_path})")
+        return job
+
+    def claim(self, job_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+            Marks the oldest queued job, or job_id, as running and returns it. None when
+            there is nothing to claim.
+        """
+        names = [f"{job_id}.json"] if job_id else sorted(os.listdir(self._status_dir("queued")))
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            try:
+                os.rename(os.path.join(self._status_dir("queued"), name),
+                          os.path.join(self._status_dir("running"), name))
+            except FileNotFoundError:
+                # Claimed by another worker in the meantime
+                continue
+            job = self._read(os.path.join(self._status_dir("running"), name))
+            job["status"] = "running"
+            job["worker"] = os.getpid()
+            # Distinguishes this claim from a later one of the same job after a requeue
+            job["claim"] = uuid.uuid4().hex
+            self.update(job)
+            return job
+        return None
+
+    def owns(self, job: Dict[str, Any]) -> bool:
+        """
+            Whether job is still running under the claim this copy was returned with.
+        """
+        try:
+            current = self._read(os.path.join(self._status_dir("running"), f"{job['id']}.json"))
+        except FileNotFoundError:
+            return False
+        return current.get("claim") == job.get("claim")
+
+    def update(self, job: Dict[str, Any]) -> None:
+        # Also the heartbeat that requeue_stale looks at
+        job["updated_at"] = time.time()
+        self._write(job)
+
+    def complete(self, job: Dict[str, Any]) -> None:
+        self._move(job, "done")
+
+    def fail(self, job: Dict[str, Any], error: str) -> None:
+        job["error"] = error
+        self._move(job, "failed")
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        # A job moving between folders may be missed once, so every folder is checked twice
+        for _ in range(2):
+            for status in JOB_STATUSES:
+                path = os.path.join(self._status_dir(status), f"{job_id}.json")
+                try:
+                    return self._read(path)
+                except FileNotFoundError:
+                    continue
+        return None
+
+    def list_jobs(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        jobs = []
+        for job_status in ([status] if status else JOB_STATUSES):
+            folder = self._status_dir(job_status)
+            for name in sorted(os.listdir(folder)):
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    jobs.append(self._read(os.path.join(folder, name)))
+                except FileNotFoundError:
+                    continue
+        return jobs
+
+    def requeue_stale(self, max_age: float) -> List[str]:
+        """
+            Puts running jobs without a heartbeat for max_age seconds back in the queue,
+            e.g. after their worker was killed. They resume from their last checkpoint.
+        """
+        requeued = []
+        now = time.time()
+        for job in self.list_jobs("running"):
+            if now - job.get("updated_at", 0) < max_age:
+                continue
+            job["status"] = "queued"
+            job["updated_at"] = now
+            self._write(job)
+            self._remove(job["id"], "running")
+            requeued.append(job["id"])
+            logger.warning(f"Ingestion job {job['id']} requeued after {max_age:.0f}s without progress")
+        return requeued
+
+    def _status_dir(self, status: str) -> str:
+        return os.path.join(self.queue_dir, status)
+
+    def _move(self, job: Dict[str, Any], status: str) -> None:
+        previous = job["status"]
+        job["status"] = status
+        job["updated_at"] = time.time()
+        self._write(job)
+        if previous != status:
+            self._remove(job["id"], previous)
+
+    def _write(self, job: Dict[str, Any]) -> None:
+        # Written aside and renamed, so readers never see a partial file
+        path = os.path.join(self._status_dir(job["status"]), f"{job['id']}.json")
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        os.replace(temp_path, path)
+
+    def _remove(self, job_id: str, status: str) -> None:
+        try:
+            os.remove(os.path.join(self._status_dir(status), f"{job_id}.json"))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _read(path: str) -> Dict[str, Any]:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+class IngestionWorker:
+    def __init__(self,
+                 queue: IngestionQueue,
+                 extractor: DocumentExtractor,
+                 faiss_service: FaissService,
+                 checkpoint_every: int = 10,
+                 poll_interval: float = 2.0,
+                 stale_after: float = 900.0):
+        """
+            Builds and saves the indexes of queued jobs outside the web process. Documents
+            are added checkpoint_every at a time to a staging index kept in memory and
+            saved after every batch; a job restarted after a crash skips the documents
+            of its last checkpoint.
+
+            checkpoint_every: Documents extracted and indexed between two checkpoints
+            poll_interval: Seconds between queue checks while idle
+            stale_after: Seconds without a heartbeat after which a running job is assumed
+                         abandoned and queued again. Running jobs send one every stale_after / 3
+                         seconds from a background thread, also while a large PDF is extracted
+                         or embedding waits on rate limits
+        """
+        self.queue = queue
+        self.extractor = extractor
+        self.faiss_service = faiss_service
+        self.checkpoint_every = checkpoint_every
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Serializes the job file writes of the job thread and the heartbeat thread
+        self._job_lock = threading.Lock()
+
+    def run_job(self,
+                job: Dict[str, Any],
+                progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        finished = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job, finished),
+                                     name=f"ingestion-heartbeat-{job['id']}", daemon=True)
+        heartbeat.start()
+        try:
+            return self._run_job(job, progress_callback)
+        finally:
+            finished.set()
+            heartbeat.join()
+
+    def _run_job(self,
+                 job: Dict[str, Any],
+                 progress_callback: Optional[Callable[[Dict[str, Any]], None]]) -> Dict[str, Any]:
+        try:
+            source = Path(job["source"])
+            index_path = job["index_path"]
+            staging_path = f"{index_path}{STAGING_SUFFIX}"
+            logger.info(f"Running ingestion job {job['id']}: {source} -> {index_path}")
+
+            if source.is_file():
+                pdf_files = [source]
+            elif source.is_dir():
+                pdf_files = sorted(source.glob("*.pdf"))
+            else:
+                raise FileNotFoundError(f"Path does not exist: {source}")
+
+            # Files of the last checkpoint were processed before a restart
+            vdb, manifest, checkpoint = self._load_checkpoint(staging_path)
+            processed = set(checkpoint["processed"])
+            pending = [pdf_file for pdf_file in pdf_files if pdf_file.name not in processed]
+            if processed:
+                logger.info(f"Resuming job {job['id']}: {len(pdf_files) - len(pending)} of "
+                            f"{len(pdf_files)} documents already processed")
+
+            progress = job["progress"] = {
+                "documents_total": len(pdf_files),
+                "documents_done": len(pdf_files) - len(pending),
+                "documents_skipped": checkpoint["skipped"],
+                "chunks": checkpoint["chunks"],
+                "fraction": (len(pdf_files) - len(pending)) / max(len(pdf_files), 1),
+                "current": None
+            }
+            self._report(job, progress_callback)
+
+            batch = []
+            for i, pdf_file in enumerate(pending, 1):
+                progress["current"] = pdf_file.name
+                try:
+                    batch.extend(FaissService.text_to_documents(self.extractor.extract_documents(pdf_file)))
+                except Exception as e:
+                    # One unreadable PDF does not fail the whole job
+                    logger.error(f"Skipping {pdf_file.name} in job {job['id']}: {str(e)}")
+                    progress["documents_skipped"].append(pdf_file.name)
+                checkpoint["processed"].append(pdf_file.name)
+
+                if i % self.checkpoint_every == 0 or i == len(pending):
+                    # The staging folder belongs to whichever worker holds the claim
+                    self._check_claim(job)
+                    if batch:
+                        if vdb is None:
+                            vdb = self.faiss_service.create_local_database(batch, staging_path)
+                            manifest = IndexManifest.load(staging_path)
+                        else:
+                            self.faiss_service.add_documents_to_database(vdb, batch, manifest)
+                            self.faiss_service.save_local_database(vdb, staging_path, manifest)
+                        progress["chunks"] = vdb.index.ntotal
+                        batch = []
+                    checkpoint["chunks"] = progress["chunks"]
+                    self._save_checkpoint(staging_path, checkpoint)
+                    progress["documents_done"] = len(pdf_files) - len(pending) + i
+                    progress["fraction"] = progress["documents_done"] / len(pdf_files)
+                self._report(job, progress_callback)
+
+            if vdb is None:
+                raise ValueError(f"No text could be extracted from {source}")
+
+            with self._job_lock:
+                self._check_claim(job)
+                os.remove(os.path.join(staging_path, CHECKPOINT_FILE))
+                self._publish(staging_path, index_path)
+                progress["current"] = None
+                progress["fraction"] = 1.0
+                self.queue.complete(job)
+            self._remove_source(job)
+            self._report(job, progress_callback, write=False)
+            logger.info(f"Ingestion job {job['id']} done: {progress['chunks']} chunks saved at {index_path}")
+            return job
+
+        except JobClaimLost:
+            # Nothing is written, the job and its staging folder are the new owner's
+            logger.warning(f"Ingestion job {job['id']} was claimed by another worker, stopping")
+            raise
+
+        except Exception as e:
+            logger.error(f"Error running ingestion job {job['id']}: {str(e)}")
+            with self._job_lock:
+                if self.queue.owns(job):
+                    self.queue.fail(job, str(e))
+                    self._remove_source(job)
+            raise
+
+    def run_once(self) -> Optional[Dict[str, Any]]:
+        """
+            Runs the oldest queued job, if any. Failed jobs are recorded in the queue
+            and returned instead of raising, so a worker loop keeps going.
+        """
+        job = self.queue.claim()
+        if job is None:
+            return None
+        try:
+            return self.run_job(job)
+        except Exception:
+            return self.queue.get(job["id"])
+
+    def run_forever(self) -> None:
+        logger.info(f"Ingestion worker started on {self.queue.queue_dir}")
+        while not self._stop.is_set():
+            self.queue.requeue_stale(self.stale_after)
+            if self.run_once() is None:
+                self._stop.wait(self.poll_interval)
+        logger.info("Ingestion worker stopped")
+
+    def start(self) -> None:
+        """
+            Runs the worker loop in a daemon thread, for single-process deployments.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, name="ingestion-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _heartbeat(self, job: Dict[str, Any], finished: threading.Event) -> None:
+        interval = max(self.stale_after / 3, 0.1)
+        while not finished.wait(interval):
+            with self._job_lock:
+                if finished.is_set() or not self.queue.owns(job):
+                    return
+                self.queue.update(job)
+
+    def _check_claim(self, job: Dict[str, Any]) -> None:
+        if not self.queue.owns(job):
+            raise JobClaimLost(f"Ingestion job {job['id']} is no longer claimed by this worker")
+
+    def _load_checkpoint(self, staging_path: str):
+        """
+            Staging database, manifest and checkpoint to resume from. A staging folder
+            whose index does not match its checkpoint (crash while saving) is discarded.
+        """
+        empty = {"processed": [], "skipped": [], "chunks": 0}
+        checkpoint_path = os.path.join(staging_path, CHECKPOINT_FILE)
+        if not os.path.exists(checkpoint_path):
+            if os.path.exists(staging_path):
+                shutil.rmtree(staging_path)
+            return None, None, empty
+
+        with open(checkpoint_path, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if not checkpoint["chunks"]:
+            return None, None, checkpoint
+        try:
+            vdb = self.faiss_service.load_local_database(staging_path)
+            manifest = IndexManifest.load(staging_path)
+            if vdb.index.ntotal == checkpoint["chunks"] and manifest is not None:
+                return vdb, manifest, checkpoint
+        except Exception as e:
+            logger.warning(f"Unreadable staging index at {staging_path}: {str(e)}")
+        logger.warning(f"Staging index at {staging_path} does not match its checkpoint, starting over")
+        shutil.rmtree(staging_path)
+        return None, None, empty
+
+    @staticmethod
+    def _remove_source(job: Dict[str, Any]) -> None:
+        if not job.get("remove_source"):
+            return
+        if os.path.isdir(job["source"]):
+            shutil.rmtree(job["source"], ignore_errors=True)
+        elif os.path.exists(job["source"]):
+            os.remove(job["source"])
+
+    @staticmethod
+    def _save_checkpoint(staging_path: str, checkpoint: Dict[str, Any]) -> None:
+        os.makedirs(staging_path, exist_ok=True)
+        path = os.path.join(staging_path, CHECKPOINT_FILE)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _report(self,
+                job: Dict[str, Any],
+                progress_callback: Optional[Callable[[Dict[str, Any]], None]],
+                write: bool = True) -> None:
+        if write:
+            with self._job_lock:
+                self._check_claim(job)
+                self.queue.update(job)
+        if progress_callback is not None:
+            progress_callback(dict(job["progress"]))
+
+    @staticmethod
+    def _publish(staging_path: str, index_path: str) -> None:
+        # Readers either see the previous index or the complete new one
+        previous_path = f"{index_path}.previous"
+        if os.path.exists(previous_path):
+            shutil.rmtree(previous_path)
+        if os.path.exists(index_path):
+            os.rename(index_path, previous_path)
+        os.rename(staging_path, index_path)
+        if os.path.exists(previous_path):
+            shutil.rmtree(previous_path)
@@ -0,0 +1,207 @@
+import re
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from src.utils import setup_logger
+
+logger = setup_logger(__name__)
+
+# Keeps identifiers such as part numbers ("AB-1234") or clause ids ("7.2.1") whole
+TOKEN_PATTERN = re.compile(r"\w[\w\-./]*\w|\w")
+PART_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        # Also index the parts, so "ab" or "1234" still match "ab-1234"
+        if not token.isalnum() and len(token) > 1:
+            tokens.extend(part for part in PART_PATTERN.findall(token) if part != token)
+    return tokens
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+            Inverted index stored as CSR arrays (term -> rows, term frequencies) with
+            BM25 scoring. Rows are addressed by docstore id; deleted rows are masked
+            until the index is compacted. Postings of added rows are buffered and merged
+            into the CSR arrays on the next search, compaction or save, so indexing batch
+            by batch does not rebuild the arrays for every batch.
+
+            k1: Term frequency saturation
+            b: Document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: Dict[str, int] = {}
+        self.doc_ids: List[str] = []
+        self.row_of: Dict[str, int] = {}
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.rows = np.zeros(0, dtype=np.int32)
+        self.tfs = np.zeros(0, dtype=np.float32)
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
+        self.alive = np.zeros(0, dtype=bool)
+        # (term ids, rows, term frequencies) of each add not merged yet
+        self._pending: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return int(self.alive.sum())
+
+    def add(self, doc_ids: List[str], texts: List[str]) -> None:
+        term_ids, rows, tfs, lengths = [], [], [], []
+
+        with self._lock:
+            first_row = len(self.doc_ids)
+            for offset, (doc_id, text) in enumerate(zip(doc_ids, texts)):
+                counts: Dict[int, int] = {}
+                tokens = tokenize(text)
+                for token in tokens:
+                    term_id = self.vocabulary.setdefault(token, len(self.vocabulary))
+                    counts[term_id] = counts.get(term_id, 0) + 1
+
+                term_ids.extend(counts.keys())
+                tfs.extend(counts.values())
+                rows.extend([first_row + offset] * len(counts))
+                lengths.append(len(tokens))
+                self.row_of[doc_id] = first_row + offset
+                self.doc_ids.append(doc_id)
+
+            self._pending.append((np.asarray(term_ids, dtype=np.int64),
+                                  np.asarray(rows, dtype=np.int32),
+                                  np.asarray(tfs, dtype=np.float32)))
+            self.doc_lengths = np.concatenate([self.doc_lengths, np.asarray(lengths, dtype=np.float32)])
+            self.alive = np.concatenate([self.alive, np.ones(len(doc_ids), dtype=bool)])
+
+    def delete(self, doc_ids: List[str]) -> None:
+        with self._lock:
+            for doc_id in doc_ids:
+                row = self.row_of.pop(doc_id, None)
+                if row is not None:
+                    self.alive[row] = False
+
+    def search(self,
+               query: str,
+               k: int,
+               allowed: Optional[Callable[[np.ndarray], np.ndarray]] = None) -> List[Tuple[str, float]]:
+        """
+            allowed: Receives the docstore ids of the matching chunks and returns a
+                     boolean mask of the ones that may be returned
+        """
+        alive_count = len(self)
+        if alive_count == 0:
+            return []
+        if self._pending:
+            with self._lock:
+                self._merge_pending()
+
+        term_ids = {self.vocabulary[token] for token in tokenize(query) if token in self.vocabulary}
+        if not term_ids:
+            return []
+
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        average_length = float(self.doc_lengths[self.alive].mean()) or 1.0
+        norms = self.k1 * (1 - self.b + self.b * self.doc_lengths / average_length)
+
+        for term_id in term_ids:
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            rows = self.rows[start:end]
+            tfs = self.tfs[start:end]
+            document_frequency = end - start
+            idf = np.log(1 + (alive_count - document_frequency + 0.5) / (document_frequency + 0.5))
+            scores += np.bincount(rows, weights=idf * tfs * (self.k1 + 1) / (tfs + norms[rows]),
+                                  minlength=len(scores)).astype(np.float32)
+
+        scores[~self.alive] = 0
+        candidates = np.flatnonzero(scores)
+        if allowed is not None and len(candidates):
+            candidates = candidates[allowed(np.array([self.doc_ids[row] for row in candidates], dtype=str))]
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.doc_ids[row], float(scores[row])) for row in candidates]
+
+    def compact(self) -> None:
+        # Drops deleted rows and renumbers the remaining ones
+        with self._lock:
+            self._merge_pending()
+            if self.alive.all():
+                return
+            new_row = np.cumsum(self.alive) - 1
+            keep = self.alive[self.rows]
+            terms = np.repeat(np.arange(len(self.indptr) - 1, dtype=np.int64), np.diff(self.indptr))[keep]
+
+            self.rows = new_row[self.rows[keep]].astype(np.int32)
+            self.tfs = self.tfs[keep]
+            self.indptr = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(terms, minlength=len(self.vocabulary)), out=self.indptr[1:])
+            self.doc_ids = [doc_id for doc_id, alive in zip(self.doc_ids, self.alive) if alive]
+            self.row_of = {doc_id: row for row, doc_id in enumerate(self.doc_ids)}
+            self.doc_lengths = self.doc_lengths[self.alive]
+            self.alive = np.ones(len(self.doc_ids), dtype=bool)
+
+    def save(self, path: str) -> None:
+        self.compact()
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        np.savez(
+            path,
+            terms=np.array(terms, dtype=str),
+            doc_ids=np.array(self.doc_ids, dtype=str),
+            indptr=self.indptr,
+            rows=self.rows,
+            tfs=self.tfs,
+            doc_lengths=self.doc_lengths,
+            params=np.array([self.k1, self.b], dtype=np.float64)
+        )
+        logger.debug(f"Lexical index with {len(self.doc_ids)} chunks and {len(terms)} terms written to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path) as data:
+            k1, b = data["params"]
+            index = cls(k1=float(k1), b=float(b))
+            index.vocabulary = {str(term): term_id for term_id, term in enumerate(data["terms"])}
+            index.doc_ids = [str(doc_id) for doc_id in data["doc_ids"]]
+            index.row_of = {doc_id: row for row, doc_id in enumerate(index.doc_ids)}
+            index.indptr = data["indptr"]
+            index.rows = data["rows"]
+            index.tfs = data["tfs"]
+            index.doc_lengths = data["doc_lengths"]
+            index.alive = np.ones(len(index.doc_ids), dtype=bool)
+        return index
+
+    def _merge_pending(self) -> None:
+        # Only the buffered postings are sorted; rows of existing terms keep their
+        # positions, shifted by the postings merged in before them. Callers hold the lock
+        if not self._pending:
+            return
+        new_terms = np.concatenate([terms for terms, _, _ in self._pending])
+        new_rows = np.concatenate([rows for _, rows, _ in self._pending])
+        new_tfs = np.concatenate([tfs for _, _, tfs in self._pending])
+        self._pending = []
+        # Stable, so the rows of a term stay ascending after the older ones
+        order = np.argsort(new_terms, kind="stable")
+        new_terms = new_terms[order]
+
+        vocabulary_size = len(self.vocabulary)
+        old_terms = len(self.indptr) - 1
+        old_counts = np.zeros(vocabulary_size, dtype=np.int64)
+        old_counts[:old_terms] = np.diff(self.indptr)
+        new_counts = np.bincount(new_terms, minlength=vocabulary_size)
+        indptr = np.zeros(vocabulary_size + 1, dtype=np.int64)
+        np.cumsum(old_counts + new_counts, out=indptr[1:])
+
+        rows = np.empty(indptr[-1], dtype=np.int32)
+        tfs = np.empty(indptr[-1], dtype=np.float32)
+        old_positions = np.arange(len(self.rows)) + np.repeat(indptr[:old_terms] - self.indptr[:-1],
+                                                              old_counts[:old_terms])
+        rows[old_positions] = self.rows
+        tfs[old_positions] = self.tfs
+        rank = np.arange(len(new_terms)) - (np.cumsum(new_counts) - new_counts)[new_terms]
+        new_positions = indptr[new_terms] + old_counts[new_terms] + rank
+        rows[new_positions] = new_rows[order]
+        tfs[new_positions] = new_tfs[order]
+
+        self.indptr, self.rows, self.tfs = indptr, rows, tfs
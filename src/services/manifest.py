@@ -0,0 +1,82 @@
+import os
+import json
+import hashlib
+from typing import Dict, List, Optional
+from langchain.docstore.document import Document
+from src.utils import setup_logger
+
+logger = setup_logger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+
+
+def fingerprint_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class IndexManifest:
+    def __init__(self,
+                 documents: Optional[Dict[str, dict]] = None,
+                 next_doc_id: int = 0):
+        """
+            documents: source -> {"hash", "doc_id", "chunk_ids"} of every indexed document
+            next_doc_id: doc_id given to the next new document
+        """
+        self.documents = documents or {}
+        self.next_doc_id = next_doc_id
+
+    def record(self, source: str, content_hash: Optional[str], doc_id: int, chunk_ids: List[str]) -> None:
+        self.documents[source] = {
+            "hash": content_hash,
+            "doc_id": doc_id,
+            "chunk_ids": list(chunk_ids)
+        }
+        self.next_doc_id = max(self.next_doc_id, doc_id + 1)
+
+    def remove(self, source: str) -> List[str]:
+        entry = self.documents.pop(source, None)
+        return entry["chunk_ids"] if entry else []
+
+    def doc_id_for(self, source: str) -> int:
+        # Changed documents keep their doc_id, new ones get the next free one
+        if source in self.documents:
+            return self.documents[source]["doc_id"]
+        doc_id = self.next_doc_id
+        self.next_doc_id += 1
+        return doc_id
+
+    def save(self, index_path: str) -> None:
+        with open(os.path.join(index_path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump({"next_doc_id": self.next_doc_id, "documents": self.documents}, f)
+
+    @classmethod
+    def load(cls, index_path: str) -> Optional["IndexManifest"]:
+        manifest_path = os.path.join(index_path, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(documents=data.get("documents", {}), next_doc_id=data.get("next_doc_id", 0))
+
+    @classmethod
+    def from_database(cls, vdb) -> "IndexManifest":
+        """
+            Rebuilds a manifest for indexes saved before manifests existed. Hashes are
+            unknown, so every document is treated as changed on the next sync.
+        """
+        manifest = cls()
+        for chunk_id in vdb.index_to_docstore_id.values():
+            chunk = vdb.docstore.search(chunk_id)
+            if not isinstance(chunk, Document):
+                continue
+            source = chunk.metadata.get("source")
+            entry = manifest.documents.setdefault(source, {
+                "hash": None,
+                "doc_id": chunk.metadata.get("doc_id", 0),
+                "chunk_ids": []
+            })
+            entry["chunk_ids"].append(chunk_id)
+            manifest.next_doc_id = max(manifest.next_doc_id, entry["doc_id"] + 1)
+
+        logger.warning(f"Manifest rebuilt from docstore with {len(manifest.documents)} documents")
+        return manifest
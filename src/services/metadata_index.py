@@ -0,0 +1,151 @@
+import threading
+from typing import Any, Dict, List, Optional
+import numpy as np
+import faiss
+from src.utils import setup_logger
+
+logger = setup_logger(__name__)
+
+# Fields written by FaissService._process_documents
+CATEGORICAL_FIELDS = ("source",)
+NUMERIC_FIELDS = ("doc_id", "chunk_id")
+
+
+class MetadataIndex:
+    def __init__(self):
+        """
+            Chunk metadata as NumPy columns aligned with the FAISS index positions.
+            Categorical fields are dictionary-encoded and get one bitmap per value,
+            so a filter becomes a few vectorized ORs/ANDs turned into an IDSelector.
+        """
+        self.ids = np.zeros(0, dtype=str)
+        self.codes: Dict[str, np.ndarray] = {field: np.zeros(0, dtype=np.int32) for field in CATEGORICAL_FIELDS}
+        self.values: Dict[str, List[Any]] = {field: [] for field in CATEGORICAL_FIELDS}
+        self.numbers: Dict[str, np.ndarray] = {field: np.zeros(0, dtype=np.int64) for field in NUMERIC_FIELDS}
+        self._value_codes: Dict[str, Dict[Any, int]] = {field: {} for field in CATEGORICAL_FIELDS}
+        self._bitmaps: Dict[tuple, np.ndarray] = {}
+        self._id_order: Optional[np.ndarray] = None
+        self._sorted_ids: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, doc_ids: List[str], metadatas: List[dict]) -> None:
+        with self._lock:
+            self.ids = np.concatenate([self.ids, np.array(doc_ids, dtype=str)])
+
+            for field in CATEGORICAL_FIELDS:
+                value_codes = self._value_codes[field]
+                codes = np.empty(len(metadatas), dtype=np.int32)
+                for i, metadata in enumerate(metadatas):
+                    value = metadata.get(field)
+                    if value not in value_codes:
+                        value_codes[value] = len(self.values[field])
+                        self.values[field].append(value)
+                    codes[i] = value_codes[value]
+                self.codes[field] = np.concatenate([self.codes[field], codes])
+
+            for field in NUMERIC_FIELDS:
+                numbers = np.fromiter((metadata.get(field, -1) for metadata in metadatas),
+                                      dtype=np.int64, count=len(metadatas))
+                self.numbers[field] = np.concatenate([self.numbers[field], numbers])
+
+            self._bitmaps.clear()
+            self._id_order = None
+
+    def delete(self, doc_ids: List[str]) -> None:
+        # FAISS compacts positions on delete, so the columns are compacted the same way
+        with self._lock:
+            keep = ~np.isin(self.ids, np.array(list(doc_ids), dtype=str))
+            self.ids = self.ids[keep]
+            for field in CATEGORICAL_FIELDS:
+                self.codes[field] = self.codes[field][keep]
+            for field in NUMERIC_FIELDS:
+                self.numbers[field] = self.numbers[field][keep]
+            self._bitmaps.clear()
+            self._id_order = None
+
+    def mask(self, filter: Dict[str, Any]) -> np.ndarray:
+        """
+            Boolean mask over index positions. Each filter entry is a field name and
+            either a value (equality) or a list/set/tuple of values (membership);
+            entries are ANDed.
+        """
+        mask = np.ones(len(self.ids), dtype=bool)
+        for field, wanted in filter.items():
+            wanted = list(wanted) if isinstance(wanted, (list, set, tuple, frozenset)) else [wanted]
+
+            if field in CATEGORICAL_FIELDS:
+                field_mask = np.zeros(len(self.ids), dtype=bool)
+                for value in wanted:
+                    code = self._value_codes[field].get(value)
+                    if code is not None:
+                        field_mask |= self._bitmap(field, code)
+            elif field in NUMERIC_FIELDS:
+                field_mask = np.isin(self.numbers[field], np.array(wanted, dtype=np.int64))
+            else:
+                raise ValueError(f"Cannot filter on metadata field: {field}")
+
+            mask &= field_mask
+        return mask
+
+    def contains(self, doc_ids: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        # Whether each docstore id is at a position selected by mask
+        positions = self.positions(doc_ids)
+        return (positions >= 0) & mask[np.maximum(positions, 0)]
+
+    def positions(self, doc_ids: np.ndarray) -> np.ndarray:
+        # FAISS position of each docstore id, -1 for ids not in the index
+        doc_ids = np.asarray(doc_ids, dtype=str)
+        if not len(self.ids):
+            return np.full(len(doc_ids), -1, dtype=np.int64)
+        if self._id_order is None:
+            self._id_order = np.argsort(self.ids, kind="stable")
+            self._sorted_ids = self.ids[self._id_order]
+        slots = np.minimum(np.searchsorted(self._sorted_ids, doc_ids), len(self._sorted_ids) - 1)
+        return np.where(self._sorted_ids[slots] == doc_ids, self._id_order[slots], -1).astype(np.int64)
+
+    def selector(self, mask: np.ndarray):
+        # Few hits are cheaper as an id batch than as a bitmap over every vector
+        count = int(mask.sum())
+        if count * 64 < len(mask):
+            return faiss.IDSelectorBatch(np.flatnonzero(mask).astype(np.int64))
+        return faiss.IDSelectorBitmap(np.packbits(mask, bitorder="little"))
+
+    def _bitmap(self, field: str, code: int) -> np.ndarray:
+        key = (field, code)
+        bitmap = self._bitmaps.get(key)
+        if bitmap is None:
+            bitmap = self.codes[field] == code
+            self._bitmaps[key] = bitmap
+        return bitmap
+
+    def save(self, path: str) -> None:
+        arrays = {"ids": self.ids}
+        for field in CATEGORICAL_FIELDS:
+            arrays[f"codes_{field}"] = self.codes[field]
+            # None marks chunks without the field
+            arrays[f"values_{field}"] = np.array(
+                ["" if value is None else str(value) for value in self.values[field]], dtype=str)
+            arrays[f"missing_{field}"] = np.array([value is None for value in self.values[field]], dtype=bool)
+        for field in NUMERIC_FIELDS:
+            arrays[f"numbers_{field}"] = self.numbers[field]
+        np.savez(path, **arrays)
+        logger.debug(f"Metadata index with {len(self.ids)} chunks written to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> "MetadataIndex":
+        index = cls()
+        with np.load(path) as data:
+            index.ids = data["ids"]
+            for field in CATEGORICAL_FIELDS:
+                index.codes[field] = data[f"codes_{field}"]
+                index.values[field] = [
+                    None if missing else str(value)
+                    for value, missing in zip(data[f"values_{field}"], data[f"missing_{field}"])
+                ]
+                index._value_codes[field] = {value: code for code, value in enumerate(index.values[field])}
+            for field in NUMERIC_FIELDS:
+                index.numbers[field] = data[f"numbers_{field}"]
+        return index
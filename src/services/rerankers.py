@@ -0,0 +1,226 @@
+import time
+import hashlib
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from langchain.docstore.document import Document
+from langchain_core.embeddings import Embeddings
+from src.utils import setup_logger
+from src.utils.metrics import metrics
+from src.services.query_cache import LRUCache
+
+logger = setup_logger(__name__)
+
+
+class Reranker(ABC):
+    name = "reranker"
+
+    def __init__(self,
+                 batch_size: int = 32,
+                 cache_size: int = 4096,
+                 cache_ttl: Optional[float] = None):
+        """
+            Rescores (query, chunk) pairs after retrieval. Subclasses implement
+            _score_pairs; pairs are scored batch_size at a time and the scores are
+            cached, so follow-up questions over the same chunks only score new pairs.
+
+            batch_size: Pairs per scoring call
+            cache_size: Cached pair scores, 0 disables the cache
+            cache_ttl: Seconds a cached score stays valid
+        """
+        self.batch_size = batch_size
+        self.budget_exceeded = 0
+        self._cache = LRUCache(cache_size, cache_ttl) if cache_size else None
+
+    def score(self,
+              query: str,
+              texts: Sequence[str],
+              deadline: Optional[float] = None) -> Optional[List[float]]:
+        """
+            Relevance of each text to query, higher is better.
+
+            deadline: time.perf_counter() value after which no further batch is started;
+                      None is returned when some texts are still unscored by then
+        """
+        scores: List[Optional[float]] = [None] * len(texts)
+        keys = [self._cache_key(query, text) for text in texts]
+        if self._cache is not None:
+            for i, key in enumerate(keys):
+                scores[i] = self._cache.get(key)
+
+        missing = [i for i, value in enumerate(scores) if value is None]
+        for start in range(0, len(missing), self.batch_size):
+            if deadline is not None and time.perf_counter() > deadline:
+                return None
+            batch = missing[start:start + self.batch_size]
+            with metrics.span("rerank.score", reranker=self.name):
+                batch_scores = self._score_pairs(query, [texts[i] for i in batch])
+            for i, value in zip(batch, batch_scores):
+                scores[i] = float(value)
+                if self._cache is not None:
+                    self._cache.put(keys[i], scores[i])
+
+        metrics.increment("rerank.pairs", len(texts))
+        metrics.increment("rerank.scored_pairs", len(missing))
+        return scores
+
+    def rerank(self,
+               query: str,
+               documents: List[Document],
+               k: int,
+               budget_seconds: Optional[float] = None,
+               query_vector: Optional[np.ndarray] = None,
+               vectors: Optional[np.ndarray] = None) -> Optional[List[Tuple[Document, float]]]:
+        """
+            The k most relevant documents with their scores, best first. None when the
+            budget ran out, callers then keep the order they retrieved the documents in.
+
+            query_vector: Embedding of query, if the caller has it
+            vectors: Stored embedding of each document, rerankers that score
+                     embeddings use them instead of embedding the texts
+        """
+        started = time.perf_counter()
+        deadline = started + budget_seconds if budget_seconds is not None else None
+        scores = self._score_candidates(query, documents, deadline, query_vector, vectors)
+        elapsed = time.perf_counter() - started
+        metrics.observe("rerank.seconds", elapsed, reranker=self.name)
+
+        # A last batch may start just before the deadline and finish after it
+        if scores is None or (budget_seconds is not None and elapsed > budget_seconds):
+            self.budget_exceeded += 1
+            metrics.increment("rerank.budget_exceeded", reranker=self.name)
+            logger.warning(f"Reranking {len(documents)} documents took over the {budget_seconds * 1000:.0f}ms "
+                           f"budget, keeping vector order")
+            return None
+
+        order = np.argsort(-np.asarray(scores, dtype=np.float64), kind="stable")[:k]
+        return [(documents[i], scores[i]) for i in order]
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "reranker": self.name,
+            "budget_exceeded": self.budget_exceeded,
+            "score_cache": self._cache.stats() if self._cache is not None else None
+        }
+
+    @abstractmethod
+    def _score_pairs(self, query: str, texts: List[str]) -> List[float]:
+        """
+            Scores of one batch of (query, text) pairs, in the order of texts.
+        """
+
+    def _score_candidates(self,
+                          query: str,
+                          documents: List[Document],
+                          deadline: Optional[float],
+                          query_vector: Optional[np.ndarray],
+                          vectors: Optional[np.ndarray]) -> Optional[List[float]]:
+        return self.score(query, [doc.page_content for doc in documents], deadline)
+
+    def _cache_key(self, query: str, text: str) -> bytes:
+        # Digests keep the cache from holding on to every chunk text
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (self.name, query, text):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.digest()
+
+
+class CosineReranker(Reranker):
+    name = "cosine"
+
+    def __init__(self, embeddings: Embeddings, **kwargs):
+        """
+            Exact cosine similarity between the query embedding and the full-precision
+            chunk embeddings. Needs no extra model; it corrects the approximations of
+            IVF, PQ, HNSW and compact storage, and gives fused hybrid results a real
+            similarity order. Chunk embeddings are the vectors stored with the index
+            when the caller passes them; otherwise they are embedded again, from the
+            embedding cache when the embeddings are wrapped in CachedEmbeddings.
+
+            embeddings: Embedding model of the searched database
+        """
+        super().__init__(**kwargs)
+        self.embeddings = embeddings
+
+    def _score_pairs(self, query: str, texts: List[str]) -> List[float]:
+        query_vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        text_vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+        return _cosine(query_vector, text_vectors).tolist()
+
+    def _score_candidates(self,
+                          query: str,
+                          documents: List[Document],
+                          deadline: Optional[float],
+                          query_vector: Optional[np.ndarray],
+                          vectors: Optional[np.ndarray]) -> Optional[List[float]]:
+        if query_vector is None or vectors is None:
+            return super()._score_candidates(query, documents, deadline, query_vector, vectors)
+        # Stored vectors are already at hand, scoring them is cheaper than a cache lookup
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with metrics.span("rerank.score", reranker=self.name):
+            scores = _cosine(query_vector[:vectors.shape[1]], vectors).tolist()
+        metrics.increment("rerank.pairs", len(documents))
+        metrics.increment("rerank.stored_vector_pairs", len(documents))
+        return scores
+
+
+class CrossEncoderReranker(Reranker):
+    name = "cross-encoder"
+
+    def __init__(self,
+                 model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+                 device: str = "cpu",
+                 max_length: int = 512,
+                 **kwargs):
+        """
+            Local cross-encoder reading query and chunk together, the most accurate
+            option. Requires the optional sentence-transformers package.
+
+            model_name: Hugging Face cross-encoder model
+            device: Torch device the model runs on
+            max_length: Tokens of query and chunk the model reads
+        """
+        super().__init__(**kwargs)
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise ImportError("CrossEncoderReranker requires sentence-transformers: "
+                              "pip install sentence-transformers") from e
+        self.name = f"cross-encoder:{model_name}"
+        self.model = CrossEncoder(model_name, device=device, max_length=max_length)
+        logger.info(f"Cross-encoder loaded: {model_name} on {device}")
+
+    def _score_pairs(self, query: str, texts: List[str]) -> List[float]:
+        return self.model.predict([(query, text) for text in texts],
+                                  batch_size=self.batch_size,
+                                  show_progress_bar=False).tolist()
+
+
+def _cosine(query_vector: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query_vector)
+    norms[norms == 0] = 1.0
+    return vectors @ query_vector / norms
+
+
+def create_reranker(kind: Optional[str],
+                    embeddings: Optional[Embeddings] = None,
+                    model_name: Optional[str] = None,
+                    **kwargs) -> Optional[Reranker]:
+    """
+        kind: "cosine", "cross-encoder", or None/"" for no reranking
+        embeddings: Embedding model for the cosine reranker
+        model_name: Model of the cross-encoder, its default when None
+    """
+    if not kind:
+        return None
+    if kind == "cosine":
+        if embeddings is None:
+            raise ValueError("The cosine reranker needs embeddings")
+        return CosineReranker(embeddings, **kwargs)
+    if kind == "cross-encoder":
+        if model_name:
+            kwargs["model_name"] = model_name
+        return CrossEncoderReranker(**kwargs)
+    raise ValueError(f"Unknown reranker: {kind}")
@@ -0,0 +1,184 @@
+import time
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Hashable, List, Optional
+import numpy as np
+import faiss
+from langchain_core.embeddings import Embeddings
+from src.utils import setup_logger
+from src.utils.metrics import metrics
+
+logger = setup_logger(__name__)
+
+
+class _Partition:
+    def __init__(self, dimension: int, version: Hashable):
+        # Answers of one database version; inner product on normalized vectors is cosine
+        self.version = version
+        self.index = faiss.IndexIDMap(faiss.IndexFlatIP(dimension))
+        self.entries: "OrderedDict[int, tuple]" = OrderedDict()
+
+
+class SemanticCache:
+    def __init__(self,
+                 embeddings: Optional[Embeddings] = None,
+                 threshold: float = 0.95,
+                 max_entries: int = 256,
+                 ttl: Optional[float] = None,
+                 max_databases: int = 32):
+        """
+            Answers of past questions, returned for new questions whose embedding is
+            close enough. Each database gets a small FAISS index of question embeddings;
+            its answers are dropped as soon as the database version changes.
+
+            embeddings: Embeds questions when lookup/store are not given an embedding
+            threshold: Minimum cosine similarity between questions for a hit
+            max_entries: Answers kept per database before the least recently used one is evicted
+            ttl: Seconds an answer stays valid, None keeps answers until evicted
+            max_databases: Databases with cached answers, the least recently used one is dropped
+        """
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_databases = max_databases
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._partitions: "OrderedDict[Hashable, _Partition]" = OrderedDict()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def lookup(self,
+               database: Hashable,
+               version: Hashable,
+               question: str,
+               embedding: Optional[List[float]] = None) -> Optional[str]:
+        """
+            database: Identity of the searched database (e.g. its temporary id), None without one
+            version: Current version of the database, e.g. FaissService.database_version
+            embedding: Embedding of question, computed with embeddings when None
+        """
+        vector = self._vector(question, embedding)
+        with self._lock:
+            partition = self._partition(database, version, vector.shape[1], create=False)
+            if partition is not None and partition.index.ntotal:
+                # A few neighbours, in case the closest ones have expired
+                scores, entry_ids = partition.index.search(vector, min(4, partition.index.ntotal))
+                now = time.monotonic()
+                for score, entry_id in zip(scores[0], entry_ids[0]):
+                    if entry_id == -1 or score < self.threshold:
+                        break
+                    cached_question, answer, expires_at = partition.entries[entry_id]
+                    if expires_at is not None and expires_at <= now:
+                        self._remove(partition, entry_id)
+                        self.expirations += 1
+                        continue
+                    partition.entries.move_to_end(entry_id)
+                    self.hits += 1
+                    metrics.increment("semantic_cache.hits")
+                    logger.info(f"Semantic cache hit ({score:.3f}): '{question[:60]}' ~ '{cached_question[:60]}'")
+                    return answer
+
+            self.misses += 1
+            metrics.increment("semantic_cache.misses")
+            return None
+
+    def store(self,
+              database: Hashable,
+              version: Hashable,
+              question: str,
+              answer: str,
+              embedding: Optional[List[float]] = None) -> None:
+        if not answer:
+            return
+        vector = self._vector(question, embedding)
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            partition = self._partition(database, version, vector.shape[1], create=True)
+
+            # An equivalent question already cached is replaced instead of duplicated
+            if partition.index.ntotal:
+                scores, entry_ids = partition.index.search(vector, 1)
+                if entry_ids[0][0] != -1 and scores[0][0] >= self.threshold:
+                    self._remove(partition, entry_ids[0][0])
+
+            entry_id = next(self._ids)
+            partition.index.add_with_ids(vector, np.array([entry_id], dtype=np.int64))
+            partition.entries[entry_id] = (question, answer, expires_at)
+            while len(partition.entries) > self.max_entries:
+                self._remove(partition, next(iter(partition.entries)))
+                self.evictions += 1
+                metrics.increment("semantic_cache.evictions")
+
+    def invalidate(self, database: Optional[Hashable] = None) -> int:
+        """
+            Drops the answers of database, or of every database when None. Returns the
+            number of answers removed.
+        """
+        with self._lock:
+            if database is None:
+                partitions = list(self._partitions.values())
+                self._partitions.clear()
+            else:
+                partition = self._partitions.pop(database, None)
+                partitions = [partition] if partition is not None else []
+            removed = sum(len(partition.entries) for partition in partitions)
+            self.invalidations += removed
+            return removed
+
+    def __len__(self) -> int:
+        return sum(len(partition.entries) for partition in self._partitions.values())
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self),
+            "databases": len(self._partitions),
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "threshold": self.threshold
+        }
+
+    def _vector(self, question: str, embedding: Optional[List[float]]) -> np.ndarray:
+        if embedding is None:
+            if self.embeddings is None:
+                raise ValueError("An embedding is required when the cache has no embeddings")
+            embedding = self.embeddings.embed_query(question)
+        vector = np.array([embedding], dtype=np.float32)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _partition(self,
+                   database: Hashable,
+                   version: Hashable,
+                   dimension: int,
+                   create: bool) -> Optional[_Partition]:
+        partition = self._partitions.get(database)
+        if partition is not None and (partition.version != version or partition.index.d != dimension):
+            # The database changed since these answers were produced
+            logger.info(f"Semantic cache invalidated for {database}: {len(partition.entries)} answers dropped")
+            self.invalidations += len(partition.entries)
+            del self._partitions[database]
+            partition = None
+
+        if partition is None:
+            if not create:
+                return None
+            partition = self._partitions[database] = _Partition(dimension, version)
+            while len(self._partitions) > self.max_databases:
+                self._partitions.popitem(last=False)
+        self._partitions.move_to_end(database)
+        return partition
+
+    @staticmethod
+    def _remove(partition: _Partition, entry_id: int) -> None:
+        partition.index.remove_ids(np.array([entry_id], dtype=np.int64))
+        del partition.entries[entry_id]
@@ -0,0 +1,218 @@
+import heapq
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Union
+import numpy as np
+from langchain.docstore.document import Document
+from langchain_community.vectorstores import FAISS
+from src.utils import setup_logger
+from src.utils.metrics import metrics
+from src.services.faiss import FaissService
+
+logger = setup_logger(__name__)
+
+
+class ShardedSearch:
+    def __init__(self,
+                 faiss_service: FaissService,
+                 max_workers: Optional[int] = None):
+        """
+            Searches several databases as one, e.g. one saved index per department.
+            The query is embedded once, every shard is searched in its own thread
+            (FAISS releases the GIL while searching) and the per-shard top-k lists
+            are merged by score. Shards are added and removed independently, nothing
+            is rebuilt. Only the public FaissService search API is used.
+
+            faiss_service: Service that loads the shards and embeds the queries; every
+                           shard must use its embedding model
+            max_workers: Threads searching shards at the same time, one per shard by default
+        """
+        self.faiss_service = faiss_service
+        self.max_workers = max_workers
+        # name -> loaded database or temporary database id
+        self._shards: Dict[str, Union[FAISS, str]] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_size = 0
+
+    @property
+    def shards(self) -> List[str]:
+        with self._lock:
+            return list(self._shards)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._shards
+
+    def __len__(self) -> int:
+        return len(self._shards)
+
+    def add_shard(self, name: str, vdb_or_id: Union[FAISS, str]) -> None:
+        """
+            Adds a loaded database or a temporary database id, replacing any shard with
+            the same name.
+        """
+        try:
+            vdb = self.faiss_service.get_database(vdb_or_id)
+            with self._lock:
+                # Scores are only comparable between shards of the same embedding space
+                other_name = next((other for other in self._shards if other != name), None)
+                if other_name is not None:
+                    other = self.faiss_service.get_database(self._shards[other_name])
+                    if (other.index.d, other.distance_strategy) != (vdb.index.d, vdb.distance_strategy):
+                        raise ValueError(f"Shard {name} ({vdb.index.d} dimensions, {vdb.distance_strategy}) does not "
+                                         f"match shard {other_name} ({other.index.d} dimensions, "
+                                         f"{other.distance_strategy})")
+                self._shards[name] = vdb_or_id
+            logger.info(f"Shard added: {name} ({vdb.index.ntotal} vectors), {len(self._shards)} shards")
+        except Exception as e:
+            logger.error(f"Error adding shard {name}: {str(e)}")
+            raise
+
+    def load_shard(self, name: str, index_path: str, mmap: bool = False) -> FAISS:
+        vdb = self.faiss_service.load_local_database(index_path, mmap=mmap)
+        self.add_shard(name, vdb)
+        return vdb
+
+    def remove_shard(self, name: str) -> None:
+        with self._lock:
+            if name not in self._shards:
+                raise ValueError(f"Shard not found: {name}")
+            del self._shards[name]
+        logger.info(f"Shard removed: {name}, {len(self._shards)} shards")
+
+    @metrics.timed("sharding.similarity_search")
+    def similarity_search(self,
+                          query: str,
+                          k: int = 5,
+                          return_scores: bool = False,
+                          hybrid: Optional[bool] = None,
+                          filter: Optional[Dict[str, Any]] = None,
+                          shards: Optional[List[str]] = None) -> Union[List[Document], List[Tuple[Document, float]]]:
+        """
+            Same as FaissService.similarity_search over every shard (or the named
+            ones). Each result carries its shard name in metadata["shard"].
+        """
+        return self.similarity_search_batch([query], k, return_scores, hybrid=hybrid,
+                                            filter=filter, shards=shards)[0]
+
+    @metrics.timed("sharding.similarity_search_batch")
+    def similarity_search_batch(self,
+                                queries: List[str],
+                                k: int = 5,
+                                return_scores: bool = False,
+                                batch_size: int = 256,
+                                hybrid: Optional[bool] = None,
+                                filter: Optional[Dict[str, Any]] = None,
+                                shards: Optional[List[str]] = None) -> list:
+        """
+            Vector results are merged by L2 distance, which is comparable across shards
+            built with the same embedding model. For hybrid search the vector and BM25
+            candidates of all shards are merged into one ranking each and fused once,
+            like in a single database. The BM25 scores use the term statistics of their
+            own shard, so the cross-shard keyword order is approximate.
+        """
+        try:
+            hybrid = self.faiss_service.hybrid_search if hybrid is None else hybrid
+            with self._lock:
+                selected = dict(self._shards)
+            if shards is not None:
+                missing = [name for name in shards if name not in selected]
+                if missing:
+                    raise ValueError(f"Shards not found: {missing}")
+                selected = {name: selected[name] for name in shards}
+            if not queries or not selected:
+                return [[] for _ in queries]
+
+            vectors = self.faiss_service.embed_queries(queries, batch_size)
+            futures = {
+                name: self._pool(len(selected)).submit(self._search_shard, name, vdb_or_id, queries,
+                                                       vectors, k, hybrid, filter)
+                for name, vdb_or_id in selected.items()
+            }
+            per_shard = {name: future.result() for name, future in futures.items()}
+
+            results = []
+            for i in range(len(queries)):
+                if hybrid:
+                    best = self._fuse_shards([(name, rows[0][i], rows[1][i]) for name, rows in per_shard.items()], k)
+                else:
+                    candidates = [(name, doc, score) for name, rows in per_shard.items() for doc, score in rows[i]]
+                    best = heapq.nsmallest(k, candidates, key=lambda item: item[2])
+                row = []
+                for name, doc, score in best:
+                    # Copies, the documents in the docstores stay untouched
+                    doc = Document(id=doc.id, page_content=doc.page_content, metadata={**doc.metadata, "shard": name})
+                    row.append((doc, score) if return_scores else doc)
+                results.append(row)
+
+            logger.info(f"Sharded search completed: {len(queries)} queries over {len(selected)} shards")
+            return results
+
+        except Exception as e:
+            logger.error(f"Error in sharded similarity search: {str(e)}")
+            raise
+
+    def get_shards_info(self) -> Dict[str, dict]:
+        with self._lock:
+            selected = dict(self._shards)
+        return {name: self.faiss_service.get_database_info(vdb_or_id) for name, vdb_or_id in selected.items()}
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _search_shard(self,
+                      name: str,
+                      vdb_or_id: Union[FAISS, str],
+                      queries: List[str],
+                      vectors: np.ndarray,
+                      k: int,
+                      hybrid: bool,
+                      filter: Optional[Dict[str, Any]]):
+        # Temporary database ids are resolved by the service per search, they may have been spilled
+        started = time.perf_counter()
+        if hybrid:
+            # Both rankings separately, fused across shards by _fuse_shards
+            depth = self.faiss_service.fusion_depth(k)
+            vector_rows = self.faiss_service.search_by_vectors(vdb_or_id, queries, vectors, depth,
+                                                               hybrid=False, filter=filter)
+            keyword_rows = [self.faiss_service.keyword_search(vdb_or_id, query, depth, filter) for query in queries]
+            rows = (vector_rows, keyword_rows)
+        else:
+            rows = self.faiss_service.search_by_vectors(vdb_or_id, queries, vectors, k, hybrid=False, filter=filter)
+        metrics.observe("sharding.shard_search.seconds", time.perf_counter() - started, shard=name)
+        return rows
+
+    def _fuse_shards(self,
+                     shard_rows: List[Tuple[str, List[Tuple[Document, float]], List[Tuple[Document, float]]]],
+                     k: int) -> List[Tuple[str, Document, float]]:
+        # Reciprocal rank fusion over the merged vector (by distance) and keyword (by BM25) rankings
+        depth = self.faiss_service.fusion_depth(k)
+        vector = heapq.nsmallest(depth, ((name, doc, score) for name, rows, _ in shard_rows for doc, score in rows),
+                                 key=lambda item: item[2])
+        keyword = heapq.nlargest(depth, ((name, doc, score) for name, _, rows in shard_rows for doc, score in rows),
+                                 key=lambda item: item[2])
+        scores: Dict[Tuple[str, str], float] = {}
+        documents: Dict[Tuple[str, str], Tuple[str, Document]] = {}
+        for ranking in (vector, keyword):
+            for rank, (name, doc, _) in enumerate(ranking, start=1):
+                # The same database may be added under two names, its chunks stay apart
+                key = (name, doc.id)
+                scores[key] = scores.get(key, 0.0) + 1.0 / (self.faiss_service.rrf_k + rank)
+                documents[key] = (name, doc)
+        best = sorted(scores, key=scores.get, reverse=True)[:k]
+        return [(*documents[key], scores[key]) for key in best]
+
+    def _pool(self, n_shards: int) -> ThreadPoolExecutor:
+        # Grown when shards are added, so every shard of a query runs concurrently
+        size = self.max_workers or max(n_shards, 1)
+        with self._lock:
+            if self._executor is None or self._executor_size < size:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="shard-search")
+                self._executor_size = size
+            return self._executor
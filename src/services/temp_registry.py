@@ -0,0 +1,208 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterator, Optional
+from src.utils import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class _Entry:
+    __slots__ = ("vdb", "spill_path", "memory_bytes", "last_access", "spillable")
+
+    def __init__(self, vdb: Any, memory_bytes: int, spillable: bool = True):
+        self.vdb = vdb
+        self.spill_path: Optional[str] = None
+        self.memory_bytes = memory_bytes
+        self.last_access = time.monotonic()
+        self.spillable = spillable
+
+
+class TempDatabaseRegistry(MutableMapping):
+    def __init__(self,
+                 save_fn: Callable[[Any, str], None],
+                 load_fn: Callable[[str], Any],
+                 size_fn: Callable[[Any], int],
+                 memory_budget_bytes: Optional[int] = None,
+                 idle_ttl: Optional[float] = None,
+                 spill_dir: Optional[str] = None,
+                 sweep_interval: Optional[float] = None):
+        """
+            Dict-like store of temporary databases that keeps their total memory under
+            a budget. Databases idle for longer than idle_ttl, then the least recently
+            used ones, are saved under spill_dir and dropped from memory. They are loaded
+            back on the next access. The budget is enforced whenever a database is added
+            or accessed; idle databases are also spilled by a background sweep, so they
+            leave memory even when no other database is used.
+
+            save_fn: Writes a database to a folder
+            load_fn: Loads a database back from that folder
+            size_fn: Estimated memory of a database in bytes
+            memory_budget_bytes: Budget for the in-memory databases, None means unbounded
+            idle_ttl: Seconds without access before a database is spilled
+            spill_dir: Folder for spilled databases, a temporary folder by default
+            sweep_interval: Seconds between background sweeps, idle_ttl / 2 by default;
+                            0 only checks idle_ttl when the registry is used
+        """
+        self.save_fn = save_fn
+        self.load_fn = load_fn
+        self.size_fn = size_fn
+        self.memory_budget_bytes = memory_budget_bytes
+        self.idle_ttl = idle_ttl
+        self.spill_dir = spill_dir
+        self.spills = 0
+        self.reloads = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._closed = threading.Event()
+
+        if idle_ttl is not None:
+            interval = idle_ttl / 2 if sweep_interval is None else sweep_interval
+            if interval > 0:
+                threading.Thread(target=_sweep_periodically, args=(weakref.ref(self), self._closed, interval),
+                                 name="temp-registry-sweep", daemon=True).start()
+
+    def __getitem__(self, temp_id: str) -> Any:
+        with self._lock:
+            entry = self._entries[temp_id]
+            entry.last_access = time.monotonic()
+            self._entries.move_to_end(temp_id)
+
+            if entry.vdb is None:
+                logger.info(f"Reloading spilled temporary database: {temp_id}")
+                entry.vdb = self.load_fn(entry.spill_path)
+                entry.memory_bytes = self.size_fn(entry.vdb)
+                self.reloads += 1
+
+            self._enforce(keep=temp_id)
+            return entry.vdb
+
+    def __setitem__(self, temp_id: str, vdb: Any) -> None:
+        self.register(temp_id, vdb)
+
+    def register(self, temp_id: str, vdb: Any, spillable: bool = True) -> None:
+        """
+            spillable: False for databases already backed by files (memory-mapped), they
+                       are never spilled and do not count against the memory budget
+        """
+        with self._lock:
+            if temp_id in self._entries:
+                self._remove_spill(self._entries[temp_id])
+            self._entries[temp_id] = _Entry(vdb, self.size_fn(vdb) if spillable else 0, spillable)
+            self._entries.move_to_end(temp_id)
+            self._enforce(keep=temp_id)
+
+    def __delitem__(self, temp_id: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(temp_id)
+            self._remove_spill(entry)
+
+    def __contains__(self, temp_id: object) -> bool:
+        # Membership must not reload spilled databases
+        return temp_id in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def refresh_size(self, vdb: Any) -> None:
+        # Called after a registered database grew in place
+        with self._lock:
+            for temp_id, entry in self._entries.items():
+                if entry.vdb is vdb:
+                    if entry.spillable:
+                        entry.memory_bytes = self.size_fn(vdb)
+                    self._enforce(keep=temp_id)
+                    return
+
+    def sweep(self) -> None:
+        with self._lock:
+            self._enforce()
+
+    def close(self) -> None:
+        # Stops the background sweep; registered databases stay usable
+        self._closed.set()
+
+    def memory_usage(self) -> Dict[str, Any]:
+        with self._lock:
+            databases = {
+                temp_id: {
+                    "in_memory": entry.vdb is not None,
+                    "memory_bytes": entry.memory_bytes if entry.vdb is not None else 0,
+                    "idle_seconds": time.monotonic() - entry.last_access
+                }
+                for temp_id, entry in self._entries.items()
+            }
+        return {
+            "databases": databases,
+            "total_bytes": sum(db["memory_bytes"] for db in databases.values()),
+            "budget_bytes": self.memory_budget_bytes,
+            "spills": self.spills,
+            "reloads": self.reloads
+        }
+
+    def _enforce(self, keep: Optional[str] = None) -> None:
+        now = time.monotonic()
+
+        if self.idle_ttl is not None:
+            for temp_id, entry in list(self._entries.items()):
+                if (temp_id != keep and entry.spillable and entry.vdb is not None
+                        and now - entry.last_access > self.idle_ttl):
+                    self._spill(temp_id, entry)
+
+        if self.memory_budget_bytes is not None:
+            total = sum(entry.memory_bytes for entry in self._entries.values() if entry.vdb is not None)
+            # Entries are kept in access order, so the first ones are the least recently used
+            for temp_id, entry in list(self._entries.items()):
+                if total <= self.memory_budget_bytes:
+                    break
+                if temp_id != keep and entry.spillable and entry.vdb is not None:
+                    if self._spill(temp_id, entry):
+                        total -= entry.memory_bytes
+
+    def _spill(self, temp_id: str, entry: _Entry) -> bool:
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix="faiss_spill_")
+
+        # Rewritten on every spill since the database may have changed while loaded
+        entry.spill_path = os.path.join(self.spill_dir, temp_id)
+        try:
+            self.save_fn(entry.vdb, entry.spill_path)
+        except Exception as e:
+            # Kept in memory; the error must not surface from calls about other databases
+            logger.error(f"Error spilling temporary database {temp_id}, keeping it in memory: {str(e)}")
+            entry.spillable = False
+            self._remove_spill(entry)
+            entry.spill_path = None
+            return False
+        entry.vdb = None
+        self.spills += 1
+        logger.info(f"Spilled temporary database {temp_id} ({entry.memory_bytes} bytes) to {entry.spill_path}")
+        return True
+
+    @staticmethod
+    def _remove_spill(entry: _Entry) -> None:
+        if entry.spill_path and os.path.exists(entry.spill_path):
+            shutil.rmtree(entry.spill_path, ignore_errors=True)
+
+
+def _sweep_periodically(registry_ref: "weakref.ref[TempDatabaseRegistry]",
+                        closed: threading.Event,
+                        interval: float) -> None:
+    # Holds the registry weakly, so the thread ends once the registry is garbage collected
+    while not closed.wait(interval):
+        registry = registry_ref()
+        if registry is None:
+            return
+        try:
+            registry.sweep()
+        except Exception as e:
+            logger.error(f"Error sweeping idle temporary databases: {str(e)}")
+        del registry
@@ -0,0 +1,189 @@
+import os
+import struct
+import weakref
+import tempfile
+from typing import List, Optional, Tuple
+import numpy as np
+from src.utils import setup_logger
+
+logger = setup_logger(__name__)
+
+# FAISS factory of the flat index per storage mode, None keeps IndexFlatL2
+STORAGE_FACTORIES = {
+    "float32": None,
+    "float16": "SQfp16",
+    "int8": "SQ8",
+    # Sign bits against per-dimension thresholds learned from the data, Hamming search
+    "binary": "LSHt"
+}
+
+FULL_VECTORS_MAGIC = b"FPV1"
+# magic, dimension, rows, id width
+FULL_VECTORS_HEADER = struct.Struct("<4sqqq")
+COPY_BLOCK_ROWS = 8192
+
+
+def truncate_vectors(vectors: np.ndarray, dimension: int) -> np.ndarray:
+    """
+        Matryoshka-style truncation: keeps the first dimension components and
+        renormalizes, which is how text-embedding-3 vectors are meant to be shortened.
+    """
+    truncated = np.array(vectors[:, :dimension], dtype=np.float32)
+    norms = np.linalg.norm(truncated, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return truncated / norms
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class FullPrecisionVectors:
+    def __init__(self, dimension: Optional[int] = None):
+        """
+            Float32 copies of the vectors of a compact index, in FAISS position order.
+            Rows live in a file and are memory-mapped, so only the rows of a rescored
+            shortlist are read. Loaded files are never written to; the first change
+            copies them to a private temporary file.
+
+            dimension: Size of the full-precision vectors, taken from the first add when None
+        """
+        self.dimension = dimension
+        self.ids: List[str] = []
+        self._path: Optional[str] = None
+        self._offset = 0
+        self._rows: Optional[np.ndarray] = None
+        self._finalizer = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        if self._rows is None:
+            if not self.ids:
+                return np.empty((0, self.dimension or 0), dtype=np.float32)
+            self._rows = np.memmap(self._path, dtype=np.float32, mode="r",
+                                   offset=self._offset, shape=(len(self.ids), self.dimension))
+        return self._rows
+
+    @property
+    def bytes_per_vector(self) -> int:
+        return 4 * (self.dimension or 0)
+
+    def add(self, doc_ids: List[str], vectors: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dimension is None:
+            self.dimension = vectors.shape[1]
+        elif vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected {self.dimension} dimensions, got {vectors.shape[1]}")
+
+        self._make_private()
+        with open(self._path, "ab") as f:
+            f.write(vectors.tobytes())
+        self.ids.extend(doc_ids)
+        self._rows = None
+
+    def delete(self, doc_ids: List[str]) -> None:
+        # Same compaction as FAISS remove_ids, the remaining rows keep their order
+        removed = set(doc_ids)
+        keep = np.fromiter((doc_id not in removed for doc_id in self.ids), dtype=bool, count=len(self.ids))
+        if keep.all():
+            return
+
+        path = self._new_file()
+        source = self.vectors
+        with open(path, "wb") as f:
+            for start in range(0, len(keep), COPY_BLOCK_ROWS):
+                block = source[start:start + COPY_BLOCK_ROWS][keep[start:start + COPY_BLOCK_ROWS]]
+                f.write(np.ascontiguousarray(block).tobytes())
+        self.ids = [doc_id for doc_id, kept in zip(self.ids, keep) if kept]
+        self._switch(path, 0)
+
+    def rescore(self, queries: np.ndarray, positions: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+            Squared L2 distances between full-precision queries and the full-precision
+            rows of each shortlist, returned as the k best (distances, positions) per
+            query, shaped like a FAISS search.
+        """
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        result = np.full((len(queries), k), -1, dtype=np.int64)
+        valid = positions >= 0
+        if not valid.any():
+            return distances, result
+
+        # One sorted gather from the file for the whole batch
+        unique, inverse = np.unique(positions[valid], return_inverse=True)
+        rows = np.asarray(self.vectors[unique])
+        candidates = np.full(positions.shape, -1, dtype=np.int64)
+        candidates[valid] = inverse
+
+        for i, query in enumerate(np.asarray(queries, dtype=np.float32)):
+            row_candidates = candidates[i][candidates[i] >= 0]
+            difference = rows[row_candidates] - query
+            row_distances = np.einsum("ij,ij->i", difference, difference)
+            order = np.argsort(row_distances, kind="stable")[:k]
+            distances[i, :len(order)] = row_distances[order]
+            result[i, :len(order)] = unique[row_candidates[order]]
+        return distances, result
+
+    def save(self, path: str) -> None:
+        if self._path is not None and os.path.abspath(self._path) == os.path.abspath(path):
+            # Loaded from this file and not changed since
+            return
+
+        ids = np.array(self.ids, dtype="S")
+        id_width = ids.dtype.itemsize if len(ids) else 0
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(FULL_VECTORS_HEADER.pack(FULL_VECTORS_MAGIC, self.dimension or 0, len(ids), id_width))
+            f.write(ids.tobytes())
+            f.write(b"\0" * (-f.tell() % 64))
+            source = self.vectors
+            for start in range(0, len(ids), COPY_BLOCK_ROWS):
+                f.write(np.ascontiguousarray(source[start:start + COPY_BLOCK_ROWS]).tobytes())
+        os.replace(temp_path, path)
+        logger.debug(f"Saved {len(ids)} full-precision vectors to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> "FullPrecisionVectors":
+        with open(path, "rb") as f:
+            magic, dimension, n_rows, id_width = FULL_VECTORS_HEADER.unpack(f.read(FULL_VECTORS_HEADER.size))
+            if magic != FULL_VECTORS_MAGIC:
+                raise ValueError(f"Not a full-precision vector file: {path}")
+            ids = np.frombuffer(f.read(n_rows * id_width), dtype=f"S{max(id_width, 1)}") if n_rows else []
+
+        store = cls(dimension or None)
+        store.ids = [doc_id.decode("utf-8") for doc_id in ids]
+        offset = FULL_VECTORS_HEADER.size + n_rows * id_width
+        store._path = path
+        store._offset = offset + (-offset % 64)
+        return store
+
+    def _new_file(self) -> str:
+        fd, path = tempfile.mkstemp(suffix=".f32")
+        os.close(fd)
+        return path
+
+    def _switch(self, path: str, offset: int) -> None:
+        self._rows = None
+        if self._finalizer is not None:
+            # Drops the previous private file
+            self._finalizer()
+        self._path = path
+        self._offset = offset
+        self._finalizer = weakref.finalize(self, _remove_file, path)
+
+    def _make_private(self) -> None:
+        if self._finalizer is not None and self._finalizer.alive:
+            return
+        path = self._new_file()
+        if self.ids:
+            source = self.vectors
+            with open(path, "wb") as f:
+                for start in range(0, len(self.ids), COPY_BLOCK_ROWS):
+                    f.write(np.ascontiguousarray(source[start:start + COPY_BLOCK_ROWS]).tobytes())
+        self._switch(path, 0)
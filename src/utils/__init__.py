@@ -1,3 +1,28 @@
-from .settings import Settings
+import importlib
+from typing import TYPE_CHECKING
 from .logging import setup_logger
-from .chat_template import ChatTemplate
\ No newline at end of file
+
+if TYPE_CHECKING:
+    from .settings import Settings
+    from .chat_template import ChatTemplate
+
+# Loaded on first access (PEP 562): workers that only need setup_logger
+# do not pay for pydantic-settings or streamlit
+_LAZY_ATTRIBUTES = {
+    "Settings": ".settings",
+    "ChatTemplate": ".chat_template"
+}
+
+__all__ = ["Settings", "setup_logger", "ChatTemplate"]
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
@@ -1,5 +1,14 @@
+import time
+import asyncio
+import itertools
 import streamlit as st
-from typing import Optional, Callable, Dict, Any, List
+from typing import Optional, Callable, Dict, Any, List, Iterator, AsyncIterator, Union
+from src.utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+# process_message may return the whole answer or stream it chunk by chunk
+MessageResponse = Union[str, Iterator[Any], AsyncIterator[Any]]
 
 
 class ChatTemplate:
@@ -9,7 +18,7 @@ class ChatTemplate:
         placeholder: str = "Digite sua mensagem...",
         assistant_name: str = "assistant",
         user_name: str = "user",
-        process_message: Optional[Callable[[List[Dict[str, str]], str], str]] = None,
+        process_message: Optional[Callable[[List[Dict[str, str]], str], MessageResponse]] = None,
         chat_height: int = 400
     ):
         self.session_key = session_key
@@ -25,7 +34,7 @@ class ChatTemplate:
     def _default_echo(self, history: List[Dict[str, str]], message: str) -> str:
         return f"Echo: {message}"
     
-    def set_process_message(self, process_function: Callable[[List[Dict[str, str]], str], str]) -> None:
+    def set_process_message(self, process_function: Callable[[List[Dict[str, str]], str], MessageResponse]) -> None:
         self.process_message = process_function
     
     def add_message(self, role: str, content: str) -> None:
@@ -61,15 +70,59 @@ class ChatTemplate:
             self.add_message(self.user_name, prompt)
             current_history = st.session_state[self.session_key].copy()
             
-            with st.spinner("Thinking..."):
-                try:
-                    response = self.process_message(current_history, prompt)
-                except Exception as e:
-                    response = f"Error: {str(e)}"
+            # Show the exchange right away so the answer can be rendered as it arrives
+            with chat_container:
+                self.render_message({"role": self.user_name, "content": prompt})
+                with st.chat_message(self.assistant_name):
+                    response = self._respond(current_history, prompt)
             
             self.add_message(self.assistant_name, response)
             st.rerun()
             
             return response
         
-        return None
\ No newline at end of file
+        return None
+    
+    def _respond(self, history: List[Dict[str, str]], prompt: str) -> str:
+        start = time.perf_counter()
+        try:
+            with st.spinner("Thinking..."):
+                result = self.process_message(history, prompt)
+                if isinstance(result, str):
+                    logger.info(f"Response in {time.perf_counter() - start:.2f}s")
+                    st.markdown(result)
+                    return result
+                
+                chunks = self._iterate(result)
+                # The spinner stays up until the first token arrives
+                first = next(chunks, "")
+                logger.info(f"Time to first token: {time.perf_counter() - start:.2f}s")
+            
+            response = st.write_stream(itertools.chain([first], chunks))
+            if not isinstance(response, str):
+                response = "".join(str(part) for part in response)
+            logger.info(f"Streamed response in {time.perf_counter() - start:.2f}s")
+            return response
+        except Exception as e:
+            logger.error(f"Error processing message: {str(e)}")
+            response = f"Error: {str(e)}"
+            st.markdown(response)
+            return response
+    
+    @staticmethod
+    def _iterate(result: Union[Iterator[Any], AsyncIterator[Any]]) -> Iterator[str]:
+        # LangChain message chunks carry their text in .content
+        if hasattr(result, "__anext__"):
+            loop = asyncio.new_event_loop()
+            try:
+                while True:
+                    try:
+                        chunk = loop.run_until_complete(result.__anext__())
+                    except StopAsyncIteration:
+                        return
+                    yield getattr(chunk, "content", chunk)
+            finally:
+                loop.close()
+        
+        for chunk in result:
+            yield getattr(chunk, "content", chunk)
\ No newline at end of file
@@ -0,0 +1,141 @@
+from typing import Callable, Dict, List, Optional, Tuple
+from langchain.docstore.document import Document
+from src.utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def load_token_counter(encoding_name: str = "cl100k_base") -> Callable[[str], int]:
+    # tiktoken may be missing or unable to download its encoding, a rough
+    # 4 characters per token estimate is used then
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding(encoding_name)
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception as e:
+        logger.warning(f"tiktoken unavailable ({str(e)[:100]}), estimating 4 characters per token")
+        return lambda text: len(text) // 4 + 1
+
+
+class ContextBuilder:
+    def __init__(self,
+                 max_tokens: int = 3000,
+                 context_share: float = 0.7,
+                 token_counter: Optional[Callable[[str], int]] = None,
+                 min_overlap: int = 20):
+        """
+            Builds the LLM prompt from retrieved chunks and chat history under a token budget.
+
+            max_tokens: Budget for context, history and prompt together
+            context_share: Part of the budget left after the prompt that retrieved text may use,
+                           history gets the rest plus whatever the context does not use
+            token_counter: Counts the tokens of a text, tiktoken's cl100k_base by default
+            min_overlap: Shortest shared text between adjacent chunks that is treated as overlap
+        """
+        self.max_tokens = max_tokens
+        self.context_share = context_share
+        self.count_tokens = token_counter or load_token_counter()
+        self.min_overlap = min_overlap
+
+    def merge_chunks(self, chunks: List[Document]) -> List[str]:
+        """
+            Groups chunks by document, joins consecutive chunk_ids without the text they
+            share and drops exact duplicates. Passages keep the rank of their best chunk.
+        """
+        groups: Dict[Tuple, List[Tuple[int, Document]]] = {}
+        for rank, chunk in enumerate(chunks):
+            key = (chunk.metadata.get("source"), chunk.metadata.get("doc_id"))
+            groups.setdefault(key, []).append((rank, chunk))
+
+        passages: List[Tuple[int, str]] = []
+        for group in groups.values():
+            group.sort(key=lambda item: item[1].metadata.get("chunk_id", 0))
+            best_rank, text, last_chunk_id = None, None, None
+            for rank, chunk in group:
+                chunk_id = chunk.metadata.get("chunk_id")
+                if text is not None and chunk_id is not None and last_chunk_id is not None \
+                        and chunk_id - last_chunk_id <= 1:
+                    text = self._join_overlapping(text, chunk.page_content)
+                    best_rank = min(best_rank, rank)
+                else:
+                    if text is not None:
+                        passages.append((best_rank, text))
+                    best_rank, text = rank, chunk.page_content
+                last_chunk_id = chunk_id
+            passages.append((best_rank, text))
+
+        passages.sort(key=lambda item: item[0])
+        unique, seen = [], set()
+        for _, text in passages:
+            if text not in seen:
+                seen.add(text)
+                unique.append(text)
+        return unique
+
+    def build(self,
+              chunks: List[Document],
+              history: List[Dict[str, str]],
+              prompt: str) -> str:
+        prompt_text = f"User: {prompt}\nAssistant:"
+        remaining = self.max_tokens - self.count_tokens(prompt_text)
+
+        # ChatTemplate passes the history with the current prompt already appended
+        if history and history[-1].get("role") == "user" and history[-1].get("content") == prompt:
+            history = history[:-1]
+
+        # Retrieved text first, best passages first, truncating the last one that fits partially
+        header = "Relevant documents:\n"
+        context_budget = int(remaining * self.context_share) - self.count_tokens(header)
+        passages, used = [], 0
+        for passage in self.merge_chunks(chunks):
+            tokens = self.count_tokens(passage)
+            if used + tokens > context_budget:
+                passage = self._truncate(passage, context_budget - used)
+                if passage:
+                    passages.append(passage)
+                    used += self.count_tokens(passage)
+                break
+            passages.append(passage)
+            used += tokens
+
+        context = ""
+        if passages:
+            retrieved = "\n\n".join(passages)
+            context = f"{header}{retrieved}\n\n"
+            remaining -= self.count_tokens(context)
+
+        # Most recent turns first, until the budget is spent
+        lines = []
+        for message in reversed(history):
+            role = "User" if message["role"] == "user" else "Assistant"
+            line = f"{role}: {message['content']}\n"
+            tokens = self.count_tokens(line)
+            if tokens > remaining:
+                break
+            lines.append(line)
+            remaining -= tokens
+
+        logger.debug(f"Context built: {len(passages)} passages from {len(chunks)} chunks, "
+                     f"{len(lines)}/{len(history)} history messages, {self.max_tokens - remaining} tokens")
+        return context + "".join(reversed(lines)) + prompt_text
+
+    def _join_overlapping(self, first: str, second: str) -> str:
+        # The splitter repeats up to chunk_overlap characters at the start of the next
+        # chunk; find the longest suffix of first that starts second
+        probe = second[:self.min_overlap]
+        if len(probe) == self.min_overlap:
+            start = first.find(probe)
+            while start != -1:
+                if second.startswith(first[start:]):
+                    return first + second[len(first) - start:]
+                start = first.find(probe, start + 1)
+        return f"{first}\n{second}"
+
+    def _truncate(self, text: str, tokens: int) -> str:
+        if tokens <= 0:
+            return ""
+        # Cut proportionally, then trim until it fits
+        text = text[:max(1, len(text) * tokens // max(self.count_tokens(text), 1))]
+        while text and self.count_tokens(text) > tokens:
+            text = text[:int(len(text) * 0.9)]
+        return text.rstrip()
@@ -1,15 +1,41 @@
 import os
-from typing import Dict, Union
+import time
+import multiprocessing
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import fitz
 from src.utils import setup_logger
+from src.utils.metrics import metrics
 
 logger = setup_logger(__name__)
 
 
+def _extract_page_range(pdf_path: str, start: int, end: int) -> Tuple[List[str], float]:
+    # Module level so it can be pickled into the worker processes
+    started = time.perf_counter()
+    doc = fitz.open(pdf_path)
+    try:
+        texts = []
+        for page_num in range(start, min(end, doc.page_count)):
+            text = doc[page_num].get_text()
+            if text.strip():
+                texts.append(text)
+    finally:
+        doc.close()
+    return texts, time.perf_counter() - started
+
+
 class DocumentExtractor:
-    def __init__(self):
-        pass
+    def __init__(self,
+                 max_workers: Optional[int] = 1,
+                 pages_per_task: int = 100):
+        """
+            max_workers: Worker processes used for extraction, None uses every core and 1 disables the pool
+            pages_per_task: Large PDFs are split into page ranges of this size across the workers
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
 
     def extract_documents(self, path: Union[str, Path]) -> Dict[str, Dict[str, str]]:
         path = Path(path)
@@ -18,7 +44,12 @@ class DocumentExtractor:
         if path.is_file():
             if path.suffix.lower() == ".pdf":
                 logger.info(f"Processing file: {path}")
-                text = self._extract_pdf_text(path)
+                if self.max_workers > 1:
+                    text = self._extract_parallel([path]).get(path)
+                    if isinstance(text, Exception):
+                        raise text
+                else:
+                    text = self._extract_pdf_text(path)
                 if text:
                     extracted_docs["01"] = {
                         "document": path.stem,
@@ -41,10 +72,19 @@ class DocumentExtractor:
 
             logger.info(f"Found {len(pdf_files)} PDF files")
 
+            parallel_texts = None
+            if self.max_workers > 1:
+                parallel_texts = self._extract_parallel(sorted(pdf_files))
+
             for i, pdf_file in enumerate(sorted(pdf_files), 1):
                 try:
-                    logger.debug(f"Extracting text ({i}/{len(pdf_files)}): {pdf_file.name}")
-                    text = self._extract_pdf_text(pdf_file)
+                    if parallel_texts is not None:
+                        text = parallel_texts[pdf_file]
+                        if isinstance(text, Exception):
+                            raise text
+                    else:
+                        logger.debug(f"Extracting text ({i}/{len(pdf_files)}): {pdf_file.name}")
+                        text = self._extract_pdf_text(pdf_file)
 
                     if text:
                         doc_id = f"{i:02d}"
@@ -66,24 +106,122 @@ class DocumentExtractor:
         logger.info(f"Extraction completed: {len(extracted_docs)} documents processed")
         return extracted_docs
 
-    def _extract_pdf_text(self, pdf_path: Path) -> str:
-        try:
-            doc = fitz.open(pdf_path)
-            all_text = []
+    def iter_pages(self, path: Union[str, Path]) -> Iterator[Dict[str, Any]]:
+        """
+            Lazily yields the non-empty pages of a PDF or of every PDF in a directory,
+            one dict per page, so only the current page is kept in memory.
+        """
+        path = Path(path)
 
-            logger.debug(f"Extracting {doc.page_count} pages from {pdf_path.name}")
+        if path.is_file():
+            if path.suffix.lower() != ".pdf":
+                logger.error(f"File is not a PDF: {path}")
+                raise ValueError(f"File must be a PDF, got: {path.suffix}")
+            pdf_files = [path]
+        elif path.is_dir():
+            pdf_files = sorted(path.glob("*.pdf"))
+            if not pdf_files:
+                logger.warning(f"No PDF files found in: {path}")
+        else:
+            logger.error(f"Path does not exist: {path}")
+            raise FileNotFoundError(f"Path does not exist: {path}")
 
-            for page_num in range(doc.page_count):
-                page = doc[page_num]
-                text = page.get_text()
-                if text.strip():
-                    all_text.append(text)
+        for i, pdf_file in enumerate(pdf_files, 1):
+            try:
+                with fitz.open(pdf_file) as doc:
+                    logger.debug(f"Streaming {doc.page_count} pages from {pdf_file.name} ({i}/{len(pdf_files)})")
+                    for page_num in range(doc.page_count):
+                        started = time.perf_counter()
+                        text = doc[page_num].get_text()
+                        # Pages are yielded to the indexer, so only the extraction itself is timed
+                        metrics.observe("extract.page.seconds", time.perf_counter() - started)
+                        if not text.strip():
+                            continue
+                        yield {
+                            "document": pdf_file.stem,
+                            "document_index": i,
+                            "document_total": len(pdf_files),
+                            "page": page_num,
+                            "page_count": doc.page_count,
+                            "text": text
+                        }
+            except Exception as e:
+                logger.error(f"Error processing {pdf_file.name}: {str(e)}")
+                continue
+
+    @metrics.timed("extract.parallel")
+    def _extract_parallel(self, pdf_files: List[Path]) -> Dict[Path, Union[str, Exception]]:
+        """
+            Extracts the files in a process pool. Each file maps to its text, or to the
+            exception raised while reading it, so one broken PDF does not stop the others.
+        """
+        results: Dict[Path, Union[str, Exception]] = {}
+        page_texts: Dict[Path, Dict[int, List[str]]] = {}
+        cpu_times: Dict[Path, float] = {}
+        tasks = []
+
+        # Split every file into page ranges so very large PDFs use several workers
+        for pdf_file in pdf_files:
+            try:
+                with fitz.open(pdf_file) as doc:
+                    page_count = doc.page_count
+            except Exception as e:
+                results[pdf_file] = e
+                continue
+
+            page_texts[pdf_file] = {}
+            cpu_times[pdf_file] = 0.0
+            for start in range(0, page_count, self.pages_per_task):
+                tasks.append((pdf_file, start, start + self.pages_per_task))
+
+        logger.info(f"Extracting {len(page_texts)} files in {len(tasks)} tasks with {self.max_workers} workers")
+        started = time.perf_counter()
+
+        # Spawned, not forked: extraction runs in worker threads of multithreaded processes
+        # (the Streamlit app, the inline ingestion worker), where a fork can copy held locks
+        with ProcessPoolExecutor(max_workers=min(self.max_workers, max(len(tasks), 1)),
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = {
+                executor.submit(_extract_page_range, str(pdf_file), start, end): (pdf_file, start)
+                for pdf_file, start, end in tasks
+            }
+            for future in as_completed(futures):
+                pdf_file, start = futures[future]
+                if pdf_file in results:
+                    continue
+                try:
+                    texts, elapsed = future.result()
+                    page_texts[pdf_file][start] = texts
+                    cpu_times[pdf_file] += elapsed
+                except Exception as e:
+                    results[pdf_file] = e
+
+        # Reassemble the page ranges in order, keeping the sequential output format
+        for pdf_file, ranges in page_texts.items():
+            if pdf_file in results:
+                continue
+            all_text = [text for start in sorted(ranges) for text in ranges[start]]
+            results[pdf_file] = "\n\n".join(all_text)
+            logger.info(f"Extracted {pdf_file.name}: {len(ranges)} page ranges, "
+                        f"{len(results[pdf_file])} characters in {cpu_times[pdf_file]:.2f}s")
+
+        logger.info(f"Parallel extraction finished in {time.perf_counter() - started:.2f}s")
+        return results
+
+    @metrics.timed("extract.pdf")
+    def _extract_pdf_text(self, pdf_path: Path) -> str:
+        try:
+            started = time.perf_counter()
+            with fitz.open(pdf_path) as doc:
+                page_count = doc.page_count
 
-            doc.close()
+            logger.debug(f"Extracting {page_count} pages from {pdf_path.name}")
+            all_text, _ = _extract_page_range(str(pdf_path), 0, page_count)
 
             if all_text:
                 full_text = "\n\n".join(all_text)
-                logger.debug(f"Extracted {len(full_text)} characters from {pdf_path.name}")
+                logger.debug(f"Extracted {len(full_text)} characters from {pdf_path.name} "
+                             f"in {time.perf_counter() - started:.2f}s")
                 return full_text
             else:
                 logger.warning(f"No text content found in {pdf_path.name}")
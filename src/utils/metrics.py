@@ -0,0 +1,383 @@
+import os
+import json
+import time
+import itertools
+import threading
+from bisect import bisect_left
+from collections import deque
+from functools import wraps
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from src.utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+# Upper bounds in seconds, from sub-millisecond FAISS searches to slow LLM calls
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        # Upper bound of the bucket holding the q-th observation, capped at the maximum seen
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets + (self.max,), self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "max": self.max
+        }
+
+
+class Span:
+    __slots__ = ("metrics", "name", "labels", "attributes", "trace_id", "parent", "depth", "start", "duration")
+
+    def __init__(self, metrics: "Metrics", name: str, labels: Dict[str, Any]):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.attributes: Dict[str, Any] = {}
+        self.trace_id = None
+        self.parent = None
+        self.depth = 0
+        self.start = 0.0
+        self.duration = 0.0
+
+    def __enter__(self) -> "Span":
+        stack = self.metrics._stack()
+        if stack:
+            self.parent = stack[-1].name
+            self.trace_id = stack[-1].trace_id
+        else:
+            self.trace_id = next(self.metrics._trace_ids)
+        self.depth = len(stack)
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        self.duration = time.perf_counter() - self.start
+        stack = self.metrics._stack()
+        # Generators may close their spans out of order
+        if stack and stack[-1] is self:
+            stack.pop()
+        elif self in stack:
+            stack.remove(self)
+        self.metrics._finish(self, exc_type)
+        return False
+
+    def set(self, **attributes: Any) -> None:
+        """
+            Attaches values only known inside the span (result counts, cache hits).
+            Unlike labels they are exported with the span but not aggregated.
+        """
+        self.attributes.update(attributes)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        return False
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def elapsed(self) -> float:
+        return 0.0
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class InMemoryExporter:
+    def __init__(self, max_spans: int = 10_000):
+        """
+            Keeps the most recent finished spans for inspection, e.g. in the UI.
+
+            max_spans: Spans kept, older ones are dropped
+        """
+        self.spans: Deque[Dict[str, Any]] = deque(maxlen=max_spans)
+
+    def export(self, record: Dict[str, Any], metrics: "Metrics") -> None:
+        self.spans.append(record)
+
+    def last_trace(self, name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+            Spans of the most recent trace whose root span is called name (any root
+            when None), in the order they started.
+        """
+        for record in reversed(self.spans):
+            if record["parent"] is None and (name is None or record["name"] == name):
+                trace = [span for span in self.spans if span["trace_id"] == record["trace_id"]]
+                return sorted(trace, key=lambda span: span["start"])
+        return []
+
+
+class JsonLinesExporter:
+    def __init__(self, path: str):
+        """
+            Appends one JSON object per finished span to path.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, record: Dict[str, Any], metrics: "Metrics") -> None:
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class PrometheusExporter:
+    def __init__(self, path: str, interval: float = 15.0):
+        """
+            Rewrites path with every metric in the Prometheus text format, for the
+            node_exporter textfile collector or any scraper reading the file.
+
+            interval: Minimum seconds between rewrites
+        """
+        self.path = path
+        self.interval = interval
+        self._last_write = 0.0
+        self._lock = threading.Lock()
+
+    def export(self, record: Dict[str, Any], metrics: "Metrics") -> None:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_write < self.interval:
+                return
+            self._last_write = now
+        self.write(metrics)
+
+    def write(self, metrics: "Metrics") -> None:
+        # Written aside and renamed, so readers never see a partial file
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(metrics.render_prometheus())
+        os.replace(temp_path, self.path)
+
+
+class Metrics:
+    def __init__(self, enabled: bool = False, exporters: Optional[List[Any]] = None):
+        """
+            Timers (spans), counters and histograms for the hot paths. While disabled
+            every call returns right away, so instrumented code pays one attribute check.
+
+            enabled: Record anything at all
+            exporters: Receive every finished span through export(record, metrics)
+        """
+        self.enabled = enabled
+        self.exporters = list(exporters or [])
+        self._counters: Dict[Tuple[str, LabelSet], float] = {}
+        self._histograms: Dict[Tuple[str, LabelSet], Histogram] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._trace_ids = itertools.count(1)
+
+    def configure(self, enabled: bool = True, exporters: Optional[List[Any]] = None) -> None:
+        self.enabled = enabled
+        self.exporters = list(exporters or [])
+        logger.info(f"Metrics {'enabled' if enabled else 'disabled'}, "
+                    f"exporters: {[type(exporter).__name__ for exporter in self.exporters]}")
+
+    def span(self, name: str, **labels: Any):
+        """
+            Times a block: with metrics.span("faiss.similarity_search", hybrid=True): ...
+            Labels become histogram labels, keep them low-cardinality.
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, labels)
+
+    def timed(self, name: str, **labels: Any) -> Callable:
+        def decorator(function: Callable) -> Callable:
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with Span(self, name, labels):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def increment(self, name: str, value: float = 1, **labels: Any) -> None:
+        if not self.enabled:
+            return
+        key = (name, self._label_set(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        if not self.enabled:
+            return
+        key = (name, self._label_set(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                "counters": {self._display_name(name, labels): value
+                             for (name, labels), value in sorted(self._counters.items())},
+                "histograms": {self._display_name(name, labels): histogram.to_dict()
+                               for (name, labels), histogram in sorted(self._histograms.items())}
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f"{self._prometheus_name(name)}_total"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{self._prometheus_labels(labels)} {value}")
+
+        for (name, labels), histogram in histograms:
+            metric = self._prometheus_name(name)
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{metric}_bucket{self._prometheus_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{metric}_sum{self._prometheus_labels(labels)} {histogram.sum}")
+            lines.append(f"{metric}_count{self._prometheus_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def _finish(self, span: Span, exc_type) -> None:
+        self.observe(f"{span.name}.seconds", span.duration, **span.labels)
+        if exc_type is not None:
+            self.increment(f"{span.name}.errors", **span.labels)
+        if not self.exporters:
+            return
+
+        record = {
+            "name": span.name,
+            "trace_id": span.trace_id,
+            "parent": span.parent,
+            "depth": span.depth,
+            "start": time.time() - span.duration,
+            "duration": span.duration,
+            "labels": span.labels,
+            "attributes": span.attributes,
+            "error": exc_type.__name__ if exc_type is not None else None
+        }
+        for exporter in self.exporters:
+            try:
+                exporter.export(record, self)
+            except Exception as e:
+                logger.error(f"Error exporting span {span.name}: {str(e)}")
+
+    def _stack(self) -> List[Span]:
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    @staticmethod
+    def _label_set(labels: Dict[str, Any]) -> LabelSet:
+        if not labels:
+            return ()
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    @staticmethod
+    def _display_name(name: str, labels: LabelSet) -> str:
+        if not labels:
+            return name
+        return f"{name}{{{','.join(f'{key}={value}' for key, value in labels)}}}"
+
+    @staticmethod
+    def _prometheus_name(name: str) -> str:
+        return "".join(c if c.isalnum() else "_" for c in name)
+
+    @staticmethod
+    def _prometheus_labels(labels: LabelSet) -> str:
+        if not labels:
+            return ""
+        pairs = []
+        for key, value in labels:
+            value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            pairs.append(f'{key}="{value}"')
+        return "{" + ",".join(pairs) + "}"
+
+
+# Shared by every instrumented module, disabled until configure_metrics is called
+metrics = Metrics()
+
+
+def configure_metrics(exporter: Optional[str] = "memory",
+                      path: Optional[str] = None,
+                      prometheus_interval: float = 15.0) -> Metrics:
+    """
+        Enables the shared registry with one exporter.
+
+        exporter: "memory", "jsonl", "prometheus", or None/"" to disable metrics
+        path: Output file for the jsonl and prometheus exporters
+        prometheus_interval: Minimum seconds between rewrites of the Prometheus file
+    """
+    if not exporter:
+        metrics.configure(enabled=False)
+        return metrics
+    if exporter == "memory":
+        exporters = [InMemoryExporter()]
+    elif exporter == "jsonl":
+        exporters = [JsonLinesExporter(path or os.path.join(".cache", "metrics.jsonl"))]
+    elif exporter == "prometheus":
+        exporters = [PrometheusExporter(path or os.path.join(".cache", "metrics.prom"), prometheus_interval)]
+    else:
+        raise ValueError(f"Unknown metrics exporter: {exporter}")
+    metrics.configure(enabled=True, exporters=exporters)
+    return metrics
@@ -1,10 +1,12 @@
 import os
+from functools import lru_cache
 from typing import Optional
 from pydantic_settings import BaseSettings
 from src.utils.logging import setup_logger
 
 logger = setup_logger(__name__)
 
+@lru_cache(maxsize=None)
 def find_env_file():
     current_dir = os.path.dirname(os.path.abspath(__file__))
     while current_dir != os.path.dirname(current_dir):
@@ -22,6 +24,17 @@ def find_env_file():
     logger.warning(".env not found!")
     return '.env'  # Fallback
 
+# Provider credentials and deployments; every other None default means the feature is off
+REQUIRED_FIELDS = (
+    "azure_openai_api_key",
+    "azure_openai_endpoint",
+    "llm_deployment_model",
+    "embedding_deployment_model",
+    "llm_api_version",
+    "embedding_api_version",
+    "groq_api_key"
+)
+
 class Settings(BaseSettings):
     
     azure_openai_api_key: Optional[str] = None 
@@ -31,13 +44,36 @@ class Settings(BaseSettings):
     llm_api_version: Optional[str] = None
     embedding_api_version: Optional[str] = None
     groq_api_key: Optional[str] = None
+    embedding_batch_size: int = 64
+    embedding_max_concurrency: int = 4
+    embedding_tokens_per_minute: Optional[int] = None
+    context_max_tokens: int = 3000
+    llm_timeout: float = 60.0
+    llm_connect_timeout: float = 10.0
+    http_max_connections: int = 20
+    llm_max_concurrency: int = 8
+    reranker: Optional[str] = None
+    reranker_model: Optional[str] = None
+    rerank_depth: int = 20
+    rerank_budget_ms: Optional[float] = 300
+    semantic_cache_threshold: float = 0.95
+    semantic_cache_size: int = 256
+    semantic_cache_ttl: Optional[float] = 3600
+    ingest_queue_dir: str = os.path.join(".cache", "ingest")
+    ingest_index_dir: str = "indexes"
+    ingest_checkpoint_every: int = 10
+    ingest_inline_worker: bool = True
+    metrics_exporter: Optional[str] = None
+    metrics_path: Optional[str] = None
 
     class Config:
-        env_file = find_env_file()
         env_file_encoding = 'utf-8'
         case_sensitive = False
         
     def __init__(self, **kwargs):
+        # .env is looked up on first instantiation instead of when the module is
+        # imported, and only once per process
+        kwargs.setdefault("_env_file", find_env_file())
         super().__init__(**kwargs)
         self._debug_settings()
         
@@ -48,6 +84,16 @@ class Settings(BaseSettings):
             value = getattr(self, field_name)
             if value is not None:
                 logger.info(f"{field_name}: OK")
-            else:
+            elif field_name in REQUIRED_FIELDS:
                 logger.warning(f"{field_name}: not defined!")
-        logger.info("================================")
\ No newline at end of file
+            else:
+                logger.info(f"{field_name}: not set")
+        logger.info("================================")
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """
+        Settings shared by the whole process, read from the environment and .env once.
+    """
+    return Settings()
\ No newline at end of file
@@ -0,0 +1,118 @@
+import os
+import multiprocessing
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+from src.utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class OffsetTextSplitter:
+    def __init__(self,
+                 chunk_size: int = 1000,
+                 chunk_overlap: int = 200,
+                 separators: Optional[List[str]] = None,
+                 strip_whitespace: bool = True):
+        """
+            Produces the same chunks as RecursiveCharacterTextSplitter with literal
+            separators kept at the start of each split (its defaults) and len as the
+            length function. Splits are kept as start/end offsets into the original
+            text, so nothing is copied until a finished chunk is sliced out.
+
+            chunk_size: Maximum size of chunks
+            chunk_overlap: Overlap between chunks
+            separators: Separators tried in order, "" splits into characters
+            strip_whitespace: Strip whitespace from both ends of every chunk
+        """
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"Got a larger chunk overlap ({chunk_overlap}) than chunk size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or ["\n\n", "\n", " ", ""]
+        self.strip_whitespace = strip_whitespace
+
+    def split_text(self, text: str) -> List[str]:
+        chunks: List[str] = []
+        self._split_range(text, 0, len(text), 0, chunks)
+        return chunks
+
+    def split_texts(self, texts: List[str], max_workers: Optional[int] = 1) -> List[List[str]]:
+        """
+            Splits every text, across processes when max_workers > 1 (None means
+            cpu_count). Results keep the order of texts.
+        """
+        max_workers = max_workers or os.cpu_count() or 1
+        if max_workers <= 1 or len(texts) <= 1:
+            return [self.split_text(text) for text in texts]
+
+        logger.debug(f"Splitting {len(texts)} texts with {max_workers} workers")
+        # Spawned like the extraction workers, forking a multithreaded process can deadlock
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(texts)),
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            return list(executor.map(self.split_text, texts, chunksize=max(1, len(texts) // (4 * max_workers))))
+
+    def _split_range(self, text: str, start: int, end: int, level: int, chunks: List[str]) -> None:
+        # First separator found in the range, "" always matches. The offset of its
+        # first match is reused as the first split point
+        separator = self.separators[-1]
+        next_level = len(self.separators)
+        match = -1
+        for i in range(level, len(self.separators)):
+            candidate = self.separators[i]
+            if candidate == "":
+                separator = candidate
+                break
+            match = text.find(candidate, start, end)
+            if match != -1:
+                separator = candidate
+                next_level = i + 1
+                break
+
+        # Splits begin at each non-overlapping match, so the separator leads the split
+        if separator == "":
+            starts = list(range(start, end))
+        else:
+            starts = [start] if match != start else []
+            while match != -1:
+                starts.append(match)
+                match = text.find(separator, match + len(separator), end)
+        ends = starts[1:]
+        ends.append(end)
+
+        run_start = 0
+        for i in range(len(starts)):
+            if ends[i] - starts[i] < self.chunk_size:
+                continue
+            if i > run_start:
+                self._merge(text, starts[run_start:i], ends[run_start:i], chunks)
+            if next_level >= len(self.separators):
+                # Kept as is, RecursiveCharacterTextSplitter does not strip these either
+                chunks.append(text[starts[i]:ends[i]])
+            else:
+                self._split_range(text, starts[i], ends[i], next_level, chunks)
+            run_start = i + 1
+        if run_start < len(starts):
+            self._merge(text, starts[run_start:], ends[run_start:], chunks)
+
+    def _merge(self, text: str, starts: List[int], ends: List[int], chunks: List[str]) -> None:
+        # The splits are contiguous, so a run of them is one slice and its length is
+        # end - start; chunk boundaries are found by binary search instead of summing
+        first = 0
+        while True:
+            # First split that would push the chunk over chunk_size
+            last = bisect_right(ends, starts[first] + self.chunk_size, first)
+            if last >= len(starts):
+                self._append(text[starts[first]:ends[-1]], chunks)
+                return
+            self._append(text[starts[first]:ends[last - 1]], chunks)
+            # Drop splits from the front until the kept run fits in the overlap and
+            # leaves room for the next split
+            threshold = max(ends[last - 1] - self.chunk_overlap, ends[last] - self.chunk_size)
+            first = min(bisect_left(starts, threshold, first), last)
+
+    def _append(self, chunk: str, chunks: List[str]) -> None:
+        if self.strip_whitespace:
+            chunk = chunk.strip()
+        if chunk:
+            chunks.append(chunk)
@@ -0,0 +1,56 @@
+import numpy as np
+from src.services.embedding_cache import CachedEmbeddings, EmbeddingCache, resolve_model_name
+from src.services.embedding_pipeline import BatchedEmbeddings
+from src.services.fake_embeddings import FakeEmbeddings
+
+
+def test_documents_are_embedded_once(tmp_path):
+    embeddings = FakeEmbeddings()
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"))
+    cached = CachedEmbeddings(embeddings, cache)
+
+    first = cached.embed_documents(["a b", "c d", "a b"])
+    second = cached.embed_documents(["c d", "e f"])
+    assert embeddings.texts_embedded == 3
+    assert np.allclose(first[1], second[0])
+    assert np.allclose(first, embeddings.embed_documents(["a b", "c d", "a b"]), atol=1e-6)
+
+
+def test_repeated_queries_do_not_touch_sqlite(tmp_path):
+    embeddings = FakeEmbeddings()
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"))
+    cached = CachedEmbeddings(embeddings, cache)
+
+    vector = cached.embed_query("payment terms")
+    for _ in range(5):
+        repeated = cached.embed_query("payment terms")
+        assert repeated == vector
+        # Callers get their own list
+        repeated.append(0.0)
+    assert embeddings.requests == 1
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    # A new process starts with an empty in-process cache and reads SQLite once
+    restarted = CachedEmbeddings(embeddings, cache)
+    assert restarted.embed_query("payment terms") == vector
+    assert restarted.embed_query("payment terms") == vector
+    assert embeddings.requests == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_queries_and_documents_have_separate_keys(tmp_path):
+    embeddings = FakeEmbeddings()
+    cached = CachedEmbeddings(embeddings, EmbeddingCache(str(tmp_path / "embeddings.sqlite")), query_cache_size=0)
+    cached.embed_documents(["payment terms"])
+    cached.embed_query("payment terms")
+    cached.embed_query("payment terms")
+    assert embeddings.requests == 2
+
+
+def test_wrappers_resolve_to_the_wrapped_model(tmp_path):
+    embeddings = FakeEmbeddings()
+    embeddings.model = "text-embedding-3-small"
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"))
+    assert resolve_model_name(BatchedEmbeddings(embeddings)) == "text-embedding-3-small"
+    assert CachedEmbeddings(BatchedEmbeddings(embeddings), cache).model_name == "text-embedding-3-small"
+    assert resolve_model_name(FakeEmbeddings()) == "FakeEmbeddings"
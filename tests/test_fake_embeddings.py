@@ -0,0 +1,116 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+import numpy as np
+import pytest
+from src.utils.settings import Settings
+from src.services.azure_openai import AzureOpenaiService
+from src.services.fake_embeddings import FakeEmbeddings, FakeRateLimitError
+from benchmarks.concurrent_requests import StubState, stub_handler
+
+
+def test_fake_embeddings_are_deterministic_and_normalized():
+    texts = ["contract clause 7.2", "payment terms", ""]
+    vectors = np.asarray(FakeEmbeddings().embed_documents(texts))
+    assert np.array_equal(vectors, np.asarray(FakeEmbeddings().embed_documents(texts)))
+    assert vectors.shape == (3, 256)
+    assert np.allclose(np.linalg.norm(vectors[:2], axis=1), 1.0)
+    assert not vectors[2].any()
+
+
+@pytest.mark.parametrize("dense", [False, True])
+def test_fake_embeddings_keep_shared_words_close(dense):
+    embeddings = FakeEmbeddings(dimension=64, dense=dense)
+    query, related, unrelated = embeddings.embed_array(["invoice payment due", "payment of the invoice",
+                                                        "weather forecast tomorrow"])
+    assert query @ related > query @ unrelated
+
+
+def test_fake_embeddings_count_requests_and_texts():
+    embeddings = FakeEmbeddings()
+    embeddings.embed_documents(["a", "b", "c"])
+    embeddings.embed_query("d")
+    assert embeddings.requests == 2
+    assert embeddings.texts_embedded == 4
+    assert embeddings.throttled == 0
+
+
+def test_fake_embeddings_throttle_rate():
+    embeddings = FakeEmbeddings(throttle_rate=0.5, seed=3)
+    outcomes = []
+    for _ in range(200):
+        try:
+            embeddings.embed_query("text")
+            outcomes.append(True)
+        except FakeRateLimitError as e:
+            assert e.status_code == 429
+            outcomes.append(False)
+    assert embeddings.requests == 200
+    assert embeddings.throttled == outcomes.count(False)
+    assert 60 < embeddings.throttled < 140
+    # Throttled requests embed nothing
+    assert embeddings.texts_embedded == outcomes.count(True)
+
+
+def test_fake_embeddings_max_concurrent_requests():
+    embeddings = FakeEmbeddings(latency=0.05, max_concurrent_requests=2)
+
+    def embed(_):
+        try:
+            embeddings.embed_query("text")
+            return True
+        except FakeRateLimitError:
+            return False
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        results = list(executor.map(embed, range(6)))
+    assert results.count(False) == embeddings.throttled >= 1
+    assert results.count(True) >= 2
+    # Nothing is left counted as in flight, later requests go through
+    assert embeddings.embed_query("text")
+
+
+@pytest.fixture
+def stub_server():
+    state = StubState(delay=0.02)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), stub_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield state, f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_stub_server_through_azure_openai_service(stub_server):
+    state, endpoint = stub_server
+    sets = Settings(azure_openai_api_key="stub",
+                    azure_openai_endpoint=endpoint,
+                    llm_deployment_model="stub",
+                    embedding_deployment_model="stub",
+                    llm_api_version="2024-06-01",
+                    embedding_api_version="2024-06-01",
+                    llm_max_concurrency=3,
+                    # A pool of its own, closed at the end of the test
+                    http_max_connections=7)
+    service = AzureOpenaiService(sets)
+    # Texts are sent as is, so the test needs no tiktoken encoding download
+    service.get_embeddings().check_embedding_ctx_length = False
+
+    async def fire():
+        return await asyncio.gather(*[
+            service.ainvoke("hello") if i % 2 == 0 else service.aembed([f"text {i}", "other"])
+            for i in range(12)
+        ])
+
+    try:
+        results = asyncio.run(fire())
+    finally:
+        service.pool.close()
+
+    assert [result.content for result in results[::2]] == ["ok"] * 6
+    assert all(np.allclose(vectors, [[0.1, 0.2, 0.3]] * 2) for vectors in results[1::2])
+    assert state.requests == 12
+    # llm_max_concurrency bounds the requests in flight against the endpoint
+    assert 1 <= state.max_in_flight <= 3
+    assert state.in_flight == 0
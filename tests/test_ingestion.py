@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import fitz
+import pytest
+from src.utils.extractors import DocumentExtractor
+from src.services.faiss import FaissService
+from src.services.fake_embeddings import FakeEmbeddings
+from src.services.manifest import IndexManifest
+from src.services.ingestion import CHECKPOINT_FILE, STAGING_SUFFIX, IngestionQueue, IngestionWorker, JobClaimLost
+
+
+class WorkerKilled(BaseException):
+    # Not an Exception, so it goes through the worker's error handling like a killed process
+    pass
+
+
+class HookedExtractor(DocumentExtractor):
+    # Real extraction with a hook called before each file
+    def __init__(self, before_file=None):
+        super().__init__(max_workers=1)
+        self.before_file = before_file
+        self.extracted = []
+
+    def extract_documents(self, path):
+        if self.before_file is not None:
+            self.before_file(path)
+        self.extracted.append(os.path.basename(path))
+        return super().extract_documents(path)
+
+
+def write_pdfs(folder, n_documents: int) -> list:
+    os.makedirs(folder, exist_ok=True)
+    names = []
+    for i in range(n_documents):
+        name = f"document_{i}.pdf"
+        with fitz.open() as pdf:
+            for page in range(2):
+                pdf.new_page().insert_text((72, 72), f"document{i} page{page} subject{i} words{i}")
+            pdf.save(os.path.join(folder, name))
+        names.append(name)
+    return names
+
+
+def make_worker(queue: IngestionQueue, extractor: DocumentExtractor, **kwargs) -> IngestionWorker:
+    return IngestionWorker(queue, extractor, FaissService(FakeEmbeddings()), **kwargs)
+
+
+def test_claim_takes_the_oldest_job_once(tmp_path):
+    queue = IngestionQueue(str(tmp_path / "queue"))
+    first = queue.submit(str(tmp_path / "a"), str(tmp_path / "index_a"))
+    time.sleep(0.002)
+    second = queue.submit(str(tmp_path / "b"), str(tmp_path / "index_b"))
+
+    claimed = queue.claim()
+    assert claimed["id"] == first["id"] and claimed["status"] == "running"
+    assert queue.claim(first["id"]) is None
+    assert queue.claim()["id"] == second["id"]
+    assert queue.claim() is None
+    assert [job["id"] for job in queue.list_jobs("running")] == [first["id"], second["id"]]
+
+
+def test_requeued_job_belongs_to_the_next_claim(tmp_path):
+    queue = IngestionQueue(str(tmp_path / "queue"))
+    queue.submit(str(tmp_path / "a"), str(tmp_path / "index"))
+    job = queue.claim()
+    assert queue.owns(job)
+
+    assert queue.requeue_stale(max_age=60) == []
+    assert queue.requeue_stale(max_age=0) == [job["id"]]
+    assert not queue.owns(job)
+
+    reclaimed = queue.claim()
+    assert reclaimed["claim"] != job["claim"]
+    assert queue.owns(reclaimed) and not queue.owns(job)
+
+
+def test_job_runs_to_done(tmp_path):
+    names = write_pdfs(tmp_path / "pdfs", 3)
+    queue = IngestionQueue(str(tmp_path / "queue"))
+    index_path = str(tmp_path / "index")
+    submitted = queue.submit(str(tmp_path / "pdfs"), index_path)
+    progress = []
+
+    worker = make_worker(queue, HookedExtractor(), checkpoint_every=2)
+    job = worker.run_job(queue.claim(), progress.append)
+
+    assert queue.get(submitted["id"])["status"] == "done"
+    assert job["progress"]["documents_done"] == 3 and job["progress"]["fraction"] == 1.0
+    assert [update["documents_done"] for update in progress][-1] == 3
+    assert not os.path.exists(f"{index_path}{STAGING_SUFFIX}")
+    assert not os.path.exists(os.path.join(index_path, CHECKPOINT_FILE))
+    assert sorted(IndexManifest.load(index_path).documents) == [name[:-4] for name in names]
+
+
+def test_heartbeat_keeps_a_slow_job_claimed(tmp_path):
+    write_pdfs(tmp_path / "pdfs", 2)
+    queue = IngestionQueue(str(tmp_path / "queue"))
+    queue.submit(str(tmp_path / "pdfs"), str(tmp_path / "index"))
+    requeued = []
+
+    def slow_file(path):
+        # Longer than stale_after, only the heartbeat thread updates the job meanwhile
+        time.sleep(0.5)
+        requeued.extend(queue.requeue_stale(max_age=0.3))
+
+    worker = make_worker(queue, HookedExtractor(slow_file), stale_after=0.3)
+    job = worker.run_job(queue.claim())
+    assert requeued == []
+    assert queue.get(job["id"])["status"] == "done"
+
+
+def test_killed_job_resumes_from_its_checkpoint(tmp_path):
+    names = write_pdfs(tmp_path / "pdfs", 5)
+    queue = IngestionQueue(str(tmp_path / "queue"))
+    index_path = str(tmp_path / "index")
+    queue.submit(str(tmp_path / "pdfs"), index_path)
+
+    def killed_on_fourth_file(path):
+        if os.path.basename(path) == names[3]:
+            raise WorkerKilled()
+
+    with pytest.raises(WorkerKilled):
+        make_worker(queue, HookedExtractor(killed_on_fourth_file), checkpoint_every=2).run_job(queue.claim())
+
+    with open(os.path.join(f"{index_path}{STAGING_SUFFIX}", CHECKPOINT_FILE), "r", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    assert checkpoint["processed"] == names[:2]
+
+    # The job stays running until requeued without a heartbeat
+    [job_id] = queue.requeue_stale(max_age=0)
+    extractor = HookedExtractor()
+    job = make_worker(queue, extractor, checkpoint_every=2).run_job(queue.claim())
+
+    assert extractor.extracted == names[2:]
+    assert queue.get(job_id)["status"] == "done"
+    vdb = FaissService(FakeEmbeddings()).load_local_database(index_path)
+    sources = {vdb.docstore.search(chunk_id).metadata["source"] for chunk_id in vdb.index_to_docstore_id.values()}
+    assert sources == {name[:-4] for name in names}
+    assert job["progress"]["chunks"] == vdb.index.ntotal
+
+
+def test_worker_stops_when_its_claim_is_lost(tmp_path):
+    names = write_pdfs(tmp_path / "pdfs", 3)
+    queue = IngestionQueue(str(tmp_path / "queue"))
+    queue.submit(str(tmp_path / "pdfs"), str(tmp_path / "index"))
+    claims = {}
+
+    def requeue_and_reclaim(path):
+        if os.path.basename(path) == names[1]:
+            queue.requeue_stale(max_age=0)
+            claims["other"] = queue.claim()
+
+    with pytest.raises(JobClaimLost):
+        make_worker(queue, HookedExtractor(requeue_and_reclaim), checkpoint_every=10).run_job(queue.claim())
+
+    # The job is left running for the worker that claimed it since
+    job = queue.get(claims["other"]["id"])
+    assert job["status"] == "running" and job["claim"] == claims["other"]["claim"]
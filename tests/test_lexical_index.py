@@ -0,0 +1,132 @@
+import random
+import numpy as np
+import pytest
+from src.services.lexical_index import BM25Index, tokenize
+
+
+def random_corpus(n_texts: int, seed: int = 0) -> list:
+    # Zipf-like vocabulary, so some terms appear in most texts and others in one
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(300)]
+    weights = [1 / (i + 1) for i in range(len(vocabulary))]
+    return [" ".join(rng.choices(vocabulary, weights, k=rng.randint(1, 40))) for _ in range(n_texts)]
+
+
+def built_at_once(doc_ids: list, texts: list) -> BM25Index:
+    index = BM25Index()
+    index.add(doc_ids, texts)
+    index.compact()
+    return index
+
+
+def postings(index: BM25Index) -> dict:
+    # term -> [(docstore id, term frequency)] in row order, terms without live rows left out
+    result = {}
+    for term, term_id in index.vocabulary.items():
+        start, end = index.indptr[term_id], index.indptr[term_id + 1]
+        rows = [(index.doc_ids[row], float(tf)) for row, tf in zip(index.rows[start:end], index.tfs[start:end])
+                if index.alive[row]]
+        if rows:
+            result[term] = rows
+    return result
+
+
+def assert_same_postings(index: BM25Index, reference: BM25Index):
+    assert index.doc_ids == reference.doc_ids
+    assert postings(index) == postings(reference)
+    assert np.array_equal(index.doc_lengths, reference.doc_lengths)
+    # Each term's rows stay ascending, in CSR order
+    assert all(np.all(np.diff(index.rows[index.indptr[t]:index.indptr[t + 1]]) > 0)
+               for t in range(len(index.indptr) - 1))
+
+
+def test_tokenize_keeps_identifiers_and_their_parts():
+    assert tokenize("See AB-1234 and clause 7.2.1.") == ["see", "ab-1234", "ab", "1234", "and", "clause",
+                                                         "7.2.1", "7", "2", "1"]
+
+
+@pytest.mark.parametrize("batch_size", [1, 7, 64])
+def test_pending_postings_merge_like_a_single_add(batch_size):
+    texts = random_corpus(200)
+    doc_ids = [f"chunk{i}" for i in range(len(texts))]
+
+    index = BM25Index()
+    for start in range(0, len(texts), batch_size):
+        index.add(doc_ids[start:start + batch_size], texts[start:start + batch_size])
+        # Searching merges what is pending so far, the rest stays buffered
+        if start % (3 * batch_size) == 0:
+            index.search("term1 term50", 5)
+    index.compact()
+
+    reference = built_at_once(doc_ids, texts)
+    assert index.vocabulary == reference.vocabulary
+    assert np.array_equal(index.indptr, reference.indptr)
+    assert_same_postings(index, reference)
+
+
+def test_search_sees_pending_rows():
+    index = BM25Index()
+    index.add(["a", "b"], ["invoice payment terms", "delivery schedule"])
+    index.search("invoice", 1)
+    index.add(["c"], ["invoice invoice penalty"])
+    assert index._pending
+
+    results = index.search("invoice", 5)
+    assert not index._pending
+    assert [doc_id for doc_id, _ in results] == ["c", "a"]
+    assert index.search("penalty", 5)[0][0] == "c"
+
+
+def test_scores_match_the_index_built_at_once():
+    texts = random_corpus(120, seed=1)
+    doc_ids = [f"chunk{i}" for i in range(len(texts))]
+    index = BM25Index()
+    for start in range(0, len(texts), 10):
+        index.add(doc_ids[start:start + 10], texts[start:start + 10])
+    reference = built_at_once(doc_ids, texts)
+
+    for query in ["term0 term3", "term17", "term120 term2 term250", "missing"]:
+        results, expected = index.search(query, 10), reference.search(query, 10)
+        assert [doc_id for doc_id, _ in results] == [doc_id for doc_id, _ in expected]
+        assert [score for _, score in results] == pytest.approx([score for _, score in expected])
+
+
+def test_deleted_rows_are_masked_then_compacted():
+    texts = random_corpus(50, seed=2)
+    doc_ids = [f"chunk{i}" for i in range(len(texts))]
+    index = BM25Index()
+    index.add(doc_ids[:25], texts[:25])
+    index.add(doc_ids[25:], texts[25:])
+    deleted = doc_ids[::3]
+    index.delete(deleted)
+
+    assert len(index) == len(doc_ids) - len(deleted)
+    assert not {doc_id for doc_id, _ in index.search("term0 term1 term2", 50)} & set(deleted)
+
+    index.compact()
+    kept = [i for i, doc_id in enumerate(doc_ids) if doc_id not in deleted]
+    assert_same_postings(index, built_at_once([doc_ids[i] for i in kept], [texts[i] for i in kept]))
+
+
+def test_allowed_filters_results():
+    index = BM25Index()
+    index.add(["a", "b", "c"], ["payment terms", "payment schedule", "payment penalty"])
+    results = index.search("payment", 5, allowed=lambda doc_ids: doc_ids != "b")
+    assert sorted(doc_id for doc_id, _ in results) == ["a", "c"]
+
+
+def test_save_merges_pending_and_loads_back(tmp_path):
+    texts = random_corpus(40, seed=3)
+    doc_ids = [f"chunk{i}" for i in range(len(texts))]
+    index = BM25Index(k1=1.2, b=0.5)
+    index.add(doc_ids[:20], texts[:20])
+    index.add(doc_ids[20:], texts[20:])
+
+    path = str(tmp_path / "lexical.npz")
+    index.save(path)
+    loaded = BM25Index.load(path)
+
+    assert (loaded.k1, loaded.b) == (1.2, 0.5)
+    assert loaded.vocabulary == index.vocabulary
+    assert_same_postings(loaded, index)
+    assert loaded.search("term4 term9", 5) == index.search("term4 term9", 5)
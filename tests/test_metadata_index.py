@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+from src.services.faiss import FaissService
+from src.services.fake_embeddings import FakeEmbeddings
+from src.services.metadata_index import MetadataIndex
+from tests.test_sync import make_documents
+
+
+def chunk_metadata(n_documents: int, chunks_per_document: int) -> tuple:
+    doc_ids, metadatas = [], []
+    for doc_id in range(n_documents):
+        for chunk_id in range(chunks_per_document):
+            doc_ids.append(f"chunk-{doc_id}-{chunk_id}")
+            metadatas.append({"source": f"document_{doc_id}.pdf", "doc_id": doc_id, "chunk_id": chunk_id})
+    return doc_ids, metadatas
+
+
+def expected_mask(metadatas: list, filter: dict) -> np.ndarray:
+    def matches(metadata, field, wanted):
+        wanted = wanted if isinstance(wanted, (list, set, tuple)) else [wanted]
+        return metadata.get(field) in wanted
+
+    return np.array([all(matches(metadata, field, wanted) for field, wanted in filter.items())
+                     for metadata in metadatas])
+
+
+@pytest.mark.parametrize("filter", [
+    {"source": "document_2.pdf"},
+    {"source": ["document_0.pdf", "document_3.pdf", "unknown.pdf"]},
+    {"doc_id": 1},
+    {"doc_id": [0, 4], "chunk_id": (1, 2)},
+    {"source": {"document_1.pdf", "document_4.pdf"}, "doc_id": 4},
+    {"source": "unknown.pdf"}
+])
+def test_mask_matches_metadata(filter):
+    doc_ids, metadatas = chunk_metadata(5, 3)
+    index = MetadataIndex()
+    index.add(doc_ids[:7], metadatas[:7])
+    index.add(doc_ids[7:], metadatas[7:])
+    assert np.array_equal(index.mask(filter), expected_mask(metadatas, filter))
+
+
+def test_unknown_field_is_rejected():
+    index = MetadataIndex()
+    index.add(*chunk_metadata(1, 1))
+    with pytest.raises(ValueError, match="Cannot filter"):
+        index.mask({"author": "someone"})
+
+
+def test_delete_compacts_columns_like_faiss():
+    doc_ids, metadatas = chunk_metadata(4, 2)
+    index = MetadataIndex()
+    index.add(doc_ids, metadatas)
+    index.delete(["chunk-1-0", "chunk-1-1", "chunk-3-0"])
+
+    kept = [i for i, doc_id in enumerate(doc_ids) if doc_id not in ("chunk-1-0", "chunk-1-1", "chunk-3-0")]
+    assert list(index.ids) == [doc_ids[i] for i in kept]
+    assert np.array_equal(index.mask({"doc_id": [1, 3]}), expected_mask([metadatas[i] for i in kept],
+                                                                          {"doc_id": [1, 3]}))
+
+
+def test_positions_and_contains():
+    doc_ids, metadatas = chunk_metadata(3, 2)
+    index = MetadataIndex()
+    index.add(doc_ids, metadatas)
+
+    assert list(index.positions(["chunk-2-1", "missing", "chunk-0-0"])) == [5, -1, 0]
+    mask = index.mask({"doc_id": 2})
+    assert list(index.contains(np.array(["chunk-2-0", "chunk-0-1", "missing"]), mask)) == [True, False, False]
+    assert list(MetadataIndex().positions(["chunk-0-0"])) == [-1]
+
+
+def test_selector_picks_the_cheaper_encoding():
+    index = MetadataIndex()
+    index.add(*chunk_metadata(200, 1))
+    assert type(index.selector(index.mask({"doc_id": 5}))).__name__ == "IDSelectorBatch"
+    assert type(index.selector(index.mask({"doc_id": list(range(100))}))).__name__ == "IDSelectorBitmap"
+
+
+def test_save_and_load_keep_filters(tmp_path):
+    doc_ids, metadatas = chunk_metadata(3, 2)
+    metadatas[0] = {"doc_id": 0, "chunk_id": 0}
+    index = MetadataIndex()
+    index.add(doc_ids, metadatas)
+    path = str(tmp_path / "metadata.npz")
+    index.save(path)
+    loaded = MetadataIndex.load(path)
+
+    assert list(loaded.ids) == doc_ids
+    for filter in ({"source": "document_0.pdf"}, {"source": None}, {"doc_id": 2}):
+        assert np.array_equal(loaded.mask(filter), index.mask(filter))
+
+
+@pytest.mark.parametrize("options", [{}, {"hybrid_search": True}, {"vector_storage": "int8"}])
+def test_filtered_search_only_returns_matching_chunks(tmp_path, options):
+    faiss_service = FaissService(FakeEmbeddings(), **options)
+    documents = make_documents(range(12))
+    vdb = faiss_service.create_local_database(documents, str(tmp_path / "index"))
+    sources = ["document_3.pdf", "document_7.pdf"]
+
+    results = faiss_service.similarity_search(vdb, documents[5].page_content, k=5, filter={"source": sources})
+    assert sorted(doc.metadata["source"] for doc in results) == sources
+    results = faiss_service.similarity_search(vdb, documents[5].page_content, k=5, filter={"doc_id": 9})
+    assert [doc.metadata["source"] for doc in results] == ["document_9.pdf"]
+
+    # Filters still apply after a reload and after documents were removed
+    vdb, _ = faiss_service.sync_local_database(make_documents([0, 1, 2, 4, 5, 6, 7, 8, 9, 10, 11]),
+                                               str(tmp_path / "index"))
+    results = faiss_service.similarity_search(vdb, documents[3].page_content, k=5, filter={"source": sources})
+    assert [doc.metadata["source"] for doc in results] == ["document_7.pdf"]
@@ -0,0 +1,30 @@
+import pytest
+from src.services.faiss import FaissService
+from src.services.fake_embeddings import FakeEmbeddings
+from src.services.rerankers import CosineReranker, Reranker
+from benchmarks.common import synthetic_documents, synthetic_queries
+
+
+def test_reranker_requires_score_pairs():
+    with pytest.raises(TypeError):
+        Reranker()
+
+
+@pytest.mark.parametrize("options", [{}, {"vector_storage": "int8"}, {"index_factory": "HNSW32"}])
+def test_cosine_reranker_scores_stored_vectors(options):
+    embeddings = FakeEmbeddings()
+    reranker = CosineReranker(embeddings, cache_size=0)
+    faiss_service = FaissService(embeddings, reranker=reranker, rerank_depth=20, **options)
+    documents = synthetic_documents(30)
+    _, vdb = faiss_service.create_temporary_database(documents)
+
+    for query in synthetic_queries(documents, 5):
+        embedded = embeddings.texts_embedded
+        results = faiss_service.similarity_search(vdb, query, k=5, return_scores=True)
+        # Only the query is embedded, the candidates are scored from the index
+        assert embeddings.texts_embedded == embedded + 1
+
+        candidates = faiss_service.similarity_search(vdb, query, k=20, rerank=False)
+        expected = reranker.rerank(query, candidates, 5)
+        assert [doc.id for doc, _ in results] == [doc.id for doc, _ in expected]
+        assert [score for _, score in results] == pytest.approx([score for _, score in expected], abs=1e-5)
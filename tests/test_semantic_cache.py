@@ -0,0 +1,95 @@
+import time
+from src.services.faiss import FaissService
+from src.services.fake_embeddings import FakeEmbeddings
+from src.services.semantic_cache import SemanticCache
+from tests.test_sync import make_documents
+
+QUESTION = "What are the payment terms of the contract?"
+
+
+def make_cache(**kwargs) -> SemanticCache:
+    return SemanticCache(FakeEmbeddings(), **kwargs)
+
+
+def test_similar_question_hits_and_unrelated_misses():
+    cache = make_cache(threshold=0.8)
+    cache.store("db", 1, QUESTION, "30 days")
+
+    assert cache.lookup("db", 1, "what are the payment terms of the contract") == "30 days"
+    assert cache.lookup("db", 1, "Who signed the delivery schedule?") is None
+    assert cache.lookup("other", 1, QUESTION) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_new_database_version_drops_its_answers():
+    cache = make_cache()
+    cache.store("db", 1, QUESTION, "30 days")
+    cache.store("other", 1, QUESTION, "60 days")
+
+    assert cache.lookup("db", 2, QUESTION) is None
+    assert cache.invalidations == 1
+    # The old version does not come back, and other databases keep their answers
+    assert cache.lookup("db", 1, QUESTION) is None
+    assert cache.lookup("other", 1, QUESTION) == "60 days"
+
+
+def test_invalidate_one_or_every_database():
+    cache = make_cache()
+    for database in ("a", "b", "c"):
+        cache.store(database, 1, QUESTION, f"answer {database}")
+        cache.store(database, 1, "Who is the supplier?", f"supplier {database}")
+
+    assert cache.invalidate("a") == 2
+    assert cache.invalidate("a") == 0
+    assert cache.lookup("a", 1, QUESTION) is None
+    assert cache.lookup("b", 1, QUESTION) == "answer b"
+
+    assert cache.invalidate() == 4
+    assert len(cache) == 0
+    assert cache.stats()["invalidations"] == 6
+
+
+def test_storing_an_equivalent_question_replaces_the_answer():
+    cache = make_cache()
+    cache.store("db", 1, QUESTION, "30 days")
+    cache.store("db", 1, QUESTION.lower(), "45 days")
+    assert len(cache) == 1
+    assert cache.lookup("db", 1, QUESTION) == "45 days"
+
+
+def test_expired_answers_are_not_returned():
+    cache = make_cache(ttl=0.05)
+    cache.store("db", 1, QUESTION, "30 days")
+    time.sleep(0.1)
+    assert cache.lookup("db", 1, QUESTION) is None
+    assert cache.expirations == 1
+    assert len(cache) == 0
+
+
+def test_least_recently_used_answers_and_databases_are_evicted():
+    cache = make_cache(max_entries=2, max_databases=2)
+    cache.store("db", 1, "first question about invoices", "1")
+    cache.store("db", 1, "second question about deliveries", "2")
+    cache.lookup("db", 1, "first question about invoices")
+    cache.store("db", 1, "third question about penalties", "3")
+
+    assert cache.evictions == 1
+    assert cache.lookup("db", 1, "second question about deliveries") is None
+    assert cache.lookup("db", 1, "first question about invoices") == "1"
+
+    cache.store("other", 1, QUESTION, "a")
+    cache.store("third", 1, QUESTION, "b")
+    assert cache.stats()["databases"] == 2
+    assert cache.lookup("db", 1, "first question about invoices") is None
+
+
+def test_database_changes_invalidate_through_database_version():
+    faiss_service = FaissService(FakeEmbeddings())
+    temp_id, vdb = faiss_service.create_temporary_database(make_documents(range(3)))
+    cache = make_cache()
+    cache.store(temp_id, faiss_service.database_version(temp_id), QUESTION, "30 days")
+    assert cache.lookup(temp_id, faiss_service.database_version(temp_id), QUESTION) == "30 days"
+
+    faiss_service.add_documents_to_database(vdb, make_documents([3]))
+    assert cache.lookup(temp_id, faiss_service.database_version(temp_id), QUESTION) is None
+    assert cache.invalidations == 1
@@ -0,0 +1,52 @@
+import pytest
+from langchain.docstore.document import Document
+from src.services.faiss import FaissService
+from src.services.fake_embeddings import FakeEmbeddings
+from src.services.manifest import IndexManifest
+from tests.test_text_splitter import random_texts
+from benchmarks.chunking import pdf_like_documents
+
+
+def document_pages(documents_pages: list) -> list:
+    # Pages as DocumentExtractor.iter_pages yields them
+    return [
+        {"document": name, "document_index": i, "document_total": len(documents_pages),
+         "page": page, "page_count": len(pages), "text": text}
+        for i, (name, pages) in enumerate(documents_pages, 1)
+        for page, text in enumerate(pages)
+    ]
+
+
+def database_chunks(vdb) -> list:
+    chunks = [vdb.docstore.search(vdb.index_to_docstore_id[i]) for i in range(vdb.index.ntotal)]
+    return [(chunk.page_content, chunk.metadata) for chunk in chunks]
+
+
+def pdf_like_pages(n_documents: int, pages: int) -> list:
+    return [(doc.metadata["source"], doc.page_content.split("\n\n"))
+            for doc in pdf_like_documents(n_documents, pages)]
+
+
+def random_pages(n_documents: int) -> list:
+    # Pages full of separators and whitespace, where re-splitting a page boundary would show
+    return [(f"document_{i}", [text for text in random_texts(6, seed=i) if text.strip()])
+            for i in range(n_documents)]
+
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", [(1200, 500), (200, 50), (50, 10)])
+@pytest.mark.parametrize("documents_pages", [pdf_like_pages(3, 6), random_pages(4)])
+def test_stream_matches_batch_chunks(tmp_path, documents_pages, chunk_size, chunk_overlap):
+    faiss_service = FaissService(FakeEmbeddings(), chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    # extract_documents joins the pages of a document with blank lines
+    documents = [Document(page_content="\n\n".join(pages), metadata={"source": name})
+                 for name, pages in documents_pages]
+
+    batch = faiss_service.create_local_database(documents, str(tmp_path / "batch"))
+    streamed = faiss_service.create_local_database_from_stream(document_pages(documents_pages),
+                                                               str(tmp_path / "stream"), batch_size=7)
+
+    assert database_chunks(streamed) == database_chunks(batch)
+    batch_manifest = IndexManifest.load(str(tmp_path / "batch"))
+    stream_manifest = IndexManifest.load(str(tmp_path / "stream"))
+    assert ({source: entry["hash"] for source, entry in stream_manifest.documents.items()}
+            == {source: entry["hash"] for source, entry in batch_manifest.documents.items()})
@@ -0,0 +1,125 @@
+import os
+import pytest
+from langchain.docstore.document import Document
+from src.services.faiss import FaissService
+from src.services.fake_embeddings import FakeEmbeddings
+from src.services.manifest import MANIFEST_FILE, IndexManifest, fingerprint_text
+
+
+def make_documents(numbers) -> list:
+    # One short chunk per document, with words no other document has
+    return [
+        Document(page_content=f"chunk{i} marker{i} topic{i} words{i}", metadata={"source": f"document_{i}.pdf"})
+        for i in numbers
+    ]
+
+
+def assert_each_document_finds_itself(faiss_service, vdb, documents):
+    for doc in documents:
+        result = faiss_service.similarity_search(vdb, doc.page_content, k=1)
+        assert result[0].metadata["source"] == doc.metadata["source"]
+
+
+@pytest.mark.parametrize("index_factory", [None, "SQ8", "LSHt"])
+def test_sync_delete_then_add_keeps_ids_aligned(tmp_path, index_factory):
+    faiss_service = FaissService(FakeEmbeddings(), index_factory=index_factory)
+    index_path = str(tmp_path / "index")
+    faiss_service.sync_local_database(make_documents(range(10)), index_path)
+
+    # Document 3 removed and document 50 added in the same sync
+    documents = make_documents([0, 1, 2, 4, 5, 6, 7, 8, 9, 50])
+    vdb, summary = faiss_service.sync_local_database(documents, index_path)
+
+    assert summary["removed"] == ["document_3.pdf"]
+    assert summary["added"] == ["document_50.pdf"]
+    assert vdb.index.ntotal == 10
+    assert_each_document_finds_itself(faiss_service, vdb, documents)
+    assert_each_document_finds_itself(faiss_service, faiss_service.load_local_database(index_path), documents)
+
+
+def test_sync_updates_changed_documents_only(tmp_path):
+    embeddings = FakeEmbeddings()
+    faiss_service = FaissService(embeddings)
+    index_path = str(tmp_path / "index")
+    documents = make_documents(range(5))
+    faiss_service.sync_local_database(documents, index_path)
+
+    embedded = embeddings.texts_embedded
+    documents[2] = Document(page_content="rewritten text", metadata={"source": "document_2.pdf"})
+    vdb, summary = faiss_service.sync_local_database(documents, index_path)
+
+    assert summary["updated"] == ["document_2.pdf"]
+    assert len(summary["unchanged"]) == 4
+    assert embeddings.texts_embedded == embedded + 1
+    assert_each_document_finds_itself(faiss_service, vdb, documents)
+    manifest = IndexManifest.load(index_path)
+    assert sorted(manifest.documents) == sorted(doc.metadata["source"] for doc in documents)
+
+
+def test_sync_without_remove_missing_keeps_documents(tmp_path):
+    faiss_service = FaissService(FakeEmbeddings())
+    index_path = str(tmp_path / "index")
+    faiss_service.sync_local_database(make_documents(range(3)), index_path)
+    vdb, summary = faiss_service.sync_local_database(make_documents([7]), index_path, remove_missing=False)
+
+    assert summary["removed"] == []
+    assert vdb.index.ntotal == 4
+    assert_each_document_finds_itself(faiss_service, vdb, make_documents([0, 1, 2, 7]))
+
+
+@pytest.mark.parametrize("index_factory", ["IVF{nlist},Flat", "HNSW32"])
+def test_sync_delete_is_refused_before_changing_the_index(tmp_path, index_factory):
+    faiss_service = FaissService(FakeEmbeddings(), index_factory=index_factory)
+    index_path = str(tmp_path / "index")
+    faiss_service.sync_local_database(make_documents(range(10)), index_path)
+
+    with pytest.raises(ValueError, match="cannot delete vectors"):
+        faiss_service.sync_local_database(make_documents([0, 1, 2, 4, 5, 6, 7, 8, 9, 50]), index_path)
+
+    assert "document_3.pdf" in IndexManifest.load(index_path).documents
+    vdb = faiss_service.load_local_database(index_path)
+    assert vdb.index.ntotal == 10
+    assert_each_document_finds_itself(faiss_service, vdb, make_documents(range(10)))
+
+
+def test_manifest_tracks_chunks_and_doc_ids(tmp_path):
+    faiss_service = FaissService(FakeEmbeddings(), chunk_size=15, chunk_overlap=0)
+    index_path = str(tmp_path / "index")
+    documents = make_documents(range(3))
+    vdb = faiss_service.create_local_database(documents, index_path)
+
+    manifest = IndexManifest.load(index_path)
+    assert manifest.next_doc_id == 3
+    for doc in documents:
+        entry = manifest.documents[doc.metadata["source"]]
+        assert entry["hash"] == fingerprint_text(doc.page_content)
+        chunks = [vdb.docstore.search(chunk_id) for chunk_id in entry["chunk_ids"]]
+        assert len(chunks) > 1
+        assert {chunk.metadata["doc_id"] for chunk in chunks} == {entry["doc_id"]}
+
+    # Updated documents keep their doc_id, new ones never reuse the one of a removed document
+    documents = [Document(page_content="rewritten text", metadata={"source": "document_1.pdf"}),
+                 *make_documents([2, 9])]
+    faiss_service.sync_local_database(documents, index_path)
+    manifest = IndexManifest.load(index_path)
+    assert sorted(manifest.documents) == ["document_1.pdf", "document_2.pdf", "document_9.pdf"]
+    assert manifest.documents["document_1.pdf"]["doc_id"] == 1
+    assert manifest.documents["document_9.pdf"]["doc_id"] == 3
+    assert manifest.next_doc_id == 4
+
+
+def test_sync_without_manifest_rebuilds_it_from_the_docstore(tmp_path):
+    faiss_service = FaissService(FakeEmbeddings())
+    index_path = str(tmp_path / "index")
+    documents = make_documents(range(4))
+    faiss_service.create_local_database(documents, index_path)
+    os.remove(os.path.join(index_path, MANIFEST_FILE))
+
+    # Hashes are unknown, so every document is indexed again once
+    vdb, summary = faiss_service.sync_local_database(documents, index_path)
+    assert sorted(summary["updated"]) == sorted(doc.metadata["source"] for doc in documents)
+    assert vdb.index.ntotal == 4
+    assert_each_document_finds_itself(faiss_service, vdb, documents)
+
+    _, summary = faiss_service.sync_local_database(documents, index_path)
+    assert len(summary["unchanged"]) == 4
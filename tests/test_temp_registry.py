@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import pytest
+from src.services.faiss import FaissService
+from src.services.fake_embeddings import FakeEmbeddings
+from src.services.temp_registry import TempDatabaseRegistry
+from tests.test_sync import make_documents, assert_each_document_finds_itself
+
+
+class JsonDatabases:
+    # Plain dicts standing in for databases, saved as JSON and sized by their "size" key
+    def __init__(self, fail_saves: bool = False):
+        self.fail_saves = fail_saves
+        self.saves = 0
+        self.loads = 0
+
+    def save(self, database: dict, path: str) -> None:
+        if self.fail_saves:
+            raise OSError("disk full")
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "database.json"), "w", encoding="utf-8") as f:
+            json.dump(database, f)
+        self.saves += 1
+
+    def load(self, path: str) -> dict:
+        with open(os.path.join(path, "database.json"), "r", encoding="utf-8") as f:
+            self.loads += 1
+            return json.load(f)
+
+    def registry(self, tmp_path, **kwargs) -> TempDatabaseRegistry:
+        return TempDatabaseRegistry(self.save, self.load, lambda database: database["size"],
+                                    spill_dir=str(tmp_path / "spill"), **kwargs)
+
+
+def in_memory(registry: TempDatabaseRegistry) -> dict:
+    return {temp_id: db["in_memory"] for temp_id, db in registry.memory_usage()["databases"].items()}
+
+
+def test_budget_spills_least_recently_used(tmp_path):
+    databases = JsonDatabases()
+    registry = databases.registry(tmp_path, memory_budget_bytes=250)
+    for name in "abc":
+        registry[name] = {"name": name, "size": 100}
+
+    assert in_memory(registry) == {"a": False, "b": True, "c": True}
+    assert registry.memory_usage()["total_bytes"] == 200
+    assert os.path.exists(os.path.join(tmp_path, "spill", "a", "database.json"))
+
+    # Reloading a spills the least recently used of the others
+    assert registry["a"] == {"name": "a", "size": 100}
+    assert in_memory(registry) == {"a": True, "b": False, "c": True}
+    assert (registry.spills, registry.reloads) == (2, 1)
+
+
+def test_membership_and_iteration_do_not_reload(tmp_path):
+    databases = JsonDatabases()
+    registry = databases.registry(tmp_path, memory_budget_bytes=100)
+    registry["a"] = {"size": 100}
+    registry["b"] = {"size": 100}
+
+    assert "a" in registry and "missing" not in registry
+    assert list(registry) == ["a", "b"] and len(registry) == 2
+    assert databases.loads == 0
+
+
+def test_idle_databases_are_spilled_on_sweep(tmp_path):
+    databases = JsonDatabases()
+    registry = databases.registry(tmp_path, idle_ttl=0.05)
+    registry["a"] = {"size": 1}
+    registry["b"] = {"size": 1}
+    time.sleep(0.1)
+    registry["b"]
+
+    registry.sweep()
+    assert in_memory(registry) == {"a": False, "b": True}
+
+
+def test_unspillable_databases_stay_in_memory(tmp_path):
+    databases = JsonDatabases()
+    registry = databases.registry(tmp_path, memory_budget_bytes=50)
+    registry.register("mapped", {"size": 100}, spillable=False)
+    registry["a"] = {"size": 40}
+    registry["b"] = {"size": 40}
+
+    # The memory-mapped database counts for nothing and is never spilled
+    assert in_memory(registry) == {"mapped": True, "a": False, "b": True}
+    assert registry.memory_usage()["total_bytes"] == 40
+
+
+def test_failed_spill_keeps_the_database(tmp_path):
+    databases = JsonDatabases(fail_saves=True)
+    registry = databases.registry(tmp_path, memory_budget_bytes=100)
+    registry["a"] = {"size": 100}
+    registry["b"] = {"size": 100}
+
+    assert in_memory(registry) == {"a": True, "b": True}
+    assert registry["a"] == {"size": 100}
+    assert registry.spills == 0
+
+
+def test_delete_removes_the_spilled_copy(tmp_path):
+    databases = JsonDatabases()
+    registry = databases.registry(tmp_path, memory_budget_bytes=100)
+    registry["a"] = {"size": 100}
+    registry["b"] = {"size": 100}
+    spill_path = os.path.join(tmp_path, "spill", "a")
+    assert os.path.exists(spill_path)
+
+    del registry["a"]
+    assert not os.path.exists(spill_path)
+    with pytest.raises(KeyError):
+        registry["a"]
+
+
+@pytest.mark.parametrize("chunk_store", ["pickle", "sqlite"])
+def test_spilled_temporary_databases_search_the_same(tmp_path, chunk_store):
+    # A budget of a few bytes keeps only the database in use in memory
+    faiss_service = FaissService(FakeEmbeddings(), temp_memory_budget_mb=1e-6,
+                                 temp_spill_dir=str(tmp_path / "spill"), chunk_store=chunk_store)
+    first_documents, second_documents = make_documents(range(5)), make_documents(range(5, 10))
+    first_id, _ = faiss_service.create_temporary_database(first_documents)
+    second_id, _ = faiss_service.create_temporary_database(second_documents)
+
+    # Reading the usage sweeps without keeping any database
+    usage = faiss_service.get_temporary_memory_usage()
+    assert usage["spills"] == 2
+    assert usage["total_bytes"] == 0
+
+    assert_each_document_finds_itself(faiss_service, first_id, first_documents)
+    assert_each_document_finds_itself(faiss_service, second_id, second_documents)
+    assert faiss_service.get_temporary_memory_usage()["reloads"] == 2
+
+
+def test_background_sweep_spills_idle_databases(tmp_path):
+    databases = JsonDatabases()
+    registry = databases.registry(tmp_path, idle_ttl=0.05)
+    registry["a"] = {"size": 1}
+
+    # Nothing touches the registry, the sweep thread spills the database on its own
+    deadline = time.monotonic() + 5
+    while in_memory(registry)["a"] and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert in_memory(registry) == {"a": False}
+    registry.close()
+
+
+def test_lazy_registry_only_checks_idle_ttl_on_use(tmp_path):
+    databases = JsonDatabases()
+    registry = databases.registry(tmp_path, idle_ttl=0.05, sweep_interval=0)
+    registry["a"] = {"size": 1}
+    time.sleep(0.15)
+    assert in_memory(registry) == {"a": True}
+    registry.sweep()
+    assert in_memory(registry) == {"a": False}
+
+
+def test_pickle_spill_keeps_the_sqlite_store_of_the_database(tmp_path):
+    index_path = str(tmp_path / "index")
+    documents = make_documents(range(6))
+    FaissService(FakeEmbeddings(), chunk_store="sqlite").create_local_database(documents, index_path)
+
+    faiss_service = FaissService(FakeEmbeddings(), temp_spill_dir=str(tmp_path / "spill"))
+    temp_id, vdb = faiss_service.load_temporary_database(index_path)
+    docstore = vdb.docstore
+    assert type(docstore).__name__ == "SQLiteDocstore"
+
+    faiss_service.save_local_database(vdb, str(tmp_path / "pickled"))
+    assert vdb.docstore is docstore
+    assert_each_document_finds_itself(faiss_service, faiss_service.load_local_database(str(tmp_path / "pickled")),
+                                      documents)
+    assert_each_document_finds_itself(faiss_service, temp_id, documents)
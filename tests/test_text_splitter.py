@@ -0,0 +1,65 @@
+"""
+    OffsetTextSplitter must produce exactly the chunks of LangChain's
+    RecursiveCharacterTextSplitter, which indexes were built with before it.
+
+    python -m pytest tests
+"""
+import random
+import pytest
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from src.utils.text_splitter import OffsetTextSplitter
+from benchmarks.common import synthetic_documents
+
+SEPARATORS = ["\n\n", "\n", ".", "!", "?", ",", " ", ""]
+CONFIGS = [(1000, 200), (1200, 500), (200, 0), (50, 10), (7, 3)]
+
+
+def random_texts(n_texts: int, seed: int = 0) -> list:
+    # Dense in separators, whitespace runs and long unbroken words to hit the edge cases
+    rng = random.Random(seed)
+    pieces = ["word", "a", " ", "  ", "\n", "\n\n", "\n\n\n", ".", "!", "?", ",", "\t", " \n", "x" * 80]
+    return [
+        "".join(rng.choice(pieces) for _ in range(rng.randint(0, 1500)))
+        for _ in range(n_texts)
+    ]
+
+
+def check_equivalence(texts: list, configs: list = CONFIGS) -> int:
+    """
+        Number of (text, config) cases checked; raises AssertionError on the first mismatch.
+    """
+    checked = 0
+    for chunk_size, chunk_overlap in configs:
+        reference = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                                   separators=SEPARATORS)
+        splitter = OffsetTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=SEPARATORS)
+        for i, text in enumerate(texts):
+            assert splitter.split_text(text) == reference.split_text(text), (
+                f"Chunks differ for text {i} with chunk_size={chunk_size}, chunk_overlap={chunk_overlap}"
+            )
+            checked += 1
+    return checked
+
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", CONFIGS)
+def test_random_texts_match_recursive_splitter(chunk_size, chunk_overlap):
+    assert check_equivalence(random_texts(300), [(chunk_size, chunk_overlap)]) == 300
+
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", CONFIGS)
+def test_documents_match_recursive_splitter(chunk_size, chunk_overlap):
+    texts = [doc.page_content for doc in synthetic_documents(20)]
+    assert check_equivalence(texts, [(chunk_size, chunk_overlap)]) == len(texts)
+
+
+def test_edge_cases_match_recursive_splitter():
+    texts = ["", " ", "\n\n", "x" * 5000, "word " * 1000, "a.b.c." * 300, "\n".join(["line"] * 500)]
+    check_equivalence(texts)
+
+
+def test_split_texts_workers_keep_order():
+    splitter = OffsetTextSplitter(chunk_size=200, chunk_overlap=50, separators=SEPARATORS)
+    texts = random_texts(50, seed=1)
+    expected = [splitter.split_text(text) for text in texts]
+    assert splitter.split_texts(texts) == expected
+    assert splitter.split_texts(texts, max_workers=4) == expected